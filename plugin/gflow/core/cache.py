@@ -0,0 +1,43 @@
+"""
+A small least-recently-used cache.
+
+The plugin keeps several results in memory during a QGIS session, to avoid
+recomputing them when their input has not changed. These caches are bounded,
+so that a long session with many models does not keep growing in memory.
+"""
+
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """Mapping that holds at most ``maxsize`` items."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.items
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self.items:
+            return default
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.items[key] = value
+        self.items.move_to_end(key)
+        # Evict the least recently used items.
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        return self.items.pop(key, default)
+
+    def clear(self) -> None:
+        self.items.clear()
@@ -0,0 +1,287 @@
+"""
+Contour a grid of heads with marching squares.
+
+Every level is contoured for all cells at once. A cell produces one or two
+segments, depending on which of its corners lie above the level. Segments are
+oriented consistently, with the higher values on the same side; consequently,
+every crossing of a grid edge starts at most one segment and ends at most one
+segment. The segments are joined into lines by following these links, with
+pointer jumping rather than walking the lines one segment at a time.
+
+Saddle cells, with two diagonally opposite corners above the level, are
+resolved by the mean of the four corners. Cells with a NaN corner are not
+contoured.
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+# Every fifth level, counting from the first, is a major contour.
+MAJOR_EVERY = 5
+
+
+def contour_levels(
+    start: float, stop: float, step: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the levels from start up to and including stop, and whether
+    every level is a major level.
+    """
+    # Allow for some floating point error in the last level.
+    n = int(np.floor((stop - start) / step + 1.0e-9)) + 1
+    index = np.arange(max(n, 0))
+    return start + index * step, index % MAJOR_EVERY == 0
+
+
+def _segment_table() -> np.ndarray:
+    """
+    Return the local edges of the segments of every case, with shape
+    (16 cases, 2 saddle resolutions, 2 segments, from and to edge); -1 if
+    absent.
+
+    The corners of a cell are numbered counterclockwise: (i, j), (i, j + 1),
+    (i + 1, j + 1), (i + 1, j). Edge k runs from corner k to corner k + 1.
+    """
+    table = np.full((16, 2, 2, 2), -1, dtype=np.int64)
+    for case in range(16):
+        above = [(case >> k) & 1 for k in range(4)]
+        entering = [k for k in range(4) if not above[k] and above[(k + 1) % 4]]
+        leaving = [k for k in range(4) if above[k] and not above[(k + 1) % 4]]
+        if len(entering) == 1:
+            table[case, :, 0] = (entering[0], leaving[0])
+        elif len(entering) == 2:
+            # A saddle: if the center is above, the segments cut off the
+            # corners below, otherwise the corners above.
+            for center_above, shift in ((0, 1), (1, -1)):
+                for slot, k in enumerate(entering):
+                    table[case, center_above, slot] = (k, (k + shift) % 4)
+    return table
+
+
+SEGMENTS = _segment_table()
+
+
+def _crossings(
+    values: np.ndarray, level: float, edge: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the (fractional) row and column where the level crosses edges."""
+    nrow, ncol = values.shape
+    nhorizontal = nrow * (ncol - 1)
+    horizontal = edge < nhorizontal
+    row = np.where(horizontal, edge // (ncol - 1), (edge - nhorizontal) // ncol)
+    col = np.where(horizontal, edge % (ncol - 1), (edge - nhorizontal) % ncol)
+    z0 = values[row, col]
+    z1 = np.where(
+        horizontal,
+        values[row, np.minimum(col + 1, ncol - 1)],
+        values[np.minimum(row + 1, nrow - 1), col],
+    )
+    t = (level - z0) / (z1 - z0)
+    return row + np.where(horizontal, 0.0, t), col + np.where(horizontal, t, 0.0)
+
+
+def _order_segments(
+    start: np.ndarray, end: np.ndarray, nedge: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Order the segments along their lines.
+
+    Returns
+    -------
+    order: np.ndarray of integers with shape (n_segment,)
+        The segments, line by line, in order along the line.
+    first: np.ndarray of bools with shape (n_segment,)
+        Whether a segment of order starts a line.
+
+    """
+    n = len(start)
+    index = np.arange(n)
+    by_start = np.full(nedge, -1, dtype=np.int64)
+    by_start[start] = index
+    following = by_start[end]
+    previous = np.full(n, -1, dtype=np.int64)
+    linked = following >= 0
+    previous[following[linked]] = index[linked]
+
+    # Closed lines have no first segment: find the lowest segment of every
+    # closed line by jumping along the links, and cut the link to it. After
+    # every jump, the label and closed cover twice as many segments.
+    label = index.copy()
+    closed = following >= 0
+    jump = following.copy()
+    for _ in range(int(np.ceil(np.log2(n))) + 1):
+        valid = jump >= 0
+        target = jump[valid]
+        label[valid] = np.minimum(label[valid], label[target])
+        closed[valid] &= closed[target]
+        jump[valid] = jump[target]
+    previous[closed & (label == index)] = -1
+
+    # List ranking: the first segment of, and position along, every line.
+    head = np.where(previous < 0, index, previous)
+    rank = (previous >= 0).astype(np.int64)
+    jump = previous.copy()
+    while True:
+        valid = jump >= 0
+        if not valid.any():
+            break
+        target = jump[valid]
+        rank[valid] += rank[target]
+        head[valid] = head[target]
+        jump[valid] = jump[target]
+
+    order = np.lexsort((rank, head))
+    first = rank[order] == 0
+    return order, first
+
+
+def contour_lines(values: np.ndarray, level: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Contour a single level.
+
+    Parameters
+    ----------
+    values: np.ndarray of floats with shape (nrow, ncol)
+        The grid values. NaN for no data: no lines pass through cells with a
+        NaN corner.
+    level: float
+        The value to contour.
+
+    Returns
+    -------
+    rowcol: np.ndarray of floats with shape (n_vertex, 2)
+        The fractional row and column of the vertices.
+    offsets: np.ndarray of integers with shape (n_line + 1,)
+        Start of every line in rowcol. Closed lines end with their first
+        vertex.
+
+    """
+    nrow, ncol = values.shape
+    empty = (np.empty((0, 2)), np.zeros(1, dtype=np.int64))
+    if nrow < 2 or ncol < 2:
+        return empty
+
+    above = values >= level
+    a = above[:-1, :-1]
+    b = above[:-1, 1:]
+    c = above[1:, 1:]
+    d = above[1:, :-1]
+    case = a * 1 + b * 2 + c * 4 + d * 8
+    corners = (values[:-1, :-1], values[:-1, 1:], values[1:, 1:], values[1:, :-1])
+    valid = ~np.isnan(corners[0])
+    for corner in corners[1:]:
+        valid &= ~np.isnan(corner)
+    case[~valid] = 0
+    center_above = (sum(corners) / 4.0 >= level).astype(np.int64)
+
+    # The global numbers of the local edges of every cell: horizontal edges
+    # first, then vertical edges.
+    nhorizontal = nrow * (ncol - 1)
+    i, j = np.nonzero((case > 0) & (case < 15))
+    cell_case = case[i, j]
+    cell_center = center_above[i, j]
+    edges = np.stack(
+        [
+            i * (ncol - 1) + j,
+            nhorizontal + i * ncol + j + 1,
+            (i + 1) * (ncol - 1) + j,
+            nhorizontal + i * ncol + j,
+        ],
+        axis=1,
+    )
+
+    start = []
+    end = []
+    for slot in (0, 1):
+        local = SEGMENTS[cell_case, cell_center, slot]
+        present = local[:, 0] >= 0
+        cells = np.flatnonzero(present)
+        start.append(edges[cells, local[present, 0]])
+        end.append(edges[cells, local[present, 1]])
+    start = np.concatenate(start)
+    end = np.concatenate(end)
+    if len(start) == 0:
+        return empty
+
+    nedge = nhorizontal + (nrow - 1) * ncol
+    order, first = _order_segments(start, end, nedge)
+    # Every line has the start of each of its segments, plus the end of its
+    # last segment.
+    line = np.cumsum(first) - 1
+    nline = line[-1] + 1
+    last = np.append(first[1:], True)
+    vertex_edges = np.empty(len(order) + nline, dtype=np.int64)
+    position = np.arange(len(order)) + line
+    vertex_edges[position] = start[order]
+    vertex_edges[position[last] + 1] = end[order[last]]
+
+    offsets = np.zeros(nline + 1, dtype=np.int64)
+    offsets[1:] = position[last] + 2
+    row, col = _crossings(values, level, vertex_edges)
+    return np.column_stack([row, col]), offsets
+
+
+def contour_level(
+    values: np.ndarray, x: np.ndarray, y: np.ndarray, level: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Contour a single level, in the coordinates of the grid.
+
+    Parameters
+    ----------
+    values: np.ndarray of floats with shape (nrow, ncol)
+        NaN for no data.
+    x: np.ndarray of floats with shape (ncol,)
+        Equidistant x coordinates of the columns.
+    y: np.ndarray of floats with shape (nrow,)
+        Equidistant y coordinates of the rows.
+    level: float
+        The value to contour.
+
+    Returns
+    -------
+    xy: np.ndarray of floats with shape (n_vertex, 2)
+    offsets: np.ndarray of integers with shape (n_line + 1,)
+
+    """
+    rowcol, offsets = contour_lines(values, level)
+    xy = np.empty_like(rowcol)
+    # The coordinates are equidistant: interpolate linearly.
+    dx = (x[-1] - x[0]) / (len(x) - 1) if len(x) > 1 else 0.0
+    dy = (y[-1] - y[0]) / (len(y) - 1) if len(y) > 1 else 0.0
+    xy[:, 0] = x[0] + rowcol[:, 1] * dx
+    xy[:, 1] = y[0] + rowcol[:, 0] * dy
+    return xy, offsets
+
+
+def combine_levels(
+    levels: Sequence[float],
+    major: Sequence[bool],
+    lines: Sequence[Tuple[np.ndarray, np.ndarray]],
+) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    Combine the lines of several levels into a single set of features.
+
+    Returns
+    -------
+    columns: Dict[str, np.ndarray]
+        The head, and whether it is a major level, of every line.
+    xy: np.ndarray of floats with shape (n_vertex, 2)
+    offsets: np.ndarray of integers with shape (n_line + 1,)
+
+    """
+    heads = [np.empty(0)]
+    majors = [np.empty(0, dtype=np.int64)]
+    xys = [np.empty((0, 2))]
+    offsets = [np.zeros(1, dtype=np.int64)]
+    nvertex = 0
+    for level, is_major, (xy, level_offsets) in zip(levels, major, lines, strict=True):
+        nline = len(level_offsets) - 1
+        heads.append(np.full(nline, level))
+        majors.append(np.full(nline, int(is_major)))
+        xys.append(xy)
+        offsets.append(level_offsets[1:] + nvertex)
+        nvertex += len(xy)
+    columns = {"head": np.concatenate(heads), "major": np.concatenate(majors)}
+    return columns, np.concatenate(xys), np.concatenate(offsets)
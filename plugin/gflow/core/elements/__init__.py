@@ -1,53 +1,59 @@
+"""
+The GFLOW elements, by element type.
+
+The element classes depend on QGIS. They are imported on first access, so that
+the parts of the package which do not, such as the schemata, can be used
+without QGIS.
+"""
+
+import importlib
 import re
 from collections import defaultdict
-from functools import partial
-from typing import List, Tuple
-
-from gflow.core import geopackage
-from gflow.core.elements.aquifer import Aquifer
-from gflow.core.elements.barrier import Barrier
-from gflow.core.elements.closed_barrier import ClosedBarrier
-from gflow.core.elements.domain import Domain
-from gflow.core.elements.element import Element
-from gflow.core.elements.flux_inspector import FluxInspector
-from gflow.core.elements.headwell import HeadWell
-from gflow.core.elements.inhomogeneity import Inhomogeneity
-from gflow.core.elements.linesinks.discharge import DischargeLineSink
-from gflow.core.elements.linesinks.drain import DrainLineSink
-from gflow.core.elements.linesinks.farfield import FarFieldLineSink
-from gflow.core.elements.linesinks.gallery import GalleryLineSink
-from gflow.core.elements.linesinks.head import HeadLineSink
-from gflow.core.elements.linesinks.lake import LakeLineSink
-from gflow.core.elements.piezometer import Piezometer
-from gflow.core.elements.uniform_flow import UniformFlow
-from gflow.core.elements.well import Well
-from gflow.core.elements.particle import ForwardParticle, BackwardParticle
-
-ELEMENTS = {
-    element.element_type: element
-    for element in (
-        Aquifer,
-        Domain,
-        UniformFlow,
-        Well,
-        HeadWell,
-        HeadLineSink,
-        DischargeLineSink,
-        DrainLineSink,
-        GalleryLineSink,
-        FarFieldLineSink,
-        LakeLineSink,
-        Barrier,
-        ClosedBarrier,
-        Inhomogeneity,
-        Piezometer,
-        FluxInspector,
-        ForwardParticle,
-        BackwardParticle,
-    )
+from functools import cache, partial
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    from gflow.core.elements.element import Element
+
+# The module of every element class, in the order of the element types.
+ELEMENT_MODULES = {
+    "Aquifer": "aquifer",
+    "Domain": "domain",
+    "UniformFlow": "uniform_flow",
+    "Well": "well",
+    "HeadWell": "headwell",
+    "HeadLineSink": "linesinks.head",
+    "DischargeLineSink": "linesinks.discharge",
+    "DrainLineSink": "linesinks.drain",
+    "GalleryLineSink": "linesinks.gallery",
+    "FarFieldLineSink": "linesinks.farfield",
+    "LakeLineSink": "linesinks.lake",
+    "Barrier": "barrier",
+    "ClosedBarrier": "closed_barrier",
+    "Inhomogeneity": "inhomogeneity",
+    "Piezometer": "piezometer",
+    "FluxInspector": "flux_inspector",
+    "ForwardParticle": "particle",
+    "BackwardParticle": "particle",
 }
 
 
+def __getattr__(name: str):
+    if name in ELEMENT_MODULES or name == "Element":
+        module = ELEMENT_MODULES.get(name, "element")
+        return getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    if name == "ELEMENTS":
+        return element_types()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@cache
+def element_types() -> Dict[str, type]:
+    """Return the element class of every element type."""
+    classes = (__getattr__(name) for name in ELEMENT_MODULES)
+    return {element.element_type: element for element in classes}
+
+
 def parse_name(layername: str) -> Tuple[str, str]:
     """
     Parse the name of the geopackage layer.
@@ -65,7 +71,9 @@ def parse_name(layername: str) -> Tuple[str, str]:
     return element_type, name
 
 
-def load_elements_from_geopackage(path: str) -> List[Element]:
+def load_elements_from_geopackage(path: str) -> List["Element"]:
+    from gflow.core import geopackage
+
     # List the names in the geopackage
     gpkg_names = geopackage.layers(path)
 
@@ -79,6 +87,6 @@ def load_elements_from_geopackage(path: str) -> List[Element]:
     elements = []
     for element_type, group in grouped_names.items():
         for name in group:
-            elements.append(ELEMENTS[element_type](path, name))
+            elements.append(element_types()[element_type](path, name))
 
     return elements
@@ -1,5 +1,3 @@
-import textwrap
-
 from PyQt5.QtCore import QVariant
 from qgis.core import QgsField
 
@@ -31,6 +29,12 @@ class Aquifer(Element):
         QgsField("porosity", QVariant.Double),
     ]
     schema = AquiferSchema()
+    template = (
+        "base {base_elevation}\n"
+        "permeability {conductivity}\n"
+        "thickness {thickness}\n"
+        "porosity {porosity}"
+    )
 
     def __init__(self, path: str, name: str):
         self._initialize_default(path, name)
@@ -41,14 +45,8 @@ class Aquifer(Element):
             self.path, self.layer, self.gflow_name, newfile=True
         )
         self.set_defaults()
+        self.connect_layer_signals()
 
     def remove_from_geopackage(self):
         """This element may not be removed."""
         return
-
-    def render(self, row) -> str:
-        return textwrap.dedent("""\
-            base {base_elevation}
-            permeability {conductivity}
-            thickness {thickness}
-            porosity {porosity}""").format(**row)
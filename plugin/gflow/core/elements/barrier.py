@@ -29,15 +29,8 @@ class Barrier(Element):
         QgsField("label", QVariant.String),
     )
     schema = BarrierSchema()
+    template = "slurry closed {conductivity} {thickness} {porosity} {bottom_elevation}"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.line_renderer(color=RED, width="0.75", outline_style="dash")
-
-    def render(self, row) -> str:
-        return (
-            "slurry closed {conductivity} {thickness} {porosity} {bottom_elevation}\n".format(
-                **row
-            )
-            + self._render_xy(row["xy"])
-        )
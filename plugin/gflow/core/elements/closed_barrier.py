@@ -33,6 +33,7 @@ class ClosedBarrier(Element):
         QgsField("label", QVariant.String),
     )
     schema = ClosedBarrierSchema()
+    template = "slurry closed {conductivity} {thickness} {porosity} {bottom_elevation}"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
@@ -42,11 +43,3 @@ class ClosedBarrier(Element):
             width_border="0.75",
             outline_style="dash",
         )
-
-    def render(self, row) -> str:
-        return (
-            "slurry closed {conductivity} {thickness} {porosity} {bottom_elevation}\n".format(
-                **row
-            )
-            + self._render_xy(row["xy"])
-        )
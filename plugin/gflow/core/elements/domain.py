@@ -12,6 +12,7 @@ from qgis.core import (
 from gflow.core.elements.colors import BLACK
 from gflow.core.elements.element import Element, ElementExtraction
 from gflow.core.elements.schemata import SingleRowSchema
+from gflow.core.number_format import DEFAULT_FORMAT, NumberFormat
 from gflow.core.schemata import Required
 
 
@@ -60,19 +61,27 @@ class Domain(Element):
         canvas.refresh()
         return ymax, ymin
 
-    def extract_data(self) -> ElementExtraction:
-        data = self.table_to_records(layer=self.layer)
+    def can_extract_in_background(self) -> bool:
+        # The extent is updated through the data provider, without signals.
+        return False
+
+    def extract_data(
+        self, number_format: NumberFormat = DEFAULT_FORMAT
+    ) -> ElementExtraction:
+        data = self.table_to_columns(layer=self.layer, fields=())
         errors = self.schema.validate(name=self.layer.name(), data=data)
         if errors:
             return ElementExtraction(errors=errors)
         else:
-            x = [point[0] for point in data[0]["geometry"]]
-            y = [point[1] for point in data[0]["geometry"]]
+            x, y = data.geometry.coordinates(0).T
+            # The extent is written to the GFLOW input: round it like the
+            # coordinates of the other elements.
+            rounded = number_format.round_coordinate
             return ElementExtraction(
                 data={
-                    "xmin": min(x),
-                    "xmax": max(x),
-                    "ymin": min(y),
-                    "ymax": max(y),
+                    "xmin": rounded(float(x.min())),
+                    "xmax": rounded(float(x.max())),
+                    "ymin": rounded(float(y.min())),
+                    "ymax": rounded(float(y.max())),
                 }
             )
@@ -33,7 +33,8 @@ Rendering:
 """
 
 import abc
-from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Union
+import itertools
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from PyQt5.QtWidgets import (
@@ -55,7 +56,16 @@ from qgis.core import (
 )
 
 from gflow.core import geopackage
+from gflow.core.cache import LRUCache
 from gflow.core.extractor import ExtractorMixin
+from gflow.core.number_format import DEFAULT_FORMAT, NumberFormat, format_rows
+from gflow.core.segments import midpoint_fractions
+from gflow.core.table import ColumnarTable
+
+# Every change to an element's layer gets a new, session-wide unique revision.
+REVISIONS = itertools.count()
+# The extraction (rendered text) of unchanged elements is re-used.
+RENDER_CACHE = LRUCache(maxsize=128)
 
 
 class ElementExtraction(NamedTuple):
@@ -64,6 +74,12 @@ class ElementExtraction(NamedTuple):
     rendered: Optional[str] = None
 
 
+class CachedFeature(NamedTuple):
+    errors: Optional[Dict[str, List]] = None
+    data: Optional[Dict[str, Any]] = None
+    rendered: Optional[str] = None
+
+
 class NameDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -92,6 +108,9 @@ class Element(ExtractorMixin, abc.ABC):
     geometry_type: str
     attributes: tuple = ()
     defaults: dict = {}
+    # The row template, which is used to render all rows at once. It may span
+    # several lines; the vertices of line and polygon elements follow it.
+    template: Optional[str] = None
 
     def _initialize_default(self, path, name):
         self.name = name
@@ -99,6 +118,12 @@ class Element(ExtractorMixin, abc.ABC):
         self.gflow_name = None
         self.layer = None
         self.item = None
+        # Validation and processing results per feature ID, kept up to date by
+        # the signals of the layer.
+        self.feature_cache = {}
+        self.dirty_fids = set()
+        self.revision = next(REVISIONS)
+        self.number_format = DEFAULT_FORMAT
 
     def __init__(self, path: str, name: str):
         self._initialize_default(path, name)
@@ -189,17 +214,54 @@ class Element(ExtractorMixin, abc.ABC):
         self.layer_from_geopackage()
         self.set_defaults()
         self.set_editor_widget()
+        self.connect_layer_signals()
         return
 
     def write(self):
         self.layer = geopackage.write_layer(self.path, self.layer, self.gflow_name)
         self.set_defaults()
         self.set_editor_widget()
+        self.connect_layer_signals()
+        return
+
+    def invalidate_cache(self, *_) -> None:
+        self.feature_cache.clear()
+        self.dirty_fids.clear()
+        self.revision = next(REVISIONS)
+
+    def _mark_dirty(self, fid: int, *_) -> None:
+        self.dirty_fids.add(fid)
+        self.revision = next(REVISIONS)
+
+    def _forget_feature(self, fid: int) -> None:
+        self.feature_cache.pop(fid, None)
+        self.dirty_fids.discard(fid)
+        self.revision = next(REVISIONS)
+
+    def connect_layer_signals(self) -> None:
+        """
+        Track edits of the layer, so that only the edited features have to be
+        validated and processed again by ``extract_data``.
+        """
+        self.invalidate_cache()
+        layer = self.layer
+        layer.featureAdded.connect(self._mark_dirty)
+        layer.featureDeleted.connect(self._forget_feature)
+        layer.attributeValueChanged.connect(self._mark_dirty)
+        layer.geometryChanged.connect(self._mark_dirty)
+        # Rolling back the edits or changing the fields invalidates everything.
+        layer.afterRollBack.connect(self.invalidate_cache)
+        layer.attributeAdded.connect(self.invalidate_cache)
+        layer.attributeDeleted.connect(self.invalidate_cache)
         return
 
     def remove_from_geopackage(self):
         geopackage.remove_layer(self.path, self.gflow_name)
 
+    @property
+    def fieldnames(self) -> List[str]:
+        return [attr.name() for attr in self.attributes]
+
     def check_table_columns(self) -> Dict[str, List]:
         """
         Check if any columns are missing from the table.
@@ -216,46 +278,283 @@ class Element(ExtractorMixin, abc.ABC):
             return {"Table:": [msg]}
         return {}
 
-    def process_table_row(self, row) -> tuple[Dict[str, Any], str]:
-        gflow_row = row.copy()
-        gflow_row.pop("geometry", None)
-        gflow_row.pop("fid", None)
+    def process_table(
+        self, table: ColumnarTable
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Process all rows of the table.
 
+        The coordinates are prepared and formatted for all features at once,
+        and all rows are rendered with the row template at once.
+        """
+        rows = table.records(geometry=False)
+        geometry = table.geometry
+        columns = {}
         match self.geometry_type:
             case "No Geometry":
                 pass
             case "Point":
-                gflow_row["x"], gflow_row["y"] = self.point_xy(row)
-            case "Linestring":
-                gflow_row["xy"] = self.linestring_xy(row)
-            case "Polygon":
-                gflow_row["xy"] = self.polygon_xy(row)
+                xy = self.points_xy(geometry)
+                columns["x"], columns["y"] = xy[:, 0], xy[:, 1]
+                for row, (x, y) in zip(rows, xy.tolist(), strict=True):
+                    row["x"], row["y"] = x, y
+            case "Linestring" | "Polygon":
+                if self.geometry_type == "Linestring":
+                    xy, offsets = self.linestrings_xy(geometry)
+                else:
+                    xy, offsets = self.polygons_xy(geometry)
+                vertices = list(map(tuple, xy.tolist()))
+                lines = self.number_format.format_xy(xy)
+                offsets = offsets.tolist()
+                for row, start, end in zip(
+                    rows, offsets[:-1], offsets[1:], strict=True
+                ):
+                    row["xy"] = vertices[start:end]
+                    row["rendered_xy"] = "\n".join(lines[start:end])
+
+        rendered = self.render_table(table, columns)
+        if self.geometry_type in ("Linestring", "Polygon"):
+            rendered = [
+                f"{text}\n{row['rendered_xy']}"
+                for text, row in zip(rendered, rows, strict=True)
+            ]
+        return rows, rendered
+
+    def template_columns(self, table: ColumnarTable) -> Dict[str, np.ndarray]:
+        """
+        The values of the template fields which are derived from the
+        attributes, rather than taken from them as they are.
+        """
+        return {}
+
+    def render_table(
+        self, table: ColumnarTable, columns: Dict[str, np.ndarray]
+    ) -> List[str]:
+        """Render all rows with the row template in a single call."""
+        template, fields = self.number_format.row_template(self.template)
+        if not fields:
+            return [template.format()] * len(table)
+        columns = {**columns, **self.template_columns(table)}
+        values = []
+        for field in fields:
+            if field in columns:
+                values.append(columns[field])
+                continue
+            column = table[field]
+            isnull = table.null[field]
+            if isnull.any():
+                # Render NULL as None, like the rows.
+                column = column.astype(object)
+                column[isnull] = None
+            values.append(column)
+        return format_rows(template, values)
+
+    def update_feature_cache(self, fids: List[int]) -> None:
+        """
+        Validate and process the features that are new, edited, or have not
+        been processed yet. All other features are taken from the cache.
+        """
+        # Forget about features that no longer exist, e.g. after committing
+        # features with a temporary (negative) ID.
+        for fid in self.feature_cache.keys() - set(fids):
+            del self.feature_cache[fid]
+
+        cache = self.feature_cache
+        stale = [
+            fid
+            for fid in fids
+            if fid in self.dirty_fids or fid not in cache or cache[fid].rendered is None
+        ]
+        if not stale:
+            return
+
+        # Reading all features in one go is cheaper than filtering.
+        filter_fids = None if len(stale) == len(fids) else stale
+        table = self.table_to_columns(
+            layer=self.layer, fields=self.fieldnames, fids=filter_fids
+        )
+        self.cache_features(table)
+        return
+
+    def process_features(self, table: ColumnarTable) -> Dict[int, CachedFeature]:
+        """Validate and process the features of the table."""
+        row_errors = self.schema.row_errors(table)
+        # The cached features are valid: only process if the new ones are too.
+        if row_errors:
+            rows = rendered = [None] * len(table)
+        else:
+            rows, rendered = self.process_table(table)
+        return {
+            fid: CachedFeature(row_errors.get(i), rows[i], rendered[i])
+            for i, fid in enumerate(table.fid.tolist())
+        }
+
+    def cache_features(self, table: ColumnarTable) -> None:
+        """Validate and process the features of the table, and cache them."""
+        features = self.process_features(table)
+        self.feature_cache.update(features)
+        self.dirty_fids.difference_update(features)
+        return
+
+    def render_key(self) -> tuple:
+        """
+        Fingerprint of everything that determines the rendered text.
+
+        The revision changes with every edit of the layer. The schema plan
+        changes when the schemata are replaced, the element class when the
+        plugin is reloaded.
+        """
+        return (
+            self.path,
+            self.gflow_name,
+            self.revision,
+            tuple(self.fieldnames),
+            self.schema.plan(),
+            type(self),
+            self.number_format,
+        )
 
-        rendered = self.render(gflow_row)
-        return gflow_row, rendered
+    def cached_extraction(
+        self, number_format: NumberFormat
+    ) -> Optional[ElementExtraction]:
+        """Return the extraction from the render cache, if present."""
+        if number_format != self.number_format:
+            # The cached features have been rendered with another format.
+            self.invalidate_cache()
+            self.number_format = number_format
+        return RENDER_CACHE.get(self.render_key())
+
+    def cache_extraction(self, extraction: ElementExtraction) -> None:
+        if not extraction.errors:
+            RENDER_CACHE[self.render_key()] = extraction
+
+    def extract_data(
+        self, number_format: NumberFormat = DEFAULT_FORMAT
+    ) -> ElementExtraction:
+        """
+        Validate and render the layer. The result for a layer that has not
+        changed since the previous extraction is taken from the render cache.
+        """
+        extraction = self.cached_extraction(number_format)
+        if extraction is None:
+            extraction = self._extract_data()
+            self.cache_extraction(extraction)
+        return extraction
+
+    def can_extract_in_background(self) -> bool:
+        """
+        Whether the features may be read from the GeoPackage, rather than the
+        layer. This is not the case if the layer has uncommitted edits.
+        """
+        return not self.layer.isModified()
+
+    def reusable_features(self) -> Dict[int, CachedFeature]:
+        """
+        Return the cached features which have not been edited since, for
+        ``extract_from_geopackage``. This is a copy: the cache itself is only
+        modified on the GUI thread.
+        """
+        return {
+            fid: feature
+            for fid, feature in self.feature_cache.items()
+            if fid not in self.dirty_fids and feature.rendered is not None
+        }
+
+    def extract_from_geopackage(
+        self,
+        name: str,
+        fields: List[str],
+        cached: Optional[Dict[int, CachedFeature]] = None,
+    ) -> Tuple[ElementExtraction, Dict[int, CachedFeature]]:
+        """
+        Validate and render the features as stored in the GeoPackage.
+
+        This does not use the QGIS layer, nor modify the state of the element,
+        so that it may run in a worker thread while the layer is edited. The
+        caller checks the table columns, and stores the result with
+        ``store_extraction``.
+
+        Parameters
+        ----------
+        name: str
+            Name of the layer, used in error messages.
+        fields: List[str]
+            The names of the attributes, see ``fieldnames``.
+        cached: Dict[int, CachedFeature], optional
+            Features which are unchanged since they were processed, see
+            ``reusable_features``. These are not read nor processed again.
+
+        Returns
+        -------
+        extraction: ElementExtraction
+        features: Dict[int, CachedFeature]
+            All features of the layer.
+
+        """
+        cached = cached or {}
+        fids, table = self.geopackage_to_columns(
+            self.path, self.gflow_name, fields, skip=cached
+        )
+        errors = self.schema.validate_table(name=name, nrow=len(fids))
+        if errors:
+            return ElementExtraction(errors=errors), {}
+        features = {fid: cached[fid] for fid in fids if fid in cached}
+        if len(table) > 0:
+            features.update(self.process_features(table))
+        return self.assemble_extraction(fids, features), features
+
+    def store_extraction(
+        self,
+        revision: int,
+        extraction: ElementExtraction,
+        features: Dict[int, CachedFeature],
+    ) -> None:
+        """
+        Cache the result of ``extract_from_geopackage``, unless the layer has
+        been edited since the revision it was started with.
+        """
+        if revision != self.revision:
+            return
+        if features:
+            # The features are all features of the layer, as committed.
+            for fid in self.feature_cache.keys() - features.keys():
+                del self.feature_cache[fid]
+            self.feature_cache.update(features)
+            self.dirty_fids.difference_update(features)
+        self.cache_extraction(extraction)
+        return
 
-    def extract_data(self) -> ElementExtraction:
+    def _extract_data(self) -> ElementExtraction:
         missing = self.check_table_columns()
         if missing:
             return ElementExtraction(errors=missing)
 
-        data = self.table_to_records(layer=self.layer)
-        errors = self.schema.validate(name=self.layer.name(), data=data)
+        fids = self.feature_ids(self.layer)
+        errors = self.schema.validate_table(name=self.layer.name(), nrow=len(fids))
+        if errors:
+            return ElementExtraction(errors=errors)
 
+        self.update_feature_cache(fids)
+        return self.assemble_extraction(fids, self.feature_cache)
+
+    @staticmethod
+    def assemble_extraction(
+        fids: List[int], features: Dict[int, CachedFeature]
+    ) -> ElementExtraction:
+        cached = [features[fid] for fid in fids]
+        errors = {
+            f"Row {i + 1}:": feature.errors
+            for i, feature in enumerate(cached)
+            if feature.errors
+        }
         if errors:
             return ElementExtraction(errors=errors)
         else:
-            elements = []
-            rendered = []
-            for row in data:
-                data, string = self.process_table_row(row)
-                elements.append(data)
-                rendered.append(string)
+            rendered = [feature.rendered for feature in cached]
+            # Single row elements such as the Aquifer are used as a dictionary.
+            data = cached[-1].data if cached else None
             return ElementExtraction(data=data, rendered=rendered)
 
-    def _render_xy(self, xy) -> str:
-        return "\n".join(f"{x} {y}" for (x, y) in xy)
-
 
 class LineSink(Element, abc.ABC):
     element_type = "Head Line Sink"
@@ -272,20 +571,102 @@ class LineSink(Element, abc.ABC):
     def set_editor_widget(self) -> None:
         self.set_dropdown("location", self.LINESINKLOCATIONS.keys())
 
-    def _set_location(self, row) -> None:
-        row["location"] = self.LINESINKLOCATIONS[row["location"]]
+    def template_columns(self, table: ColumnarTable) -> Dict[str, np.ndarray]:
+        # The location is written as its number.
+        if "location" not in table.columns:
+            return {}
+        locations = table["location"].tolist()
+        return {
+            "location": np.array([self.LINESINKLOCATIONS[key] for key in locations])
+        }
+
+    # The columns with the values at the start and end of the line sink, which
+    # are interpolated to the midpoints of the segments.
+    start_column = "starting_head"
+    end_column = "ending_head"
 
     @staticmethod
-    def _interpolate_along_segments(xy, start, end) -> list[str]:
-        xy = np.array(xy)
-        distance = np.linalg.norm(np.diff(xy, axis=1), axis=1)
-        accumulated = distance.cumsum()
-        # Compute midpoint along segmenets
-        midpoint = accumulated - 0.5 * distance
+    def _interpolate_batched(
+        xy: np.ndarray,
+        offsets: np.ndarray,
+        start: np.ndarray,
+        end: np.ndarray,
+        number_format: NumberFormat = DEFAULT_FORMAT,
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Discretize the line sinks of all features at once.
+
+        Parameters
+        ----------
+        xy: np.ndarray of floats with shape (n_vertex, 2)
+            The vertices of all features.
+        offsets: np.ndarray of integers with shape (n_feature + 1,)
+            Start of every feature in xy.
+        start: np.ndarray of floats with shape (n_feature,)
+            The value at the start of every feature.
+        end: np.ndarray of floats with shape (n_feature,)
+            The value at the end of every feature.
+        number_format: NumberFormat
+            The precision of the coordinates.
+
+        Returns
+        -------
+        lines: List[str]
+            One line per segment: x0 y0 x1 y1 value.
+        segment_offsets: np.ndarray of integers with shape (n_feature + 1,)
+            Start of every feature in lines.
+
+        """
+        nfeature = len(offsets) - 1
+        feature = np.repeat(np.arange(nfeature), np.diff(offsets))
+        # A segment connects two consecutive vertices of the same feature.
+        is_segment = feature[:-1] == feature[1:]
+        x0, y0 = xy[:-1][is_segment].T
+        x1, y1 = xy[1:][is_segment].T
+        segment_feature = feature[:-1][is_segment]
+        segment_offsets = np.zeros(nfeature + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(segment_feature, minlength=nfeature), out=segment_offsets[1:]
+        )
+
+        if len(segment_feature) == 0:
+            return [], segment_offsets
+
         # Linearly interpolate head to midpoint of segment
-        midpoint_values = start + (midpoint / accumulated[-1]) * (end - start)
+        fraction = midpoint_fractions(x1 - x0, y1 - y0, segment_offsets)
+        values = start[segment_feature] + fraction * (
+            end[segment_feature] - start[segment_feature]
+        )
+        c = number_format.coordinate
+        template = f"{c} {c} {c} {c} {number_format.value}"
+        lines = format_rows(template, (x0, y0, x1, y1, values))
+        return lines, segment_offsets
+
+    def process_table(
+        self, table: ColumnarTable
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Process all rows of the table.
 
-        lines = []
-        for value, (x0, y0), (x1, y1) in zip(midpoint_values, xy[:-1], xy[1:]):
-            lines.append(f"{x0} {y0} {x1} {y1} {value}")
-        return lines
+        The row template renders the lines preceding the segments of every
+        line sink. The segments of all features are interpolated and formatted
+        at once. The rows do not include the coordinates.
+        """
+        rows = table.records(geometry=False)
+        xy, offsets = self.linestrings_xy(table.geometry)
+        lines, segment_offsets = self._interpolate_batched(
+            xy=xy,
+            offsets=offsets,
+            start=table[self.start_column].astype(np.float64),
+            end=table[self.end_column].astype(np.float64),
+            number_format=self.number_format,
+        )
+        segment_offsets = segment_offsets.tolist()
+        parameters = self.render_table(table, {})
+        rendered = [
+            "\n".join([text] + lines[i0:i1])
+            for text, i0, i1 in zip(
+                parameters, segment_offsets[:-1], segment_offsets[1:], strict=True
+            )
+        ]
+        return rows, rendered
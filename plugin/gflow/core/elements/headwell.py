@@ -29,10 +29,8 @@ class HeadWell(Element):
         QgsField("label", QVariant.String),
     )
     schema = WellSchema()
+    template = "{x} {y} {head} {radius}"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.marker_renderer(color=BLUE, size="3")
-
-    def render(self, row):
-        return "{x} {y} {head} {radius}".format(**row)
@@ -1,3 +1,6 @@
+from typing import Dict
+
+import numpy as np
 from PyQt5.QtCore import QVariant
 from qgis.core import QgsField, QgsSingleSymbolRenderer
 
@@ -9,6 +12,9 @@ from gflow.core.schemata import (
     Required,
     StrictlyPositive,
 )
+from gflow.core.table import ColumnarTable
+
+NODATA = -9.999e3
 
 
 class InhomogeneitySchema(RowWiseSchema):
@@ -35,6 +41,10 @@ class Inhomogeneity(Element):
         QgsField("label", QVariant.String),
     )
     schema = InhomogeneitySchema()
+    template = (
+        "transmissivity {conductivity} {base_elevation} {average_head} {recharge} "
+        "{porosity}"
+    )
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
@@ -42,27 +52,18 @@ class Inhomogeneity(Element):
             color=TRANSPARENT_GREY, color_border=GREY, width_border="0.75"
         )
 
-    def render(self, row) -> str:
-        NODATA = -9.999e3
-
-        def render_nodata(value):
-            if value is None:
-                return NODATA
-            return value
-
-        conductivity = render_nodata(row["conductivity"])
-        base_elevation = render_nodata(row["base_elevation"])
-        porosity = render_nodata(row["porosity"])
-        average_head = render_nodata(row["average_head"])
-
+    def template_columns(self, table: ColumnarTable) -> Dict[str, np.ndarray]:
+        columns = {
+            field: table[field]
+            for field in ("conductivity", "base_elevation", "porosity", "average_head")
+        }
         # Flip sign on recharge
-        recharge = row["recharge"]
-        if recharge is None:
-            recharge = NODATA
-        else:
-            recharge *= -1.0
-
-        return (
-            f"transmissivity {conductivity} {base_elevation} {average_head} {recharge} {porosity}\n"
-            + self._render_xy(row["xy"])
-        )
+        columns["recharge"] = -1.0 * table["recharge"]
+        # Missing values are written as no data.
+        for field, column in columns.items():
+            isnull = table.null[field]
+            if isnull.any():
+                column = column.astype(object)
+                column[isnull] = NODATA
+                columns[field] = column
+        return columns
@@ -5,7 +5,6 @@ from gflow.core.elements.colors import GREEN
 from gflow.core.elements.element import LineSink
 from gflow.core.elements.schemata import RowWiseSchema
 from gflow.core.schemata import (
-    Membership,
     Optional,
     Required,
 )
@@ -29,15 +28,10 @@ class DischargeLineSink(LineSink):
         QgsField("label", QVariant.String),
     )
     schema = DischargeLineSinkSchema()
+    template = "discharge"
+    start_column = "starting_density"
+    end_column = "ending_density"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.line_renderer(color=GREEN, width="0.75")
-
-    def render(self, row) -> str:
-        lines = ["discharge"] + self._interpolate_along_segments(
-            xy=row["xy"],
-            start=row["starting_density"],
-            end=row["ending_density"],
-        )
-        return "\n".join(lines)
@@ -1,5 +1,3 @@
-import textwrap
-
 from PyQt5.QtCore import QVariant
 from qgis.core import QgsField, QgsSingleSymbolRenderer
 
@@ -39,22 +37,8 @@ class DrainLineSink(LineSink):
         QgsField("label", QVariant.String),
     )
     schema = DrainLineSinkSchema()
+    template = "drain\nresistance {resistance}\nwidth {width} {location}\ndepth 0.0"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.line_renderer(color=LIGHT_BLUE, width="0.75")
-
-    def render(self, row) -> str:
-        self._set_location(row)
-        parameters = textwrap.dedent("""\
-            drain
-            resistance {resistance}
-            width {width} {location}
-            depth 0.0""").format(**row)
-
-        lines = [parameters] + self._interpolate_along_segments(
-            xy=row["xy"],
-            start=row["starting_head"],
-            end=row["ending_head"],
-        )
-        return "\n".join(lines)
@@ -1,5 +1,3 @@
-import textwrap
-
 from PyQt5.QtCore import QVariant
 from qgis.core import QgsField, QgsSingleSymbolRenderer
 
@@ -19,7 +17,7 @@ class FarFieldLineSinkSchema(RowWiseSchema):
         "starting_head": Required(),
         "ending_head": Required(),
         "location": Required(Membership(LineSink.LINESINKLOCATIONS.keys())),
-        "label": Optional,
+        "label": Optional(),
     }
 
 
@@ -33,22 +31,8 @@ class FarFieldLineSink(LineSink):
         QgsField("label", QVariant.String),
     )
     schema = FarFieldLineSinkSchema()
+    template = "head\nresistance 0.0\nwidth 0.0 {location}\ndepth 0.0"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.line_renderer(color=BLUE, width="0.75")
-
-    def render(self, row) -> str:
-        self._set_location(row)
-        parameters = textwrap.dedent("""\
-            head
-            resistance 0.0
-            width 0.0 {location}
-            depth 0.0""").format(**row)
-
-        lines = [parameters] + self._interpolate_along_segments(
-            xy=row["xy"],
-            start=row["starting_head"],
-            end=row["ending_head"],
-        )
-        return "\n".join(lines)
@@ -1,5 +1,3 @@
-import textwrap
-
 from PyQt5.QtCore import QVariant
 from qgis.core import QgsField, QgsSingleSymbolRenderer
 
@@ -43,23 +41,16 @@ class GalleryLineSink(LineSink):
         QgsField("label", QVariant.String),
     )
     schema = GalleryLineSinkSchema()
+    template = (
+        "gallery\n"
+        "pumping {discharge}\n"
+        "resistance {resistance}\n"
+        "width {width} {location}\n"
+        "depth 0.0"
+    )
+    start_column = "minimum_starting_head"
+    end_column = "minimum_ending_head"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.line_renderer(color=GREEN, width="0.75")
-
-    def render(self, row) -> str:
-        self._set_location(row)
-        parameters = textwrap.dedent("""\
-            gallery
-            pumping {discharge}
-            resistance {resistance}
-            width {width} {location}
-            depth 0.0""").format(**row)
-
-        lines = [parameters] + self._interpolate_along_segments(
-            xy=row["xy"],
-            start=row["minimum_starting_head"],
-            end=row["minimum_ending_head"],
-        )
-        return "\n".join(lines)
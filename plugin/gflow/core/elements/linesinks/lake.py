@@ -1,5 +1,3 @@
-import textwrap
-
 from PyQt5.QtCore import QVariant
 from qgis.core import QgsField, QgsSingleSymbolRenderer
 
@@ -42,22 +40,8 @@ class LakeLineSink(LineSink):
         QgsField("label", QVariant.String),
     )
     schema = LakeLineSinkSchema()
+    template = "head\nresistance {resistance}\nwidth {width} {location}\ndepth {depth}"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.line_renderer(color=BLUE, width="0.75")
-
-    def render(self, row) -> str:
-        self._set_location(row)
-        parameters = textwrap.dedent("""\
-            head
-            resistance {resistance}
-            width {width} {location}
-            depth {depth}""").format(**row)
-
-        lines = [parameters] + self._interpolate_along_segments(
-            xy=row["xy"],
-            start=row["starting_head"],
-            end=row["ending_head"],
-        )
-        return "\n".join(lines)
@@ -30,11 +30,10 @@ class Particle(Element):
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.marker_renderer(color=cls.color, size="2")
 
-    def render(self, row):
-        row = row.copy()
-        row["direction"] = self.direction
+    @property
+    def template(self) -> str:
         # TODO: set a default starting elevation equal to aquifer top.
-        return "{x} {y} {starting_elevation} {direction}".format(**row)
+        return f"{{x}} {{y}} {{starting_elevation}} {self.direction}"
 
 
 class ForwardParticle(Particle):
@@ -22,10 +22,8 @@ class Piezometer(Element):
     geometry_type = "Point"
     attributes = (QgsField("label", QVariant.String),)
     schema = PiezometerSchema()
+    template = "{x} {y}"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.marker_renderer(color=LIGHT_BLUE, name="triangle", size="3")
-
-    def render(self, row):
-        return "{x} {y}".format(**row)
@@ -1,10 +1,13 @@
 import abc
 from collections import defaultdict
-from typing import Any, Dict, List, NamedTuple, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
 from gflow.core.schemata import (
+    ColumnCheck,
     SchemaContainer,
+    compile_schemata,
 )
+from gflow.core.table import ColumnarTable
 
 
 class ValidationData(NamedTuple):
@@ -12,12 +15,47 @@ class ValidationData(NamedTuple):
     name: str
     data: Dict[str, Any]
     other: Optional[Dict[str, Any]] = None
+    plan: Optional[Tuple[ColumnCheck, ...]] = None
+
+
+def _row_errors(
+    plan: Tuple[ColumnCheck, ...], table: ColumnarTable
+) -> Dict[int, Dict[str, List]]:
+    column_errors = {}
+    for check in plan:
+        variable = check.variable
+        _errors = check.validate(table.columns.get(variable), table.null[variable])
+        if _errors:
+            column_errors[variable] = _errors
+
+    row_errors = {}
+    for i in sorted(set().union(*column_errors.values())):
+        errors = defaultdict(list)
+        for variable, _errors in column_errors.items():
+            if i in _errors:
+                errors[variable].extend(_errors[i])
+        row_errors[i] = errors
+    return row_errors
 
 
 class SchemaBase(abc.ABC):
     # TODO: check for presence of columns
     schemata: Dict[str, SchemaContainer] = {}
 
+    @classmethod
+    def plan(cls) -> Tuple[ColumnCheck, ...]:
+        """
+        The schemata compiled to a flat validation plan.
+
+        The plan is compiled once per class, and recompiled only if the
+        schemata of the class are replaced.
+        """
+        cached = cls.__dict__.get("_plan")
+        if cached is None or cached[0] is not cls.schemata:
+            cached = (cls.schemata, compile_schemata(cls.schemata))
+            cls._plan = cached
+        return cached[1]
+
     @staticmethod
     def _validate_table(vd: ValidationData) -> Dict[str, List]:
         errors = defaultdict(list)
@@ -27,9 +65,14 @@ class SchemaBase(abc.ABC):
                 errors[f"{vd.name} {variable}"].extend(_errors)
         return errors
 
+    @classmethod
+    def validate_table(cls, name: str, nrow: int) -> Dict[str, List]:
+        """Validate properties of the table as a whole, such as its size."""
+        return {}
+
     @classmethod
     def validate(cls, name: str, data: Dict[str, Any]) -> Dict[str, List]:
-        vd = ValidationData(cls.schemata, name, data)
+        vd = ValidationData(cls.schemata, name, data, plan=cls.plan())
         return cls._validate(vd)
 
     @classmethod
@@ -43,6 +86,9 @@ class RowWiseSchema(SchemaBase, abc.ABC):
 
     @staticmethod
     def _validate(vd: ValidationData) -> Dict[str, List]:
+        if isinstance(vd.data, ColumnarTable):
+            return RowWiseSchema._validate_columns(vd)
+
         errors = defaultdict(list)
 
         for i, row in enumerate(vd.data):
@@ -58,6 +104,26 @@ class RowWiseSchema(SchemaBase, abc.ABC):
 
         return errors
 
+    @classmethod
+    def row_errors(cls, table: ColumnarTable) -> Dict[int, Dict[str, List]]:
+        """Return the errors per row index of the table."""
+        return _row_errors(cls.plan(), table)
+
+    @staticmethod
+    def _validate_columns(vd: ValidationData) -> Dict[str, List]:
+        """
+        Validate column by column, but report the errors row by row.
+
+        This produces the same errors as validating every row, but every
+        check of the compiled plan tests an entire column at once.
+        """
+        plan = vd.plan if vd.plan is not None else compile_schemata(vd.schemata)
+        row_errors = _row_errors(plan, vd.data)
+        errors = defaultdict(list)
+        for i, _errors in row_errors.items():
+            errors[f"Row {i + 1}:"] = _errors
+        return errors
+
 
 class SingleRowSchema(RowWiseSchema, abc.ABC):
     """
@@ -65,13 +131,17 @@ class SingleRowSchema(RowWiseSchema, abc.ABC):
     validated as a row, such as Constant, Domain, Uniform Flow.
     """
 
-    @staticmethod
-    def _validate(vd: ValidationData) -> Dict[str, List]:
-        nrow = len(vd.data)
+    @classmethod
+    def validate_table(cls, name: str, nrow: int) -> Dict[str, List]:
         if nrow != 1:
             return {
-                vd.name: [
-                    f"Table must contain a single row. Table contains {nrow} rows."
-                ]
+                name: [f"Table must contain a single row. Table contains {nrow} rows."]
             }
+        return {}
+
+    @staticmethod
+    def _validate(vd: ValidationData) -> Dict[str, List]:
+        errors = SingleRowSchema.validate_table(vd.name, len(vd.data))
+        if errors:
+            return errors
         return RowWiseSchema._validate(vd)
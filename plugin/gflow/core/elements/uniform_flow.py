@@ -25,10 +25,8 @@ class UniformFlow(Element):
         QgsField("angle", QVariant.Double),
     )
     schema = UniformFlowSchema()
+    template = "reference {x} {y} {head}"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.marker_renderer(color=RED, name="star", size="5")
-
-    def render(self, row) -> str:
-        return "reference {x} {y} {head}".format(**row)
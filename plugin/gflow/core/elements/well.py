@@ -29,10 +29,8 @@ class Well(Element):
         QgsField("label", QVariant.String),
     )
     schema = WellSchema()
+    template = "{x} {y} {discharge} {radius}"
 
     @classmethod
     def renderer(cls) -> QgsSingleSymbolRenderer:
         return cls.marker_renderer(color=GREEN, size="3")
-
-    def render(self, row):
-        return "{x} {y} {discharge} {radius}".format(**row)
@@ -1,101 +1,237 @@
 """
 Read the GFLOW extract (.XTR) file and convert its results to GeoPackage vector
 layers.
+
+The extraction classes depend on QGIS. They are imported on first access, so
+that the index of the extract file can be used without QGIS.
 """
 
-from gflow.core.extract.linesinks import (
-    HeadLineSinkExtraction,
-    DrainLineSinkExtraction,
-    DischargeLineSinkExtraction,
-    GalleryLineSinkExtraction,
-)
-from gflow.core.extract.doublets import (
-    ClosedSlurryWallExtraction,
-    OpenSlurryWallExtraction,
-    InhomogeneityExtraction,
-)
-
-# from gflow.core.extract.flux_inspection import FluxInspectionExtraction
-from gflow.core.extract.wells import (
-    HeadWellExtraction,
-    DischargeWellExtraction,
-)
-from gflow.core.extract.test_point import TestPointExtraction
-
-
-# Mapping from header to data type.
-MAPPING = {
-    "! discharge specified wells": DischargeWellExtraction,
-    "! head specified wells": HeadWellExtraction,
-    "! discharge specified line sinks": DischargeLineSinkExtraction,
-    "! head specified line sinks": HeadLineSinkExtraction,
-    "! drains": DrainLineSinkExtraction,
-    "! galleries": GalleryLineSinkExtraction,
-    "! transmissivity inhomogeneity domain.": InhomogeneityExtraction,
-    "! open slurry wall.": OpenSlurryWallExtraction,
-    "! closed slurry wall.": ClosedSlurryWallExtraction,
-    "*      x              y              z          porosity    hydr. conduct.   base elevation net recharge  leakage (bottom)      head      lower head     resistance                   Vx                    Vy                    Vz              label": TestPointExtraction,
-    #    "! flux_inspection_line_label   normal_flow        numerical_nf": FluxInspectionExtraction,
+import importlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from itertools import zip_longest
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from gflow.core.extract.index import ExtractIndex, Section
+
+if TYPE_CHECKING:
+    from gflow.core.geopackage import GeoPackageWriter
+
+# Number of rows of a block to convert to arrays at once.
+BLOCK_ROWS = 65536
+
+# Mapping from header to the module and name of the data type.
+EXTRACTION_MODULES = {
+    "! discharge specified wells": ("wells", "DischargeWellExtraction"),
+    "! head specified wells": ("wells", "HeadWellExtraction"),
+    "! discharge specified line sinks": ("linesinks", "DischargeLineSinkExtraction"),
+    "! head specified line sinks": ("linesinks", "HeadLineSinkExtraction"),
+    "! drains": ("linesinks", "DrainLineSinkExtraction"),
+    "! galleries": ("linesinks", "GalleryLineSinkExtraction"),
+    "! transmissivity inhomogeneity domain.": ("doublets", "InhomogeneityExtraction"),
+    "! open slurry wall.": ("doublets", "OpenSlurryWallExtraction"),
+    "! closed slurry wall.": ("doublets", "ClosedSlurryWallExtraction"),
+    "*      x              y              z          porosity    hydr. conduct.   base elevation net recharge  leakage (bottom)      head      lower head     resistance                   Vx                    Vy                    Vz              label": (
+        "test_point",
+        "TestPointExtraction",
+    ),
+    #    "! flux_inspection_line_label   normal_flow        numerical_nf": ("flux_inspection", "FluxInspectionExtraction"),
 }
 
 
+def __getattr__(name: str):
+    if name == "MAPPING":
+        return extraction_types()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@cache
+def extraction_types() -> Dict[str, type]:
+    """Return the mapping from header to data type, see MAPPING."""
+    return {
+        header: getattr(importlib.import_module(f"{__name__}.{module}"), name)
+        for header, (module, name) in EXTRACTION_MODULES.items()
+    }
+
+
+def _parse_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _parse_numeric_columns(lines: List[str], indices: List[int]) -> np.ndarray:
+    """Parse the numeric columns one by one, with NaN for invalid values."""
+    rows = [line.split(",") for line in lines]
+    ncol = max(indices, default=-1) + 1
+    columns = list(zip_longest(*rows, fillvalue=""))[:ncol]
+    columns.extend([("",) * len(rows)] * (ncol - len(columns)))
+    values = np.empty((len(rows), len(indices)), dtype=np.float64)
+    for j, i in enumerate(indices):
+        try:
+            values[:, j] = np.fromiter(map(float, columns[i]), np.float64, len(rows))
+        except ValueError:
+            values[:, j] = [_parse_float(value) for value in columns[i]]
+    return values
+
+
+def parse_block(lines: List[str], attributes: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Convert the lines of a block to one array per attribute, at once.
+
+    The XTR file contains almost solely floating point values, which are
+    converted to float64, with NaN for values that cannot be parsed. The
+    exception is the labels, which remain strings.
+    """
+    # GFLOW seems to write null bytes in some places
+    lines = [line.replace("\x00", "") for line in lines]
+    nrow = len(lines)
+    numeric = [i for i, key in enumerate(attributes) if key != "label"]
+    if nrow == 0:
+        values = np.empty((0, len(numeric)))
+    else:
+        try:
+            values = np.loadtxt(
+                lines,
+                delimiter=",",
+                usecols=numeric,
+                dtype=np.float64,
+                comments=None,
+                ndmin=2,
+            )
+        except ValueError:
+            # Invalid values or missing columns: take the slow path.
+            values = _parse_numeric_columns(lines, numeric)
+
+    columns = {attributes[i]: values[:, j] for j, i in enumerate(numeric)}
+    if "label" in attributes:
+        i = attributes.index("label")
+        labels = np.empty(nrow, dtype=object)
+        labels[:] = [
+            fields[i].strip() if len(fields) > i else None
+            for fields in (line.split(",", i + 1) for line in lines)
+        ]
+        columns["label"] = labels
+    return {key: columns[key] for key in attributes}
+
+
 class GflowExtractParser:
-    def __init__(self, lines: list[str]):
-        self.lines = lines
-        self.count = 0
-        self.n = len(lines)
+    """
+    Parse the decoded lines of a section of the extract file.
 
-    def peek(self) -> str:
-        return self.lines[self.count]
+    The lines are taken one by one from an iterator, so that the section is
+    never held in memory as a whole: the rows of a block are converted to
+    arrays ``BLOCK_ROWS`` at a time, after which their text is dropped.
+    ``next_line`` is the line to advance to, None at the end of the section.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self.lines = iter(lines)
+        self.next_line = next(self.lines, None)
 
     def advance(self) -> str:
-        line = self.peek()
-        self.count += 1
+        line = self.next_line
+        if line is None:
+            raise ValueError("Unexpected end of the section")
+        self.next_line = next(self.lines, None)
         return line
 
     def done(self) -> bool:
-        return self.count >= (self.n - 1)
+        return self.next_line is None
 
     @staticmethod
     def _end_of_block(line) -> bool:
         return line.startswith("*") or line.startswith("!")
 
-    def advance_block(self, attributes) -> list[dict]:
-        line = self.peek()
-        records = []
-        while not self._end_of_block(line):
-            line = self.advance()[1:]
-            record = {}
-            for key, value in zip(attributes, line.split(",")):
-                # GFLOW seems to write null bytes in some places
-                value = value.strip().replace("\x00", "")
-                # The XTR file contains almost solely floating point values.
-                # The exception is the labels, which should remain a string.
-                if key == "label":
-                    record[key] = value
-                else:
-                    try:
-                        record[key] = float(value)
-                    except ValueError:
-                        record[key] = None
-            records.append(record)
-            line = self.peek()
-        return records
-
-
-def extraction_to_layers(path, crs, gpkg_path):
-    with open(path) as f:
-        lines = f.readlines()
-
-    parser = GflowExtractParser(lines)
-    layers = []
-    while not parser.done():
-        line = parser.advance().strip()
-        ExtractionClass = MAPPING.get(line, None)
-        if ExtractionClass is not None:
-            extraction = ExtractionClass(parser, crs)
-            # TODO: set layer styling
-            gpkg_layers = extraction.write(gpkg_path)
-            layers.extend(gpkg_layers)
-
-    return layers
+    def advance_block(self, attributes) -> Dict[str, np.ndarray]:
+        # The block runs up to the next header, or the end of the section.
+        chunks = []
+        lines = []
+        while not self.done() and not self._end_of_block(self.next_line):
+            lines.append(self.advance()[1:])
+            if len(lines) == BLOCK_ROWS:
+                chunks.append(parse_block(lines, attributes))
+                lines = []
+        if lines or not chunks:
+            chunks.append(parse_block(lines, attributes))
+        if len(chunks) == 1:
+            return chunks[0]
+        return {
+            key: np.concatenate([chunk[key] for chunk in chunks]) for key in attributes
+        }
+
+
+def requested_headers(output_options) -> List[str]:
+    """
+    Return the headers in MAPPING of the results requested in the
+    OutputOptions, e.g. only the test points if only piezometer is checked.
+    """
+    return [
+        header
+        for header, extraction in extraction_types().items()
+        if getattr(output_options, extraction.output_option)
+    ]
+
+
+def parse_sections(path, sections: List[Section]) -> List[Any]:
+    """
+    Parse the sections of the extract file, in parallel.
+
+    The file is memory-mapped; every section is decoded and parsed on its own,
+    streaming its lines from the mapped bytes. Only NumPy arrays are created
+    here, no QGIS objects.
+    """
+    if not sections:
+        return []
+
+    def parse(section: Section) -> Any:
+        parser = GflowExtractParser(ExtractIndex.iter_lines(buffer, section))
+        return extraction_types()[section.header].parse(parser)
+
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+                return list(pool.map(parse, sections))
+
+
+def extraction_to_layers(
+    path,
+    crs,
+    writer: "GeoPackageWriter",
+    headers: Optional[Iterable[str]] = None,
+) -> List[str]:
+    """
+    Convert the sections of the extract file to GeoPackage layers.
+
+    Parameters
+    ----------
+    path: Path or str
+        Path to the extract file.
+    crs: QgsCoordinateReferenceSystem
+        Coordinate reference system of the layers.
+    writer: GeoPackageWriter
+        The GeoPackage to write the layers to.
+    headers: Iterable[str], optional
+        Headers in MAPPING of the sections to convert. Defaults to all.
+
+    Returns
+    -------
+    layernames: List[str]
+        The names of the written layers; these can be opened once the
+        writer has committed.
+
+    """
+    index = ExtractIndex.open(path, EXTRACTION_MODULES)
+    sections = index.select(headers)
+    layernames = []
+    for section, columns in zip(sections, parse_sections(path, sections), strict=True):
+        extraction = extraction_types()[section.header](columns, crs)
+        # TODO: set layer styling
+        layernames.extend(extraction.write(writer))
+
+    return layernames
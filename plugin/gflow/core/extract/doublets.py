@@ -1,12 +1,10 @@
 import abc
-from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
 from gflow.core.extract.extraction_base import Extraction
-from gflow.core.memory_layer import (
-    LinestringMemoryLayer,
-    PolygonMemoryLayer,
-    PointMemoryLayer,
-)
-from gflow.core import geopackage
+from gflow.core.geopackage import GeoPackageWriter
 
 
 class DoubletExtraction(Extraction, abc.ABC):
@@ -31,64 +29,66 @@ class DoubletExtraction(Extraction, abc.ABC):
         "label",
     )
 
-    def __init__(self, parser, crs):
-        line_records = self.parse(parser)
-        node_records = self.parse_nodes(parser)
-
-        line_x = []
-        line_y = []
-        for row in node_records:
-            line_x.append(row["x"])
-            line_y.append(row["y"])
-            row["x"] = row.pop("xc")
-            row["y"] = row.pop("yc")
-
-        line_records[0]["x"] = line_x
-        line_records[0]["y"] = line_y
-        self.line_layer = self._create_memory_layer(crs, self.name, self.attributes)
-        self.node_layer = self._create_memory_layer(
-            crs, self.node_name, self.node_attributes, layer_class=PointMemoryLayer
-        )
-        self.line_layer.add_features_from_records(line_records)
-        self.node_layer.add_features_from_records(node_records)
+    def __init__(self, columns, crs):
+        line_columns, node_columns = columns
+        # The nodes form the line. The node points are the centers: like the
+        # line and node records, store these in x and y.
+        node_columns = dict(node_columns)
+        self.line_xy = np.column_stack((node_columns["x"], node_columns["y"]))
+        node_columns["x"] = node_columns.pop("xc")
+        node_columns["y"] = node_columns.pop("yc")
+        self.columns = line_columns
+        self.node_columns = node_columns
+        self.crs = crs
         return
 
+    def geometry(self) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = np.zeros(len(self.columns["string#"]) + 1, dtype=np.int64)
+        offsets[1:] = len(self.line_xy)
+        return self.line_xy, offsets
+
+    def node_geometry(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self._point_geometry(self.node_columns["x"], self.node_columns["y"])
+
+    @classmethod
+    def parse(cls, parser):
+        line_columns = parser.advance_block(cls.attributes)
+        return line_columns, cls.parse_nodes(parser)
+
     @classmethod
     def parse_nodes(cls, parser):
         parser.advance()  # skip another header
-        node_records = parser.advance_block(cls.node_attributes)
-        return node_records
+        return parser.advance_block(cls.node_attributes)
 
-    def write(self, path):
-        newfile = not Path(path).exists()
-        written_line = geopackage.write_layer(
-            path, self.line_layer.layer, self.name, newfile=newfile
+    def write(self, writer: GeoPackageWriter) -> List[str]:
+        written_line = self._write(
+            writer, self.name, self.attributes, self.columns, self.geometry()
         )
-        written_node = geopackage.write_layer(
-            path, self.node_layer.layer, self.node_name, newfile=False
+        written_node = self._write(
+            writer,
+            self.node_name,
+            self.node_attributes,
+            self.node_columns,
+            self.node_geometry(),
+            geometry_type="Point",
         )
         return [written_node, written_line]
 
 
 class OpenSlurryWallExtraction(DoubletExtraction):
+    geometry_type = "Linestring"
     name = "gflow Open Slurry Wall"
     node_name = "gflow Open Slurry Wall Nodes"
 
-    @classmethod
-    def layer_class(cls):
-        return LinestringMemoryLayer
-
 
 class ClosedSlurryWallExtraction(DoubletExtraction):
+    geometry_type = "Polygon"
     name = "gflow Closed Slurry Wall"
     node_name = "gflow Closed Slurry Wall Nodes"
 
-    @classmethod
-    def layer_class(cls):
-        return PolygonMemoryLayer
-
 
 class InhomogeneityExtraction(DoubletExtraction):
+    geometry_type = "Polygon"
     name = "gflow Inhomogeneity"
     node_name = "gflow Inhomogeneity Nodes"
     attributes = (
@@ -116,7 +116,3 @@ class InhomogeneityExtraction(DoubletExtraction):
         "delta_P_cntr%",
         "label",
     )
-
-    @classmethod
-    def layer_class(cls):
-        return PolygonMemoryLayer
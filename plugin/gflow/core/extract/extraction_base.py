@@ -1,58 +1,76 @@
 import abc
-from pathlib import Path
-from typing import Any
+from typing import Dict, List, Optional, Tuple
 
-from PyQt5.QtCore import QVariant
-
-from qgis.core import QgsVectorLayer, QgsField
+import numpy as np
 
 from gflow.core import geopackage
 
+COORDINATES = ("x", "y", "x1", "y1", "x2", "y2", "xc", "yc")
+
 
 class Extraction(abc.ABC):
-    def __init__(self, parser, crs):
-        records = self.parse(parser)
-        self.memory_layer = self._create_memory_layer(crs, self.name, self.attributes)
-        self.memory_layer.add_features_from_records(records)
-        return
+    # The field of OutputOptions which requests this result.
+    output_option = "discharge"
+    # The geometry type of the layer: "Point", "Linestring", or "Polygon".
+    geometry_type = "Point"
 
-    @classmethod
-    @abc.abstractmethod
-    def layer_class(cls):
-        pass
+    def __init__(self, columns, crs):
+        self.columns = columns
+        self.crs = crs
+        return
 
     @classmethod
     def parse(cls, parser):
         return parser.advance_block(cls.attributes)
 
-    @classmethod
-    def _create_memory_layer(
-        cls, crs: Any, name: str, attributes: list, layer_class=None
-    ) -> QgsVectorLayer:
+    @staticmethod
+    def _fields(attributes) -> List[Tuple[str, str]]:
         fields = []
         for name in attributes:
             # Skip the coordinates.
-            if name in ("x", "y", "x1", "y1", "x2", "y2", "xc", "yc"):
+            if name in COORDINATES:
                 continue
             # The extraction file contains exclusively real numbers, except for
             # the label column.
             elif name == "label":
-                field = QgsField(name, QVariant.String)
+                fields.append((name, "TEXT"))
             else:
-                field = QgsField(name, QVariant.Double)
-            fields.append(field)
+                fields.append((name, "REAL"))
+        return fields
 
-        if layer_class is None:
-            layer_class = (
-                cls.layer_class()
-            )  # PointMemoryLayer, LineStringMemoryLayer, etc.
+    @staticmethod
+    def _point_geometry(x, y) -> Tuple[np.ndarray, np.ndarray]:
+        return np.column_stack((x, y)), np.arange(len(x) + 1)
 
-        memory_layer = layer_class(name=name, crs=crs, attributes=fields)
-        return memory_layer
+    def geometry(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The vertices of all features, and the start of every feature."""
+        return self._point_geometry(self.columns["x"], self.columns["y"])
+
+    def _write(
+        self,
+        writer: geopackage.GeoPackageWriter,
+        name: str,
+        attributes,
+        columns: Dict[str, np.ndarray],
+        geometry: Tuple[np.ndarray, np.ndarray],
+        geometry_type: Optional[str] = None,
+    ):
+        if geometry_type is None:
+            geometry_type = self.geometry_type
+        xy, offsets = geometry
+        writer.write_features(
+            name,
+            geometry_type,
+            self.crs,
+            self._fields(attributes),
+            columns,
+            xy,
+            offsets,
+        )
+        return name
 
-    def write(self, path):
-        newfile = not Path(path).exists()
-        written = geopackage.write_layer(
-            path, self.memory_layer.layer, self.name, newfile=newfile
+    def write(self, writer: geopackage.GeoPackageWriter) -> List[str]:
+        written = self._write(
+            writer, self.name, self.attributes, self.columns, self.geometry()
         )
         return [written]
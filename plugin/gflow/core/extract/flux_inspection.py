@@ -1,2 +1,3 @@
 class FluxInspectionExtraction(Extraction):
+    output_option = "flux_inspector"
     attributes = ("label", "normal_flow")
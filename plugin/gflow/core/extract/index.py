@@ -0,0 +1,220 @@
+"""
+Index the sections of the GFLOW extract (.XTR) file.
+
+The extract file of a large model is big, and usually only some of its
+sections are of interest. Rather than parsing it top to bottom, the file is
+memory-mapped and scanned once for the section headers. The byte offsets and
+row counts of the sections are stored in a small sidecar file next to the
+extract file, so that reopening the results of a model does not require
+another scan. The sections can then be decoded on demand, independently of
+each other.
+"""
+
+import json
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import (
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+# Increment when the content of the sidecar file changes.
+INDEX_VERSION = 1
+# Lines starting with either character are headers, not data. Matching the
+# preceding newline is much faster than a multiline "^" anchor.
+HEADER = re.compile(rb"\n([!*][^\n]*)")
+# The file contains ASCII; latin-1 decodes any byte, so never fails.
+ENCODING = "latin-1"
+# Number of bytes of a section to decode at once.
+CHUNK_SIZE = 1 << 20
+
+
+class Section(NamedTuple):
+    """
+    Location of a section in the extract file.
+
+    Attributes
+    ----------
+    header: str
+        The stripped header line, e.g. "! head specified line sinks".
+    start: int
+        Byte offset of the first line after the header.
+    end: int
+        Byte offset of the next section header, or the end of the file.
+    nrow: int
+        Number of data lines; sub-headers are not counted.
+
+    """
+
+    header: str
+    start: int
+    end: int
+    nrow: int
+
+
+def _count_lines(buffer, start: int, end: int) -> int:
+    if end <= start:
+        return 0
+    data = buffer[start:end]
+    return data.count(b"\n") + (not data.endswith(b"\n"))
+
+
+def _header_lines(buffer) -> Iterator[Tuple[int, int, str]]:
+    """Yield the start, end, and stripped text of every header line."""
+    if buffer[:1] in (b"!", b"*"):
+        end = buffer.find(b"\n")
+        end = len(buffer) if end == -1 else end
+        yield 0, end, buffer[:end].decode(ENCODING).strip()
+    for match in HEADER.finditer(buffer):
+        yield match.start(1), match.end(1), match.group(1).decode(ENCODING).strip()
+
+
+def _close(buffer, current: List, end: int) -> Section:
+    header, start, nsub = current
+    return Section(header, start, end, _count_lines(buffer, start, end) - nsub)
+
+
+def index_sections(buffer, headers: Collection[str]) -> List[Section]:
+    """
+    Find the sections of the headers in a single pass over the buffer.
+
+    A section runs until the next header starting with "!", or the next
+    header in ``headers``. Other headers starting with "*" are sub-headers,
+    e.g. of the nodes of a slurry wall, and are part of the section.
+
+    Parameters
+    ----------
+    buffer: bytes or mmap
+        Content of the extract file.
+    headers: Collection[str]
+        Headers of the sections to index.
+
+    Returns
+    -------
+    sections: List[Section]
+        In the order of the file. A header may occur more than once.
+
+    """
+    headers = set(headers)
+    sections = []
+    current = None
+    for line_start, line_end, text in _header_lines(buffer):
+        if text.startswith("!") or text in headers:
+            if current is not None:
+                sections.append(_close(buffer, current, line_start))
+                current = None
+            if text in headers:
+                # Header, start of the section, number of sub-headers.
+                current = [text, min(line_end + 1, len(buffer)), 0]
+        elif current is not None:
+            current[2] += 1
+    if current is not None:
+        sections.append(_close(buffer, current, len(buffer)))
+    return sections
+
+
+class ExtractIndex:
+    """
+    The sections of an extract file, stored in a sidecar file.
+
+    The sidecar is only used if the size and modification time of the
+    extract file match, and if it indexes the same headers.
+    """
+
+    def __init__(self, path: Union[Path, str], sections: List[Section]):
+        self.path = Path(path)
+        self.sections = sections
+
+    @staticmethod
+    def sidecar_path(path: Union[Path, str]) -> Path:
+        path = Path(path)
+        return path.with_name(f"{path.name}.index.json")
+
+    @staticmethod
+    def _key(path: Path, headers: Collection[str]) -> Dict:
+        stat = os.stat(path)
+        return {
+            "version": INDEX_VERSION,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "headers": sorted(headers),
+        }
+
+    @classmethod
+    def _read_sidecar(cls, path: Path, key: Dict) -> Optional[List[Section]]:
+        try:
+            with open(cls.sidecar_path(path)) as f:
+                content = json.load(f)
+            if content["key"] != key:
+                return None
+            return [Section(*section) for section in content["sections"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def _write_sidecar(cls, path: Path, key: Dict, sections: List[Section]) -> None:
+        # The index is an optimization: failing to write it is not an error.
+        try:
+            with open(cls.sidecar_path(path), "w") as f:
+                json.dump({"key": key, "sections": sections}, f)
+        except OSError:
+            pass
+        return
+
+    @classmethod
+    def open(cls, path: Union[Path, str], headers: Collection[str]) -> "ExtractIndex":
+        """
+        Read the index from the sidecar file, or scan the extract file if the
+        sidecar is missing or outdated.
+        """
+        path = Path(path)
+        key = cls._key(path, headers)
+        sections = cls._read_sidecar(path, key)
+        if sections is None:
+            if key["size"] == 0:
+                # Empty files cannot be memory-mapped.
+                sections = []
+            else:
+                with open(path, "rb") as f:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                        sections = index_sections(buffer, headers)
+            cls._write_sidecar(path, key, sections)
+        return cls(path, sections)
+
+    def select(self, headers: Optional[Iterable[str]] = None) -> List[Section]:
+        """Return the sections of the headers, all sections if None."""
+        if headers is None:
+            return list(self.sections)
+        headers = set(headers)
+        return [section for section in self.sections if section.header in headers]
+
+    @staticmethod
+    def iter_lines(
+        buffer, section: Section, chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[str]:
+        """
+        Decode the lines of a section one by one, reading ``chunk_size`` bytes
+        of the buffer at a time.
+        """
+        remainder = b""
+        for start in range(section.start, section.end, chunk_size):
+            end = min(start + chunk_size, section.end)
+            *complete, remainder = (remainder + buffer[start:end]).split(b"\n")
+            for line in complete:
+                yield line.decode(ENCODING)
+        if remainder:
+            yield remainder.decode(ENCODING)
+
+    @staticmethod
+    def lines(buffer, section: Section) -> List[str]:
+        """Decode the lines of a section."""
+        return list(ExtractIndex.iter_lines(buffer, section))
@@ -1,22 +1,19 @@
 import abc
+from typing import Tuple
+
+import numpy as np
 
-from gflow.core.memory_layer import LinestringMemoryLayer
 from gflow.core.extract.extraction_base import Extraction
 
 
 class LineSinkExtraction(Extraction, abc.ABC):
-    def __init__(self, parser, crs):
-        records = self.parse(parser)
-        for row in records:
-            row["x"] = (row.pop("x1"), row.pop("x2"))
-            row["y"] = (row.pop("y1"), row.pop("y2"))
-        self.memory_layer = self._create_memory_layer(crs, self.name, self.attributes)
-        self.memory_layer.add_features_from_records(records)
-        return
+    geometry_type = "Linestring"
 
-    @classmethod
-    def layer_class(cls):
-        return LinestringMemoryLayer
+    def geometry(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Every line sink is a single segment.
+        x = np.column_stack((self.columns["x1"], self.columns["x2"])).ravel()
+        y = np.column_stack((self.columns["y1"], self.columns["y2"])).ravel()
+        return np.column_stack((x, y)), np.arange(0, len(x) + 1, 2)
 
 
 class HeadLineSinkExtraction(LineSinkExtraction):
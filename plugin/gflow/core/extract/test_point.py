@@ -1,9 +1,10 @@
 from gflow.core.extract.extraction_base import Extraction
-from gflow.core.memory_layer import PointMemoryLayer
 
 
 class TestPointExtraction(Extraction):
     name = "gflow Test Point"
+    output_option = "piezometer"
+    geometry_type = "Point"
     attributes = (
         "x",
         "y",
@@ -21,7 +22,3 @@ class TestPointExtraction(Extraction):
         "vz",
         "label",
     )
-
-    @classmethod
-    def layer_class(cls):
-        return PointMemoryLayer
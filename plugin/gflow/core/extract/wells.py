@@ -1,11 +1,8 @@
 from gflow.core.extract.extraction_base import Extraction
-from gflow.core.memory_layer import PointMemoryLayer
 
 
 class WellExtraction(Extraction):
-    @classmethod
-    def layer_class(cls):
-        return PointMemoryLayer
+    geometry_type = "Point"
 
 
 class DischargeWellExtraction(WellExtraction):
@@ -1,8 +1,18 @@
-"""Extract the content of QGIS attribute tables to dictionaries."""
+"""Extract the content of QGIS attribute tables to dictionaries or columns."""
 
-from typing import Any, Dict, List, Tuple
+from typing import Any, Container, List, Optional, Sequence, Tuple
 
-from qgis.core import NULL, QgsVectorLayer
+import numpy as np
+from qgis.core import NULL, QgsFeatureRequest, QgsGeometry, QgsVectorLayer, QgsWkbTypes
+
+from gflow.core import geopackage
+from gflow.core.table import ColumnarTable
+from gflow.core.wkb import GeometryBlock, gpkg_to_wkb
+
+# layer.geometryType().Null is an enumerator, which isn't available in QGIS 3.28 LTR.
+# So just use the integer representation instead for now.
+# FUTURE: GEOM_TYPE_NULL = geomtype.Null
+GEOM_TYPE_NULL = 4
 
 
 def remove_zero_length(geometry) -> List:
@@ -17,6 +27,73 @@ def remove_zero_length(geometry) -> List:
     return coordinates
 
 
+def remove_zero_length_batched(
+    xy: np.ndarray, offsets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Remove repeated vertices of all features at once.
+
+    Produces the same vertices as ``remove_zero_length`` for every feature.
+
+    Parameters
+    ----------
+    xy : np.ndarray of floats with shape (n_vertex, 2)
+        The vertices of all features.
+    offsets : np.ndarray of integers with shape (n_feature + 1,)
+        Start of every feature in xy.
+
+    Returns
+    -------
+    xy: np.ndarray of floats with shape (n_kept, 2)
+    offsets: np.ndarray of integers with shape (n_feature + 1,)
+
+    """
+    keep = np.ones(len(xy), dtype=bool)
+    keep[1:] = (xy[1:] != xy[:-1]).any(axis=1)
+    # The first vertex of a feature is never compared to the previous feature.
+    nonempty = np.diff(offsets) > 0
+    keep[offsets[:-1][nonempty]] = True
+    kept = np.zeros(len(xy) + 1, dtype=np.int64)
+    np.cumsum(keep, out=kept[1:])
+    return xy[keep], kept[offsets]
+
+
+def remove_closing_vertex_batched(
+    xy: np.ndarray, offsets: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Remove the last vertex of every feature, like ``[:-1]`` per feature."""
+    nonempty = np.diff(offsets) > 0
+    keep = np.ones(len(xy), dtype=bool)
+    keep[offsets[1:][nonempty] - 1] = False
+    removed = np.zeros(len(offsets), dtype=np.int64)
+    np.cumsum(nonempty, out=removed[1:])
+    return xy[keep], offsets - removed
+
+
+def to_column(raw: Sequence[Any], numeric: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert the raw attribute values of a single field to an array.
+
+    Returns the values and the null mask. Integer values are stored as int64
+    with 0 for NULL, so that they are rendered as integers; other numeric
+    values as float64 with NaN for NULL, and all other values as objects with
+    None for NULL.
+    """
+    isnull = np.fromiter((value == NULL for value in raw), dtype=bool, count=len(raw))
+    valid = [value for value, a in zip(raw, isnull.tolist(), strict=True) if not a]
+    if numeric and valid and all(type(value) is int for value in valid):
+        fill = 0
+        column = np.empty(len(raw), dtype=np.int64)
+    elif numeric:
+        fill = np.nan
+        column = np.empty(len(raw), dtype=np.float64)
+    else:
+        fill = None
+        column = np.empty(len(raw), dtype=object)
+    column[:] = [fill if a else v for v, a in zip(raw, isnull.tolist(), strict=True)]
+    return column, isnull
+
+
 class ExtractorMixin:
     """Mixin class to extract all data from QgsVectorLayers."""
 
@@ -25,38 +102,135 @@ class ExtractorMixin:
         return sorted(range(len(seq)), key=seq.__getitem__)
 
     @staticmethod
-    def extract_coordinates(geometry):
-        coordinates = []
-        for vertex in geometry.vertices():
-            coordinates.append((vertex.x(), vertex.y()))
-        centroid = geometry.centroid().asPoint()
-        return (centroid.x(), centroid.y()), coordinates
+    def feature_ids(layer: QgsVectorLayer) -> List[int]:
+        """Return the feature IDs in iteration order, without fetching any data."""
+        request = QgsFeatureRequest()
+        request.setNoAttributes()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        return [feature.id() for feature in layer.getFeatures(request)]
+
+    @staticmethod
+    def geometry_wkb(geometry: QgsGeometry) -> Optional[bytes]:
+        if geometry.isNull():
+            return None
+        # Circular strings and such are not supported by GFLOW: approximate
+        # them by straight segments, like QgsGeometry.vertices() would.
+        if QgsWkbTypes.isCurvedType(geometry.wkbType()):
+            geometry = QgsGeometry(geometry.constGet().segmentize())
+        return geometry.asWkb().data()
 
     @classmethod
-    def table_to_records(cls, layer: QgsVectorLayer) -> List[Dict[str, Any]]:
-        # layer.geometryType().Null is an enumerator, which isn't available in QGIS 3.28 LTR.
-        # So just use the integer representation instead for now.
-        # FUTURE: GEOM_TYPE_NULL = geomtype.Null
-        GEOM_TYPE_NULL = 4
-        geomtype = layer.geometryType()
-        features = []
-        for feature in layer.getFeatures():
-            data = feature.attributeMap()
-            for key, value in data.items():
-                if value == NULL:
-                    data[key] = None
-
-            if geomtype != GEOM_TYPE_NULL:
-                geometry = feature.geometry()
-                if geometry.isNull():
-                    centroid = None
-                    coordinates = None
-                else:
-                    centroid, coordinates = cls.extract_coordinates(geometry)
-                data["centroid"], data["geometry"] = centroid, coordinates
-
-            features.append(data)
-        return features
+    def table_to_columns(
+        cls,
+        layer: QgsVectorLayer,
+        fields: Sequence[str],
+        fids: Optional[Sequence[int]] = None,
+    ) -> ColumnarTable:
+        """
+        Read the requested fields of all features in a single provider pass.
+
+        Parameters
+        ----------
+        layer: QgsVectorLayer
+            The layer to read, including its uncommitted edits.
+        fields: Sequence[str]
+            Names of the fields to fetch. Other fields are not requested from
+            the data provider.
+        fids: Sequence[int], optional
+            Feature IDs to fetch. Defaults to all features.
+
+        Returns
+        -------
+        table: ColumnarTable
+
+        """
+        layer_fields = layer.fields()
+        fields = list(fields)
+        indices = [layer_fields.indexFromName(name) for name in fields]
+        has_geometry = layer.geometryType() != GEOM_TYPE_NULL
+
+        request = QgsFeatureRequest()
+        request.setSubsetOfAttributes(indices)
+        if fids is not None:
+            request.setFilterFids(list(fids))
+        if not has_geometry:
+            request.setFlags(QgsFeatureRequest.NoGeometry)
+
+        fid = []
+        values = []
+        wkb = []
+        for feature in layer.getFeatures(request):
+            fid.append(feature.id())
+            attributes = feature.attributes()
+            values.append([attributes[i] for i in indices])
+            if has_geometry:
+                wkb.append(cls.geometry_wkb(feature.geometry()))
+
+        # Transpose the rows into one sequence of raw values per field.
+        raw_columns = (
+            list(zip(*values, strict=True)) if values else [() for _ in fields]
+        )
+        columns = {}
+        null = {}
+        for name, index, raw in zip(fields, indices, raw_columns, strict=True):
+            numeric = layer_fields.at(index).isNumeric()
+            columns[name], null[name] = to_column(raw, numeric)
+
+        geometry = GeometryBlock.from_wkb(wkb) if has_geometry else None
+        return ColumnarTable(np.array(fid, dtype=np.int64), columns, null, geometry)
+
+    @staticmethod
+    def geopackage_to_columns(
+        path: str,
+        layername: str,
+        fields: Sequence[str],
+        skip: Container[int] = (),
+    ) -> Tuple[List[int], ColumnarTable]:
+        """
+        Read the requested fields of all features directly from the
+        GeoPackage, like ``table_to_columns``.
+
+        No QGIS objects are used: this may run in another thread. Uncommitted
+        edits of the layer are not included.
+
+        Parameters
+        ----------
+        path: str
+            Path to the GeoPackage file.
+        layername: str
+            Name of the table of the layer in the GeoPackage.
+        fields: Sequence[str]
+            Names of the fields to read, which become the columns of the table.
+        skip: Container[int], optional
+            Feature IDs to leave out of the table, e.g. because they have been
+            processed before.
+
+        Returns
+        -------
+        fids: List[int]
+            The feature IDs of all features, including the skipped ones.
+        table: ColumnarTable
+            The features which are not skipped.
+
+        """
+        fids, rows, numeric, blobs = geopackage.read_table(path, layername, fields)
+        read = [i for i, fid in enumerate(fids) if fid not in skip]
+        if len(read) < len(fids):
+            rows = [rows[i] for i in read]
+            if blobs is not None:
+                blobs = [blobs[i] for i in read]
+        raw_columns = list(zip(*rows, strict=True)) if rows else [() for _ in fields]
+        columns = {}
+        null = {}
+        for name, raw, isnumeric in zip(fields, raw_columns, numeric, strict=True):
+            # sqlite returns None rather than the QGIS NULL.
+            raw = [NULL if value is None else value for value in raw]
+            columns[name], null[name] = to_column(raw, isnumeric)
+        geometry = None
+        if blobs is not None:
+            geometry = GeometryBlock.from_wkb([gpkg_to_wkb(blob) for blob in blobs])
+        table_fids = np.array(fids, dtype=np.int64)[read]
+        return fids, ColumnarTable(table_fids, columns, null, geometry)
 
     @staticmethod
     def point_xy(row) -> Tuple[List[float], List[float]]:
@@ -72,3 +246,19 @@ class ExtractorMixin:
         # GFLOW does not like the last vertex to be identical to the first; it
         # is assumed.
         return remove_zero_length(row["geometry"])[:-1]
+
+    @staticmethod
+    def points_xy(geometry: GeometryBlock) -> np.ndarray:
+        """The first vertex of every feature, see ``point_xy``."""
+        return geometry.xy[geometry.feature_offsets[:-1]]
+
+    @staticmethod
+    def linestrings_xy(geometry: GeometryBlock) -> Tuple[np.ndarray, np.ndarray]:
+        """The vertices of all features, see ``linestring_xy``."""
+        return remove_zero_length_batched(geometry.xy, geometry.feature_offsets)
+
+    @staticmethod
+    def polygons_xy(geometry: GeometryBlock) -> Tuple[np.ndarray, np.ndarray]:
+        """The vertices of all features, see ``polygon_xy``."""
+        xy, offsets = remove_zero_length_batched(geometry.xy, geometry.feature_offsets)
+        return remove_closing_vertex_batched(xy, offsets)
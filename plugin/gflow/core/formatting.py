@@ -1,12 +1,16 @@
 """Format the content of a collection of dictionaries into GFLOW text input."""
 
+import io
+import string
 import textwrap
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Iterable, Iterator, TextIO, Tuple
 
 import numpy as np
 
 from gflow.widgets.compute_widget import OutputOptions
 
+WRITE_BUFFER_SIZE = 1 << 20
+
 
 def round_spacing(ymin: float, ymax: float) -> float:
     """
@@ -80,65 +84,31 @@ def first(data: dict) -> Any:
     return next(iter(data.values()))
 
 
-def concat(data: dict) -> str:
-    lines = []
+def element_lines(data: dict) -> Iterator[str]:
     for value in data.values():
-        lines.extend(value.rendered)
-    return "\n".join(lines)
+        yield from value.rendered
 
 
-def data_to_gflow(
-    gflow_data: Dict[str, Any], name: str, output_options: OutputOptions
-) -> str:
-    # GFLOW wants uniform flow as qx, qy
-    aquifer = first(gflow_data["Aquifer"])
-    uniflow = first(gflow_data["Uniform Flow"])
-    domain = first(gflow_data["Domain"])
+def write_joined(f: TextIO, pieces: Iterable[str]) -> None:
+    """Write the pieces separated by newlines, without joining them first."""
+    for i, piece in enumerate(pieces):
+        if i > 0:
+            f.write("\n")
+        f.write(piece)
 
-    inhomogeneities = "\n".join(
-        (
-            concat(gflow_data["Barrier"]),
-            concat(gflow_data["Closed Barrier"]),
-            concat(gflow_data["Inhomogeneity"]),
-        )
-    )
-
-    linesinks = "\n".join(
-        (
-            concat(gflow_data["Head Line Sink"]),
-            concat(gflow_data["Discharge Line Sink"]),
-            concat(gflow_data["Drain Line Sink"]),
-            concat(gflow_data["Gallery Line Sink"]),
-            concat(gflow_data["Far Field Line Sink"]),
-            concat(gflow_data["Lake Line Sink"]),
-        )
-    )
-
-    observations = concat(gflow_data["Piezometer"])
-
-    particles = "\n".join(
-        (
-            concat(gflow_data["Forward Particle"]),
-            concat(gflow_data["Backward Particle"]),
-        )
-    )
 
-    data = {
-        "name": name,
-        "aquifer": aquifer.rendered[0],
-        "uniflow": uniform_flow_entry(aquifer.data, uniflow.data),
-        "reference": uniflow.rendered[0],
-        "wells": concat(gflow_data["Well"]),
-        "headwells": concat(gflow_data["Head Well"]),
-        "linesinks": linesinks,
-        "barrier": concat(gflow_data["Barrier"]),
-        "inhomogeneities": inhomogeneities,
-        "observations": observations,
-        "gridspec": headgrid_entry(domain.data, spacing=output_options.spacing),
-        "particles": particles,
-    }
+def write_groups(f: TextIO, gflow_data: Dict[str, Any], *keys: str) -> None:
+    """
+    Write the rendered lines of the elements of one or more groups, all
+    separated by newlines.
+    """
+    for i, key in enumerate(keys):
+        if i > 0:
+            f.write("\n")
+        write_joined(f, element_lines(gflow_data[key]))
+
 
-    content = textwrap.dedent("""
+TEMPLATE = textwrap.dedent("""
         error {name}-error.log
         yes
         message {name}-message.log
@@ -214,5 +184,73 @@ def data_to_gflow(
         go
         quit
         stop
-    """).format(**data)
-    return content
+    """)
+# The template split into (literal text, field name) pairs.
+TEMPLATE_PIECES = [
+    (literal, field) for literal, field, _, _ in string.Formatter().parse(TEMPLATE)
+]
+
+
+def write_gflow(
+    f: TextIO, gflow_data: Dict[str, Any], name: str, output_options: OutputOptions
+) -> None:
+    """
+    Write the GFLOW input to an open text file.
+
+    The template sections and the rendered lines of the elements are written
+    one by one, so that the content is never assembled in memory.
+    """
+    # GFLOW wants uniform flow as qx, qy
+    aquifer = first(gflow_data["Aquifer"])
+    uniflow = first(gflow_data["Uniform Flow"])
+    domain = first(gflow_data["Domain"])
+
+    data = {
+        "name": name,
+        "aquifer": aquifer.rendered[0],
+        "uniflow": uniform_flow_entry(aquifer.data, uniflow.data),
+        "reference": uniflow.rendered[0],
+        "wells": ("Well",),
+        "headwells": ("Head Well",),
+        "linesinks": (
+            "Head Line Sink",
+            "Discharge Line Sink",
+            "Drain Line Sink",
+            "Gallery Line Sink",
+            "Far Field Line Sink",
+            "Lake Line Sink",
+        ),
+        "barrier": ("Barrier",),
+        "inhomogeneities": ("Barrier", "Closed Barrier", "Inhomogeneity"),
+        "observations": ("Piezometer",),
+        "gridspec": headgrid_entry(domain.data, spacing=output_options.spacing),
+        "particles": ("Forward Particle", "Backward Particle"),
+    }
+
+    for literal, field in TEMPLATE_PIECES:
+        f.write(literal)
+        if field is None:
+            continue
+        value = data[field]
+        if isinstance(value, str):
+            f.write(value)
+        else:
+            write_groups(f, gflow_data, *value)
+    return
+
+
+def data_to_gflow(
+    gflow_data: Dict[str, Any], name: str, output_options: OutputOptions
+) -> str:
+    f = io.StringIO()
+    write_gflow(f, gflow_data, name, output_options)
+    return f.getvalue()
+
+
+def write_gflow_file(
+    path: str, gflow_data: Dict[str, Any], name: str, output_options: OutputOptions
+) -> None:
+    # Stream the content to the file, rather than assembling it first.
+    with open(path, "w", buffering=WRITE_BUFFER_SIZE) as f:
+        write_gflow(f, gflow_data, name, output_options)
+    return
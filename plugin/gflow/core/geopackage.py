@@ -6,15 +6,210 @@ This module lightly wraps a few QGIS built in functions to:
     * List the layers of a geopackage
     * Write a layer to a geopackage
     * Remove a layer from a geopackage
+    * Read a table from a geopackage, without QGIS
+    * Write many layers to a geopackage in a single transaction, without
+      QgsVectorFileWriter
+
 
 """
 
 import sqlite3
 from contextlib import contextmanager
-from typing import List
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
+import numpy as np
+from PyQt5.QtCore import QVariant
 from qgis import processing
-from qgis.core import QgsVectorFileWriter, QgsVectorLayer
+from qgis.core import (
+    NULL,
+    QgsCoordinateReferenceSystem,
+    QgsField,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+
+from gflow.core.wkb import gpkg_envelope, to_gpkg_blobs, wkb_to_gpkg
+
+# The GeoPackage column types which QGIS reads as numbers.
+NUMERIC_TYPES = (
+    "INT",
+    "TINYINT",
+    "SMALLINT",
+    "MEDIUMINT",
+    "FLOAT",
+    "DOUBLE",
+    "REAL",
+    "BOOLEAN",
+)
+# The "GPKG" application id, and version 1.2 of the standard.
+GPKG_APPLICATION_ID = 0x47504B47
+GPKG_USER_VERSION = 10200
+GEOMETRY_COLUMN = "geom"
+GEOMETRY_TYPE_NAMES = {
+    "Point": "POINT",
+    "Linestring": "LINESTRING",
+    "Polygon": "POLYGON",
+}
+INTEGER_VARIANTS = (QVariant.Int, QVariant.UInt, QVariant.LongLong, QVariant.ULongLong)
+# The first id of SRS which are not defined by EPSG, as used by GDAL.
+CUSTOM_SRS_ID = 100000
+WGS84_WKT = (
+    'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,'
+    'AUTHORITY["EPSG","7030"]],AUTHORITY["EPSG","6326"]],'
+    'PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],'
+    'UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],'
+    'AUTHORITY["EPSG","4326"]]'
+)
+# The tables required by the GeoPackage standard, and the RTree extension.
+GPKG_TABLES = """
+CREATE TABLE IF NOT EXISTS gpkg_spatial_ref_sys (
+    srs_name TEXT NOT NULL,
+    srs_id INTEGER NOT NULL PRIMARY KEY,
+    organization TEXT NOT NULL,
+    organization_coordsys_id INTEGER NOT NULL,
+    definition TEXT NOT NULL,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS gpkg_contents (
+    table_name TEXT NOT NULL PRIMARY KEY,
+    data_type TEXT NOT NULL,
+    identifier TEXT UNIQUE,
+    description TEXT DEFAULT '',
+    last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')),
+    min_x DOUBLE,
+    min_y DOUBLE,
+    max_x DOUBLE,
+    max_y DOUBLE,
+    srs_id INTEGER,
+    CONSTRAINT fk_gc_r_srs_id FOREIGN KEY (srs_id)
+        REFERENCES gpkg_spatial_ref_sys(srs_id)
+);
+CREATE TABLE IF NOT EXISTS gpkg_geometry_columns (
+    table_name TEXT NOT NULL,
+    column_name TEXT NOT NULL,
+    geometry_type_name TEXT NOT NULL,
+    srs_id INTEGER NOT NULL,
+    z TINYINT NOT NULL,
+    m TINYINT NOT NULL,
+    CONSTRAINT pk_geom_cols PRIMARY KEY (table_name, column_name),
+    CONSTRAINT uk_gc_table_name UNIQUE (table_name),
+    CONSTRAINT fk_gc_tn FOREIGN KEY (table_name)
+        REFERENCES gpkg_contents(table_name),
+    CONSTRAINT fk_gc_srs FOREIGN KEY (srs_id)
+        REFERENCES gpkg_spatial_ref_sys (srs_id)
+);
+CREATE TABLE IF NOT EXISTS gpkg_extensions (
+    table_name TEXT,
+    column_name TEXT,
+    extension_name TEXT NOT NULL,
+    definition TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    CONSTRAINT ge_tce UNIQUE (table_name, column_name, extension_name)
+);
+"""
+DEFAULT_SRS = [
+    (
+        "Undefined cartesian SRS",
+        -1,
+        "NONE",
+        -1,
+        "undefined",
+        "undefined cartesian coordinate reference system",
+    ),
+    (
+        "Undefined geographic SRS",
+        0,
+        "NONE",
+        0,
+        "undefined",
+        "undefined geographic coordinate reference system",
+    ),
+    (
+        "WGS 84 geodetic",
+        4326,
+        "EPSG",
+        4326,
+        WGS84_WKT,
+        "longitude/latitude coordinates in decimal degrees on the WGS 84 spheroid",
+    ),
+]
+# The triggers which keep the RTree up to date when the table is edited later
+# on, e.g. by QGIS. GDAL provides the ST_ functions.
+RTREE_TRIGGERS = """
+CREATE TRIGGER "{rtree}_insert" AFTER INSERT ON "{table}"
+WHEN (new."{geom}" NOT NULL AND NOT ST_IsEmpty(NEW."{geom}"))
+BEGIN
+    INSERT OR REPLACE INTO "{rtree}" VALUES (
+        NEW."{fid}",
+        ST_MinX(NEW."{geom}"), ST_MaxX(NEW."{geom}"),
+        ST_MinY(NEW."{geom}"), ST_MaxY(NEW."{geom}")
+    );
+END;
+CREATE TRIGGER "{rtree}_update1" AFTER UPDATE OF "{geom}" ON "{table}"
+WHEN OLD."{fid}" = NEW."{fid}" AND
+    (NEW."{geom}" NOTNULL AND NOT ST_IsEmpty(NEW."{geom}"))
+BEGIN
+    INSERT OR REPLACE INTO "{rtree}" VALUES (
+        NEW."{fid}",
+        ST_MinX(NEW."{geom}"), ST_MaxX(NEW."{geom}"),
+        ST_MinY(NEW."{geom}"), ST_MaxY(NEW."{geom}")
+    );
+END;
+CREATE TRIGGER "{rtree}_update2" AFTER UPDATE OF "{geom}" ON "{table}"
+WHEN OLD."{fid}" = NEW."{fid}" AND
+    (NEW."{geom}" IS NULL OR ST_IsEmpty(NEW."{geom}"))
+BEGIN
+    DELETE FROM "{rtree}" WHERE id = OLD."{fid}";
+END;
+CREATE TRIGGER "{rtree}_update3" AFTER UPDATE ON "{table}"
+WHEN OLD."{fid}" != NEW."{fid}" AND
+    (NEW."{geom}" NOTNULL AND NOT ST_IsEmpty(NEW."{geom}"))
+BEGIN
+    DELETE FROM "{rtree}" WHERE id = OLD."{fid}";
+    INSERT OR REPLACE INTO "{rtree}" VALUES (
+        NEW."{fid}",
+        ST_MinX(NEW."{geom}"), ST_MaxX(NEW."{geom}"),
+        ST_MinY(NEW."{geom}"), ST_MaxY(NEW."{geom}")
+    );
+END;
+CREATE TRIGGER "{rtree}_update4" AFTER UPDATE ON "{table}"
+WHEN OLD."{fid}" != NEW."{fid}" AND
+    (NEW."{geom}" IS NULL OR ST_IsEmpty(NEW."{geom}"))
+BEGIN
+    DELETE FROM "{rtree}" WHERE id IN (OLD."{fid}", NEW."{fid}");
+END;
+CREATE TRIGGER "{rtree}_delete" AFTER DELETE ON "{table}"
+WHEN old."{geom}" NOT NULL
+BEGIN
+    DELETE FROM "{rtree}" WHERE id = OLD."{fid}";
+END;
+"""
+
+
+def register_functions(connection) -> None:
+    """
+    Register the SQL functions used by the RTree triggers, so that rows can
+    be inserted into or updated in a table with an RTree index.
+    """
+
+    def bound(i):
+        def function(blob):
+            envelope = gpkg_envelope(blob)
+            return None if envelope is None else envelope[i]
+
+        return function
+
+    for i, name in enumerate(("ST_MinX", "ST_MaxX", "ST_MinY", "ST_MaxY")):
+        connection.create_function(name, 1, bound(i), deterministic=True)
+    connection.create_function(
+        "ST_IsEmpty",
+        1,
+        lambda blob: int(gpkg_envelope(blob) is None),
+        deterministic=True,
+    )
+    return
 
 
 @contextmanager
@@ -28,6 +223,22 @@ def sqlite3_cursor(path):
         connection.close()
 
 
+@contextmanager
+def read_only_cursor(path):
+    """
+    Open a separate, read-only connection. These connections do not share any
+    state with QGIS, and may be used from other threads.
+    """
+    uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+    connection = sqlite3.connect(uri, uri=True)
+    cursor = connection.cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        connection.close()
+
+
 def layers(path: str) -> List[str]:
     """
     Return all layers that are present in the geopackage.
@@ -95,3 +306,597 @@ def remove_layer(path: str, layer: str) -> None:
         processing.run("native:spatialiteexecutesql", query)
     except Exception as exc:
         raise RuntimeError(f"Failed to remove layer with {query}") from exc
+
+
+def read_table(
+    path: str, layername: str, fields: Sequence[str]
+) -> Tuple[List[int], List[Tuple[Any, ...]], List[bool], Optional[List[bytes]]]:
+    """
+    Read the features of a layer directly from the geopackage.
+
+    Parameters
+    ----------
+    path: str
+        Path to the GeoPackage file
+    layername: str
+        Name of the table of the layer.
+    fields: Sequence[str]
+        Names of the fields to read.
+
+    Returns
+    -------
+    fids: List[int]
+        The feature IDs, as used by QGIS.
+    rows: List[tuple]
+        The values of the fields of every feature.
+    numeric: List[bool]
+        Whether the type of every field is numeric.
+    geometry: List of bytes or None, or None
+        The geometry blob of every feature, None for layers without geometry.
+
+    """
+    with read_only_cursor(path) as cursor:
+        cursor.execute(
+            "SELECT column_name FROM gpkg_geometry_columns WHERE table_name = ?",
+            (layername,),
+        )
+        result = cursor.fetchone()
+        geometry_column = result[0] if result else None
+
+        table_info = cursor.execute(f'PRAGMA table_info("{layername}")').fetchall()
+        types = {name: str(type_).upper() for _, name, type_, _, _, _ in table_info}
+        primary_key = next(name for _, name, _, _, _, pk in table_info if pk)
+        numeric = [types[name].startswith(NUMERIC_TYPES) for name in fields]
+
+        columns = [primary_key, *fields]
+        if geometry_column is not None:
+            columns.append(geometry_column)
+        selection = ", ".join(f'"{column}"' for column in columns)
+        cursor.execute(
+            f'SELECT {selection} FROM "{layername}" ORDER BY "{primary_key}"'
+        )
+        records = cursor.fetchall()
+
+    nfield = len(fields)
+    fids = [record[0] for record in records]
+    rows = [record[1 : nfield + 1] for record in records]
+    geometry = None
+    if geometry_column is not None:
+        geometry = [record[-1] for record in records]
+    return fids, rows, numeric, geometry
+
+
+def _sql_values(column: np.ndarray) -> List[Any]:
+    """Convert a column to values for sqlite, with None for NaN."""
+    if column.dtype.kind == "f":
+        isnull = np.isnan(column)
+        column = column.astype(object)
+        column[isnull] = None
+    return column.tolist()
+
+
+def execute_statements(cursor, script: str) -> None:
+    """
+    Execute the statements of a script one by one. Unlike
+    ``cursor.executescript``, this does not commit the current transaction.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            cursor.execute(statement)
+            statement = ""
+    return
+
+
+def create_geopackage_tables(cursor) -> None:
+    """Create the required GeoPackage tables, if they do not exist yet."""
+    (application_id,) = cursor.execute("PRAGMA application_id").fetchone()
+    if application_id == 0:
+        cursor.execute(f"PRAGMA application_id = {GPKG_APPLICATION_ID}")
+        cursor.execute(f"PRAGMA user_version = {GPKG_USER_VERSION}")
+    execute_statements(cursor, GPKG_TABLES)
+    cursor.executemany(
+        "INSERT OR IGNORE INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+        DEFAULT_SRS,
+    )
+    return
+
+
+def srs_id(cursor, crs: Optional[QgsCoordinateReferenceSystem]) -> int:
+    """Return the srs_id of the CRS, adding it to the GeoPackage if needed."""
+    if crs is None or not crs.isValid():
+        return -1
+    definition = crs.toWkt()
+    result = cursor.execute(
+        "SELECT srs_id FROM gpkg_spatial_ref_sys WHERE definition = ?",
+        (definition,),
+    ).fetchone()
+    if result:
+        return result[0]
+
+    organization, _, code = crs.authid().partition(":")
+    if organization.upper() == "EPSG" and code.isdigit():
+        organization = "EPSG"
+        new_id = int(code)
+        # Refer to the existing entry of this EPSG code.
+        result = cursor.execute(
+            "SELECT srs_id FROM gpkg_spatial_ref_sys WHERE srs_id = ?", (new_id,)
+        ).fetchone()
+        if result:
+            return new_id
+    else:
+        organization = "NONE"
+        (max_id,) = cursor.execute(
+            "SELECT MAX(srs_id) FROM gpkg_spatial_ref_sys"
+        ).fetchone()
+        new_id = max(CUSTOM_SRS_ID, (max_id or 0) + 1)
+    cursor.execute(
+        "INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)",
+        (crs.description(), new_id, organization, new_id, definition, None),
+    )
+    return new_id
+
+
+def drop_features(cursor, layername: str) -> None:
+    """Remove a feature table and its metadata, if it exists."""
+    # Tables written by GDAL may have another geometry column name.
+    geometry_columns = cursor.execute(
+        "SELECT column_name FROM gpkg_geometry_columns WHERE table_name = ?",
+        (layername,),
+    ).fetchall()
+    for (column,) in geometry_columns:
+        cursor.execute(f'DROP TABLE IF EXISTS "rtree_{layername}_{column}"')
+    # This drops the triggers on the table as well.
+    cursor.execute(f'DROP TABLE IF EXISTS "{layername}"')
+    for table in ("gpkg_extensions", "gpkg_geometry_columns", "gpkg_contents"):
+        cursor.execute(f"DELETE FROM {table} WHERE table_name = ?", (layername,))
+    # GDAL caches the feature count in a table of its own.
+    ogr_contents = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'gpkg_ogr_contents'"
+    ).fetchone()
+    if ogr_contents:
+        cursor.execute(
+            "DELETE FROM gpkg_ogr_contents WHERE table_name = ?", (layername,)
+        )
+    return
+
+
+def insert_features(
+    cursor,
+    layername: str,
+    geometry_type_name: str,
+    srs: int,
+    fields: Sequence[Tuple[str, str]],
+    chunks: Iterable[Tuple[Sequence[List[Any]], List[Optional[bytes]], np.ndarray]],
+    z: int = 0,
+    m: int = 0,
+) -> None:
+    """
+    Write a feature table, replacing an existing table of the same name.
+
+    The features are inserted chunk by chunk, so that only a single chunk
+    needs to be held in memory. The RTree triggers are created after all rows
+    have been inserted, which is much faster than updating the RTree row by
+    row.
+
+    Parameters
+    ----------
+    cursor: sqlite3.Cursor
+        Cursor of the GeoPackage, within a transaction.
+    layername: str
+        Name of the table to write.
+    geometry_type_name: str
+        E.g. "POINT", "MULTILINESTRING".
+    srs: int
+        The srs_id of the geometries.
+    fields: Sequence of (name, type) tuples
+        The attribute fields, e.g. ("head", "REAL").
+    chunks: Iterable of (values, blobs, envelopes)
+        values: the values of every field, None for NULL.
+        blobs: the GeoPackage geometry blob of every feature, or None.
+        envelopes: np.ndarray of floats with shape (n_feature, 4), the
+        (minx, maxx, miny, maxy) of every feature, NaN for NULL.
+    z: int
+        Whether the geometries have z values: 0 (no), 1 (yes).
+    m: int
+        Whether the geometries have m values: 0 (no), 1 (yes).
+
+    """
+    drop_features(cursor, layername)
+    names = [name for name, _ in fields]
+    definitions = ", ".join(f'"{name}" {type_}' for name, type_ in fields)
+    cursor.execute(
+        f'CREATE TABLE "{layername}" ('
+        '"fid" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, '
+        f'"{GEOMETRY_COLUMN}" {geometry_type_name}'
+        + (f", {definitions}" if definitions else "")
+        + ")"
+    )
+    rtree = f"rtree_{layername}_{GEOMETRY_COLUMN}"
+    cursor.execute(
+        f'CREATE VIRTUAL TABLE "{rtree}" USING rtree(id, minx, maxx, miny, maxy)'
+    )
+    selection = ", ".join(f'"{name}"' for name in ["fid", GEOMETRY_COLUMN, *names])
+    placeholders = ", ".join("?" * (len(names) + 2))
+
+    nfeature = 0
+    # The maxima are negated, so that all four can be updated with a minimum.
+    extent = np.full(4, np.inf)
+    for values, blobs, envelopes in chunks:
+        fids = list(range(nfeature + 1, nfeature + len(blobs) + 1))
+        nfeature += len(blobs)
+        cursor.executemany(
+            f'INSERT INTO "{layername}" ({selection}) VALUES ({placeholders})',
+            zip(fids, blobs, *values, strict=True),
+        )
+        valid = ~np.isnan(envelopes).any(axis=1)
+        if not valid.any():
+            continue
+        minx, maxx, miny, maxy = envelopes[valid].T
+        extent = np.minimum(extent, [minx.min(), -maxx.max(), miny.min(), -maxy.max()])
+        cursor.executemany(
+            f'INSERT INTO "{rtree}" VALUES (?, ?, ?, ?, ?)',
+            (
+                (fid, *envelope)
+                for fid, envelope, isvalid in zip(
+                    fids, envelopes.tolist(), valid.tolist(), strict=True
+                )
+                if isvalid
+            ),
+        )
+
+    if np.isfinite(extent).all():
+        xmin, xmax, ymin, ymax = extent * [1.0, -1.0, 1.0, -1.0]
+        bounds = [xmin, ymin, xmax, ymax]
+    else:
+        bounds = [None] * 4
+    cursor.execute(
+        "INSERT INTO gpkg_contents "
+        "(table_name, data_type, identifier, min_x, min_y, max_x, max_y, srs_id) "
+        "VALUES (?, 'features', ?, ?, ?, ?, ?, ?)",
+        (layername, layername, *bounds, srs),
+    )
+    cursor.execute(
+        "INSERT INTO gpkg_geometry_columns VALUES (?, ?, ?, ?, ?, ?)",
+        (layername, GEOMETRY_COLUMN, geometry_type_name, srs, z, m),
+    )
+    execute_statements(
+        cursor,
+        RTREE_TRIGGERS.format(
+            rtree=rtree, table=layername, geom=GEOMETRY_COLUMN, fid="fid"
+        ),
+    )
+    cursor.execute(
+        "INSERT INTO gpkg_extensions "
+        "VALUES (?, ?, 'gpkg_rtree_index', ?, 'write-only')",
+        (
+            layername,
+            GEOMETRY_COLUMN,
+            "http://www.geopackage.org/spec120/#extension_rtree",
+        ),
+    )
+    return
+
+
+def update_extent(cursor, layername: str) -> None:
+    """Set the extent of a feature table in gpkg_contents from its RTree."""
+    rtree = f"rtree_{layername}_{GEOMETRY_COLUMN}"
+    bounds = cursor.execute(
+        f'SELECT min(minx), min(miny), max(maxx), max(maxy) FROM "{rtree}"'
+    ).fetchone()
+    cursor.execute(
+        "UPDATE gpkg_contents SET min_x = ?, min_y = ?, max_x = ?, max_y = ? "
+        "WHERE table_name = ?",
+        (*bounds, layername),
+    )
+    return
+
+
+def _field_type(field: QgsField) -> str:
+    if field.type() in INTEGER_VARIANTS:
+        return "INTEGER"
+    elif field.isNumeric():
+        return "REAL"
+    return "TEXT"
+
+
+class GeoPackageWriter:
+    """
+    Write many layers to a GeoPackage, in a single transaction.
+
+    All layers are committed at once when the ``with`` block ends. If an
+    error occurs, none of the layers are written, and a GeoPackage created
+    by the writer is removed again. The layers can be opened after the
+    ``with`` block.
+
+    Examples
+    --------
+    >>> with GeoPackageWriter(path) as writer:
+    ...     writer.write_features("wells", "Point", crs, fields, columns, xy, offsets)
+    ...     writer.write_layer(vector_layer, "processing-output")
+    >>> layer = writer.layer("wells")
+
+    """
+
+    # The output is rebuilt from the model results on every run: favor
+    # loading speed over durability. The rollback journal keeps the
+    # transaction atomic.
+    PRAGMAS = (
+        "PRAGMA synchronous = OFF",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -65536",
+    )
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.written = []
+        self.connection = None
+        self.cursor = None
+        self.newfile = False
+        # Called once the transaction has been committed.
+        self.commit_callbacks: List[Callable[[], None]] = []
+
+    def __enter__(self) -> "GeoPackageWriter":
+        self.newfile = not Path(self.path).exists()
+        self.connection = sqlite3.connect(self.path, isolation_level=None)
+        register_functions(self.connection)
+        self.cursor = self.connection.cursor()
+        for pragma in self.PRAGMAS:
+            self.cursor.execute(pragma)
+        self.cursor.execute("BEGIN")
+        create_geopackage_tables(self.cursor)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        try:
+            if exc_type is None:
+                self.cursor.execute("COMMIT")
+            else:
+                self.cursor.execute("ROLLBACK")
+                self.written = []
+        finally:
+            self.cursor.close()
+            self.connection.close()
+            self.cursor = None
+            self.connection = None
+        if exc_type is not None and self.newfile:
+            Path(self.path).unlink(missing_ok=True)
+        callbacks, self.commit_callbacks = self.commit_callbacks, []
+        if exc_type is None:
+            for callback in callbacks:
+                callback()
+        return
+
+    def on_commit(self, callback: Callable[[], None]) -> None:
+        """
+        Call the callback once all layers have been committed, e.g. to update
+        state that describes the written layers. It is not called if the
+        transaction is rolled back.
+        """
+        self.commit_callbacks.append(callback)
+        return
+
+    def _record(self, layername: str) -> None:
+        if layername in self.written:
+            self.written.remove(layername)
+        self.written.append(layername)
+        return
+
+    def write_features(
+        self,
+        layername: str,
+        geometry_type: str,
+        crs: Optional[QgsCoordinateReferenceSystem],
+        fields: Sequence[Tuple[str, str]],
+        columns: Dict[str, np.ndarray],
+        xy: np.ndarray,
+        offsets: np.ndarray,
+    ) -> None:
+        """
+        Write columnar features directly, without creating any QgsFeatures.
+
+        Parameters
+        ----------
+        layername: str
+            Layer name to write in the GeoPackage
+        geometry_type: str
+            One of "Point", "Linestring", "Polygon".
+        crs: QgsCoordinateReferenceSystem or None
+            Coordinate reference system of the layer, None if unknown.
+        fields: Sequence of (name, type) tuples
+            The attribute fields, e.g. ("head", "REAL").
+        columns: Dict[str, np.ndarray]
+            The values of every field. NaN values are stored as NULL.
+        xy: np.ndarray of floats with shape (n_vertex, 2)
+            The vertices of all features.
+        offsets: np.ndarray of integers with shape (n_feature + 1,)
+            Start of every feature in xy.
+
+        """
+        self.write_feature_chunks(
+            layername, geometry_type, crs, fields, [(columns, xy, offsets)]
+        )
+        return
+
+    def write_feature_chunks(
+        self,
+        layername: str,
+        geometry_type: str,
+        crs: Optional[QgsCoordinateReferenceSystem],
+        fields: Sequence[Tuple[str, str]],
+        chunks: Iterable[Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]],
+        z: bool = False,
+        m: bool = False,
+    ) -> None:
+        """
+        Write columnar features chunk by chunk, like ``write_features``.
+
+        The chunks are consumed one at a time, so they may be produced while
+        reading a large file. With z, the vertices have three columns: x, y,
+        z; with z and m, four: x, y, z, m.
+        """
+        srs = srs_id(self.cursor, crs)
+
+        def encode():
+            for columns, xy, offsets in chunks:
+                blobs, envelopes = to_gpkg_blobs(geometry_type, xy, offsets, srs)
+                values = [_sql_values(columns[name]) for name, _ in fields]
+                yield values, blobs, envelopes
+
+        insert_features(
+            self.cursor,
+            layername,
+            GEOMETRY_TYPE_NAMES[geometry_type],
+            srs,
+            fields,
+            encode(),
+            z=int(z),
+            m=int(m),
+        )
+        self._record(layername)
+        return
+
+    def set_description(self, layername: str, description: str) -> None:
+        """Set the description of a layer, shown as its abstract in QGIS."""
+        self.cursor.execute(
+            "UPDATE gpkg_contents SET description = ? WHERE table_name = ?",
+            (description, layername),
+        )
+        return
+
+    def write_layer(self, layer: QgsVectorLayer, layername: str) -> None:
+        """
+        Write the features of a QgsVectorLayer, e.g. the output of a
+        processing algorithm. The geometries are copied as WKB.
+        """
+        srs = srs_id(self.cursor, layer.crs())
+        # The fid is the primary key of the GeoPackage table.
+        indices = [
+            i for i, field in enumerate(layer.fields()) if field.name().lower() != "fid"
+        ]
+        fields = [
+            (layer.fields().at(i).name(), _field_type(layer.fields().at(i)))
+            for i in indices
+        ]
+        rows = []
+        blobs = []
+        envelopes = []
+        for feature in layer.getFeatures():
+            attributes = feature.attributes()
+            rows.append(
+                [None if attributes[i] == NULL else attributes[i] for i in indices]
+            )
+            geometry = feature.geometry()
+            if geometry.isNull():
+                blobs.append(None)
+                envelopes.append((np.nan,) * 4)
+            else:
+                box = geometry.boundingBox()
+                envelope = (
+                    box.xMinimum(),
+                    box.xMaximum(),
+                    box.yMinimum(),
+                    box.yMaximum(),
+                )
+                blobs.append(wkb_to_gpkg(geometry.asWkb().data(), srs, envelope))
+                envelopes.append(envelope)
+
+        wkb_type = layer.wkbType()
+        geometry_type_name = QgsWkbTypes.displayString(
+            QgsWkbTypes.flatType(wkb_type)
+        ).upper()
+        values = [list(column) for column in zip(*rows, strict=True)] or [
+            [] for _ in fields
+        ]
+        insert_features(
+            self.cursor,
+            layername,
+            geometry_type_name,
+            srs,
+            fields,
+            [(values, blobs, np.array(envelopes, dtype=np.float64).reshape(-1, 4))],
+            z=int(QgsWkbTypes.hasZ(wkb_type)),
+            m=int(QgsWkbTypes.hasM(wkb_type)),
+        )
+        self._record(layername)
+        return
+
+    def has_layer(self, layername: str) -> bool:
+        """Whether the GeoPackage contains the feature layer."""
+        return (
+            self.cursor.execute(
+                "SELECT 1 FROM gpkg_geometry_columns WHERE table_name = ?",
+                (layername,),
+            ).fetchone()
+            is not None
+        )
+
+    def append_features(
+        self,
+        layername: str,
+        geometry_type: str,
+        fields: Sequence[Tuple[str, str]],
+        columns: Dict[str, np.ndarray],
+        xy: np.ndarray,
+        offsets: np.ndarray,
+    ) -> None:
+        """
+        Append columnar features to an existing layer, see ``write_features``.
+
+        The RTree index is updated by its triggers.
+        """
+        (srs,) = self.cursor.execute(
+            "SELECT srs_id FROM gpkg_geometry_columns WHERE table_name = ?",
+            (layername,),
+        ).fetchone()
+        blobs, _ = to_gpkg_blobs(geometry_type, xy, offsets, srs)
+        values = [_sql_values(columns[name]) for name, _ in fields]
+        selection = ", ".join(f'"{name}"' for name in [GEOMETRY_COLUMN, *dict(fields)])
+        placeholders = ", ".join("?" * (len(fields) + 1))
+        self.cursor.executemany(
+            f'INSERT INTO "{layername}" ({selection}) VALUES ({placeholders})',
+            zip(blobs, *values, strict=True),
+        )
+        update_extent(self.cursor, layername)
+        self._record(layername)
+        return
+
+    def delete_features(
+        self, layername: str, column: str, values: Sequence[Any]
+    ) -> None:
+        """Delete the features of a layer with any of the values in column."""
+        self.cursor.executemany(
+            f'DELETE FROM "{layername}" WHERE "{column}" = ?',
+            [(value,) for value in values],
+        )
+        update_extent(self.cursor, layername)
+        self._record(layername)
+        return
+
+    def update_features(
+        self,
+        layername: str,
+        column: str,
+        values: Sequence[Any],
+        key: str,
+        keys: Sequence[Any],
+    ) -> None:
+        """Set column to the value for the features with the key value."""
+        self.cursor.executemany(
+            f'UPDATE "{layername}" SET "{column}" = ? WHERE "{key}" = ?',
+            zip(values, keys, strict=True),
+        )
+        self._record(layername)
+        return
+
+    def drop(self, layername: str) -> None:
+        """Remove a layer, if it exists."""
+        drop_features(self.cursor, layername)
+        if layername in self.written:
+            self.written.remove(layername)
+        return
+
+    def layer(self, layername: str) -> QgsVectorLayer:
+        """Open a written layer; only valid after the ``with`` block."""
+        return QgsVectorLayer(f"{self.path}|layername={layername}", layername, "ogr")
@@ -6,7 +6,7 @@ transparent, not obscuring the view. A head grid should have pseudocoloring,
 ideally with a legend stretching from minimum to maximum.
 """
 
-from typing import List
+from typing import List, Optional
 
 from PyQt5.QtGui import QColor
 from qgis.core import (
@@ -55,7 +55,12 @@ def color_ramp_items(
 
 
 def pseudocolor_renderer(
-    layer, band: int, colormap: str, nclass: int
+    layer,
+    band: int,
+    colormap: str,
+    nclass: int,
+    minimum: Optional[float] = None,
+    maximum: Optional[float] = None,
 ) -> QgsSingleBandPseudoColorRenderer:
     """
     Parameters
@@ -67,15 +72,21 @@ def pseudocolor_renderer(
         Name of QGIS colormap
     nclass: int
         Number of colormap classes to create
+    minimum, maximum: float, optional
+        Range of the colormap. If not provided, it is computed from the band
+        statistics, which requires a pass over the raster.
 
     Returns
     -------
     renderer: QgsSingleBandPseudoColorRenderer
 
     """
-    stats = layer.dataProvider().bandStatistics(band, QgsRasterBandStats.All)
-    minimum = stats.minimumValue
-    maximum = stats.maximumValue
+    if minimum is None or maximum is None:
+        stats = layer.dataProvider().bandStatistics(
+            band, QgsRasterBandStats.Min | QgsRasterBandStats.Max
+        )
+        minimum = stats.minimumValue
+        maximum = stats.maximumValue
 
     ramp, ramp_items = color_ramp_items(colormap, minimum, maximum, nclass)
     shader_function = QgsColorRampShader()
@@ -0,0 +1,303 @@
+"""
+Read the pathlines of the GFLOW trace (.PTH) file.
+
+A trace run with many particles and long travel times results in a large
+file. It is read in chunks of lines, so that memory use stays bounded. The
+coordinates of all vertices in a chunk are converted at once, and the
+vertices are split into pathlines with index arithmetic on the START and END
+marker lines.
+
+By default, every pathline is written as a single LineStringZM feature;
+alternatively, every segment of a pathline is written as a separate feature.
+Only the x, y, and z of the vertices are read: the m of a pathline vertex is
+its step number, not its travel time. The pathlines are matched to the
+particles of the input file by their order, which is validated by their
+number.
+"""
+
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Number of lines per chunk.
+CHUNK_SIZE = 1 << 16
+# The columns with x, y, z of a vertex line.
+COORDINATES = slice(4, 47)
+DATA = 0
+START = 1
+END = 2
+
+
+def _line_kind(line: str) -> int:
+    if line.startswith("START"):
+        return START
+    elif line.startswith("END"):
+        return END
+    return DATA
+
+
+def _line_kinds(lines: List[str]) -> np.ndarray:
+    return np.fromiter(map(_line_kind, lines), dtype=np.int8, count=len(lines))
+
+
+def _parse_xyz(lines: List[str]) -> np.ndarray:
+    """Convert the x, y, z of all vertex lines at once."""
+    if not lines:
+        return np.empty((0, 3))
+    return np.loadtxt(
+        [line[COORDINATES] for line in lines],
+        dtype=np.float64,
+        comments=None,
+        ndmin=2,
+    )
+
+
+def split_pathlines(
+    kinds: np.ndarray, xyz: np.ndarray, carry: Optional[np.ndarray], count: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Split the vertices of a chunk into pathlines.
+
+    The vertices of a pathline are the data lines between a START and the
+    next END line. Data lines outside of a START and END are ignored, as are
+    pathlines without an END. Pathlines are numbered from 1 by their START
+    line, including pathlines without vertices.
+
+    Parameters
+    ----------
+    kinds: np.ndarray of int8 with shape (n_line,)
+        DATA, START, or END for every line of the chunk.
+    xyz: np.ndarray of floats with shape (n_data, 3)
+        The vertices of the data lines.
+    carry: np.ndarray of floats with shape (n_carry, 3), or None
+        The vertices of a pathline started in a previous chunk; None if the
+        previous chunk ended outside of a pathline.
+    count: int
+        The number of START lines in the previous chunks. This is also the
+        number of the pathline of the carry.
+
+    Returns
+    -------
+    xyz: np.ndarray of floats with shape (n_vertex, 3)
+        The vertices of the pathlines which end in this chunk.
+    offsets: np.ndarray of integers with shape (n_pathline + 1,)
+        Start of every pathline in xyz.
+    numbers: np.ndarray of integers with shape (n_pathline,)
+        The number of every pathline.
+    carry: np.ndarray of floats with shape (n_carry, 3), or None
+        The vertices of a pathline which continues in the next chunk.
+
+    """
+    started = carry is not None
+    marker = kinds != DATA
+    # The index of the last marker at or before every line.
+    last = np.maximum.accumulate(np.where(marker, np.arange(len(kinds)), -1))
+    inside = np.where(last >= 0, kinds[np.maximum(last, 0)] == START, started)
+    # Whether a line is preceded by a START, rather than by an END.
+    before = np.concatenate([[started], inside[:-1]])
+    # Number every pathline by the START lines up to it.
+    number = count + np.cumsum(kinds == START)
+
+    data = kinds == DATA
+    keep = inside[data]
+    vertices = xyz[keep]
+    numbers = number[data][keep]
+    if started:
+        vertices = np.concatenate([carry, vertices])
+        numbers = np.concatenate([np.full(len(carry), count), numbers])
+
+    # A pathline is complete if an END line follows it. Every pathline ends
+    # at most once, and the vertices are in the order of the pathlines.
+    ended = number[(kinds == END) & before]
+    complete = np.isin(numbers, ended)
+    carry = vertices[numbers == number[-1]] if inside[-1] else None
+
+    numbers = numbers[complete]
+    offsets = np.empty(len(ended) + 1, dtype=np.int64)
+    offsets[:-1] = np.searchsorted(numbers, ended)
+    offsets[-1] = len(numbers)
+    return vertices[complete], offsets, ended, carry
+
+
+def read_pathlines(
+    path: str, chunksize: int = CHUNK_SIZE, nparticle: Optional[int] = None
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Read the pathlines of the trace file, chunk by chunk.
+
+    Parameters
+    ----------
+    path: str
+        Path to the trace file.
+    chunksize: int, optional
+        Number of lines to read at once.
+    nparticle: int, optional
+        The number of particles of the trace. If given, a ValueError is
+        raised if the number of pathlines differs: the pathlines are matched
+        to the particles by their order.
+
+    Yields
+    ------
+    xyz: np.ndarray of floats with shape (n_vertex, 3)
+    offsets: np.ndarray of integers with shape (n_pathline + 1,)
+        Start of every pathline in xyz.
+    numbers: np.ndarray of integers with shape (n_pathline,)
+        The number of every pathline, counting from 1 in the order of the
+        trace file.
+
+    """
+    carry = None
+    count = 0
+    with open(path) as f:
+        while True:
+            lines = list(islice(f, chunksize))
+            if not lines:
+                break
+            kinds = _line_kinds(lines)
+            data = [
+                line
+                for line, kind in zip(lines, kinds.tolist(), strict=True)
+                if kind == DATA
+            ]
+            xyz, offsets, numbers, carry = split_pathlines(
+                kinds, _parse_xyz(data), carry, count
+            )
+            count += int((kinds == START).sum())
+            if nparticle is not None and count > nparticle:
+                break
+            if len(numbers) > 0:
+                yield xyz, offsets, numbers
+    if nparticle is not None and count > nparticle:
+        raise ValueError(
+            f"The trace file contains more pathlines than the {nparticle} "
+            "particles of the input file"
+        )
+    elif nparticle is not None and count < nparticle:
+        raise ValueError(
+            f"The trace file contains {count} pathlines for the {nparticle} "
+            "particles of the input file"
+        )
+    return
+
+
+def pathline_segments(
+    xyz: np.ndarray, offsets: np.ndarray
+) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    Split pathlines into their segments, as a feature per segment.
+
+    Parameters
+    ----------
+    xyz: np.ndarray of floats with shape (n_vertex, 3)
+        The vertices of the pathlines.
+    offsets: np.ndarray of integers with shape (n_pathline + 1,)
+        Start of every pathline in xyz.
+
+    Returns
+    -------
+    columns: Dict[str, np.ndarray]
+        The start_elevation and end_elevation of every segment.
+    xy: np.ndarray of floats with shape (2 * n_segment, 2)
+    offsets: np.ndarray of integers with shape (n_segment + 1,)
+
+    """
+    # Every vertex starts a segment, except the last of a pathline.
+    first = np.ones(len(xyz), dtype=bool)
+    nonempty = np.diff(offsets) > 0
+    first[offsets[1:][nonempty] - 1] = False
+    start = np.flatnonzero(first)
+    end = start + 1
+    xy = np.empty((2 * len(start), 2))
+    xy[0::2] = xyz[start, :2]
+    xy[1::2] = xyz[end, :2]
+    columns = {
+        "start_elevation": xyz[start, 2],
+        "end_elevation": xyz[end, 2],
+    }
+    return columns, xy, np.arange(0, len(xy) + 1, 2)
+
+
+def particle_directions(path: Union[Path, str]) -> np.ndarray:
+    """
+    Read the direction of the particles from the points of the trace section
+    of the GFLOW input (.dat) file: 1.0 for forward, -1.0 for backward.
+
+    The particles are traced, and their pathlines written, in this order: the
+    trace file does not contain the particle ids. Pass the number of
+    particles to ``read_pathlines`` to validate the order.
+    """
+    directions = []
+    with open(path) as f:
+        lines = (line.strip().lower() for line in f)
+        for line in lines:
+            if line == "trace":
+                break
+        for line in lines:
+            if line == "points":
+                break
+        for line in lines:
+            if line == "quit":
+                break
+            values = line.split()
+            if len(values) >= 4:
+                directions.append(float(values[3]))
+    return np.array(directions, dtype=np.float64)
+
+
+def pathline_features(
+    xyz: np.ndarray, offsets: np.ndarray, numbers: np.ndarray, directions: np.ndarray
+) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+    """
+    Convert pathlines to a feature per pathline, with Z and M vertices.
+
+    Parameters
+    ----------
+    xyz: np.ndarray of floats with shape (n_vertex, 3)
+        The vertices of the pathlines.
+    offsets: np.ndarray of integers with shape (n_pathline + 1,)
+        Start of every pathline in xyz.
+    numbers: np.ndarray of integers with shape (n_pathline,)
+        The number of every pathline, see ``read_pathlines``. This is the id
+        of its particle.
+    directions: np.ndarray of floats
+        The direction of every particle, by particle id. A ValueError is
+        raised if a pathline has no particle.
+
+    Returns
+    -------
+    columns: Dict[str, np.ndarray]
+        The particle_id and direction of every pathline, and its m_measure:
+        "step", as the trace file does not provide the travel time.
+    xyzm: np.ndarray of floats with shape (n_vertex, 4)
+        The elevation as z, the step number within the pathline as m.
+        Pathlines with fewer than two vertices are not a valid line, and have
+        no vertices.
+    offsets: np.ndarray of integers with shape (n_pathline + 1,)
+
+    """
+    counts = np.diff(offsets)
+    valid = counts >= 2
+    keep = np.repeat(valid, counts)
+    xyzm = np.empty((len(xyz), 4))
+    xyzm[:, :3] = xyz
+    xyzm[:, 3] = np.arange(len(xyz)) - np.repeat(offsets[:-1], counts)
+
+    counts = np.where(valid, counts, 0)
+    new_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_offsets[1:])
+
+    particle_id = np.asarray(numbers, dtype=np.int64)
+    if ((particle_id < 1) | (particle_id > len(directions))).any():
+        raise ValueError(
+            "The trace file contains pathlines without a particle in the "
+            f"{len(directions)} particles of the input file"
+        )
+    measure = np.full(len(counts), "step", dtype=object)
+    columns = {
+        "particle_id": particle_id,
+        "direction": directions[particle_id - 1],
+        "m_measure": measure,
+    }
+    return columns, xyzm[keep], new_offsets
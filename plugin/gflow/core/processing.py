@@ -1,60 +1,389 @@
 """
 Utilities for processing input or output.
 
-Currently wraps the QGIS functions for turning grids / meshes of head results
-into line contours.
+Currently turns grids of head results into line contours. The grid is read
+into an array and contoured in-process; the contours are written directly to
+the output GeoPackage. The contours are cached by level, so that redrawing
+them after changing the range or step only computes and writes the changed
+levels.
 """
 
+import json
+import os
+from functools import partial
 from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
-import processing
-from qgis.core import (
-    QgsRasterLayer,
-    QgsVectorLayer,
-)
+import numpy as np
+from osgeo import gdal
+from qgis.core import Qgis, QgsCoordinateReferenceSystem, QgsRasterLayer
 
 from gflow.core import geopackage
+from gflow.core.contours import combine_levels, contour_level, contour_levels
+from gflow.core.simplify import simplify_lines
 
+RASTER_DTYPES = {
+    Qgis.Byte: np.uint8,
+    Qgis.UInt16: np.uint16,
+    Qgis.Int16: np.int16,
+    Qgis.UInt32: np.uint32,
+    Qgis.Int32: np.int32,
+    Qgis.Float32: np.float32,
+    Qgis.Float64: np.float64,
+}
+# The fields of the contour layer.
+FIELDS = [("head", "REAL"), ("major", "INTEGER")]
+# Levels are considered equal if they are equal in this many decimals.
+LEVEL_DECIMALS = 9
+# Increment when the content of the statistics sidecar file changes.
+STATISTICS_VERSION = 1
+HISTOGRAM_BINS = 256
+# The head grid is stored as an internally tiled GeoTIFF. The floating point
+# predictor improves the compression of smoothly varying heads.
+TILE_SIZE = 256
+GEOTIFF_OPTIONS = [
+    "TILED=YES",
+    f"BLOCKXSIZE={TILE_SIZE}",
+    f"BLOCKYSIZE={TILE_SIZE}",
+    "COMPRESS=DEFLATE",
+    "PREDICTOR=3",
+]
 
-def raster_contours(
-    gpkg_path: str,
-    layer: QgsRasterLayer,
-    name: str,
-    start: float,
-    stop: float,
-    step: float,
-) -> QgsVectorLayer:
-    # Seemingly cannot use stop in any way, unless filtering them away.
-    result = processing.run(
-        "gdal:contour",
-        {
-            "INPUT": layer,
-            "BAND": 1,
-            "INTERVAL": step,
-            "OFFSET": start,
-            "FIELD_NAME": "head",
-            "OUTPUT": "TEMPORARY_OUTPUT",
-        },
-    )
 
-    path = result["OUTPUT"]
-    vector_layer = QgsVectorLayer(path)
-    vector_layer.setCrs(layer.crs())
-
-    result = processing.run(
-        "qgis:extractbyexpression",
-        {
-            "INPUT": vector_layer,
-            "EXPRESSION": f'"head" >= {start} AND "head" <= {stop}',
-            "OUTPUT": "TEMPORARY_OUTPUT",
-        },
-    )
+def overview_factors(ncol: int, nrow: int) -> List[int]:
+    """Return the overview factors, down to about a single tile."""
+    factors = []
+    factor = 2
+    while max(ncol, nrow) / factor >= TILE_SIZE:
+        factors.append(factor)
+        factor *= 2
+    return factors
+
+
+def is_up_to_date(source: str, destination: str) -> bool:
+    """
+    Whether the destination file exists and has been modified after the
+    source file, i.e. it has been derived from the current source.
+    """
+    try:
+        return os.stat(destination).st_mtime_ns >= os.stat(source).st_mtime_ns
+    except OSError:
+        return False
+
+
+def grid_to_geotiff(
+    source: str, destination: str, crs: Optional[QgsCoordinateReferenceSystem]
+) -> None:
+    """
+    Convert a grid, e.g. the ASCII Surfer grid written by GFLOW, to an
+    internally tiled, compressed GeoTIFF with overviews.
 
-    newfile = not Path(gpkg_path).exists()
-    written_layer = geopackage.write_layer(
-        path=gpkg_path,
-        layer=result["OUTPUT"],
-        layername=name,
-        newfile=newfile,
+    The ASCII grid has to be parsed completely whenever it is opened, and has
+    no overviews, making it slow to open and to pan or zoom.
+    """
+    srs = crs.toWkt() if crs is not None and crs.isValid() else None
+    options = gdal.TranslateOptions(
+        format="GTiff", creationOptions=GEOTIFF_OPTIONS, outputSRS=srs
     )
-    return written_layer
+    dataset = gdal.Translate(destination, source, options=options)
+    if dataset is None:
+        raise RuntimeError(f"Failed to convert {source} to {destination}")
+
+    # The internal overviews are compressed like the full resolution grid.
+    factors = overview_factors(dataset.RasterXSize, dataset.RasterYSize)
+    if factors:
+        dataset.BuildOverviews("AVERAGE", factors)
+    # Closing the dataset flushes it to disk.
+    dataset = None
+    return
+
+
+def raster_array(
+    layer: QgsRasterLayer, band: int = 1
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read a band of a raster layer.
+
+    Returns
+    -------
+    values: np.ndarray of floats with shape (nrow, ncol)
+        NaN for no data.
+    x: np.ndarray of floats with shape (ncol,)
+        The x coordinates of the cell centers.
+    y: np.ndarray of floats with shape (nrow,)
+        The y coordinates of the cell centers, decreasing.
+
+    """
+    provider = layer.dataProvider()
+    extent = provider.extent()
+    ncol = layer.width()
+    nrow = layer.height()
+    block = provider.block(band, extent, ncol, nrow)
+    raw = np.frombuffer(
+        block.data().data(), dtype=RASTER_DTYPES[block.dataType()]
+    ).reshape(nrow, ncol)
+    values = raw.astype(np.float64)
+    if provider.sourceHasNoDataValue(band):
+        nodata = np.array(provider.sourceNoDataValue(band), dtype=raw.dtype)
+        values[raw == nodata] = np.nan
+
+    dx = layer.rasterUnitsPerPixelX()
+    dy = layer.rasterUnitsPerPixelY()
+    x = extent.xMinimum() + (np.arange(ncol) + 0.5) * dx
+    y = extent.yMaximum() - (np.arange(nrow) + 0.5) * dy
+    return values, x, y
+
+
+def raster_fingerprint(layer: QgsRasterLayer) -> Optional[Tuple[str, int, int]]:
+    """
+    Identify the content of the raster file by its path, size, and
+    modification time; None if the raster is not a file.
+    """
+    source = layer.source()
+    try:
+        stat = os.stat(source)
+    except OSError:
+        return None
+    return (str(Path(source).resolve()), stat.st_size, stat.st_mtime_ns)
+
+
+class GridStatistics(NamedTuple):
+    """
+    Statistics of the values of a grid, ignoring no data.
+
+    Attributes
+    ----------
+    minimum: float
+    maximum: float
+    mean: float
+    histogram: List[int]
+        The counts of HISTOGRAM_BINS equal bins from minimum to maximum.
+
+    """
+
+    minimum: float
+    maximum: float
+    mean: float
+    histogram: List[int]
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> Optional["GridStatistics"]:
+        """Compute the statistics; None if all values are no data."""
+        valid = values[~np.isnan(values)]
+        if valid.size == 0:
+            return None
+        minimum = float(valid.min())
+        maximum = float(valid.max())
+        histogram, _ = np.histogram(
+            valid, bins=HISTOGRAM_BINS, range=(minimum, maximum)
+        )
+        return cls(minimum, maximum, float(valid.mean()), histogram.tolist())
+
+
+def statistics_sidecar_path(path: str) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.name}.stats.json")
+
+
+def _statistics_key(fingerprint: Tuple[str, int, int]) -> Dict:
+    _, size, mtime_ns = fingerprint
+    return {"version": STATISTICS_VERSION, "size": size, "mtime_ns": mtime_ns}
+
+
+def read_statistics(fingerprint: Tuple[str, int, int]) -> Optional[GridStatistics]:
+    """Read the statistics of a grid file from its sidecar, if up to date."""
+    path, _, _ = fingerprint
+    try:
+        with open(statistics_sidecar_path(path)) as f:
+            content = json.load(f)
+        if content["key"] != _statistics_key(fingerprint):
+            return None
+        return GridStatistics(**content["statistics"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def write_statistics(
+    fingerprint: Tuple[str, int, int], statistics: GridStatistics
+) -> None:
+    path, _, _ = fingerprint
+    # The sidecar is an optimization: failing to write it is not an error.
+    try:
+        with open(statistics_sidecar_path(path), "w") as f:
+            json.dump(
+                {
+                    "key": _statistics_key(fingerprint),
+                    "statistics": statistics._asdict(),
+                },
+                f,
+            )
+    except OSError:
+        pass
+    return
+
+
+def level_key(level: float) -> float:
+    # Levels computed as start + i * step differ in the last bits.
+    return round(level, LEVEL_DECIMALS)
+
+
+class ContourCache:
+    """
+    The contours of a head grid by level, for redrawing the contours.
+
+    Changing the range or step of the contours usually changes only some of
+    the levels. The contours are cached by the fingerprint of the grid and
+    the level, so that only new levels need to be computed. If the contour
+    layer was last written from the cache, only the features of the removed
+    and added levels are deleted and appended, rather than rewriting the
+    whole layer. Simplified contours are simplified together, and are always
+    rewritten.
+    """
+
+    def __init__(self):
+        self.fingerprint = None
+        self.grid = None
+        self.range = None
+        self.lines: Dict[float, Tuple[np.ndarray, np.ndarray]] = {}
+        # The GeoPackage, layer, and grid of the last written layer at full
+        # resolution, and the head of every level in it.
+        self.written = None
+        self.heads: Dict[float, float] = {}
+
+    def _load(self, layer: QgsRasterLayer) -> None:
+        fingerprint = raster_fingerprint(layer)
+        if fingerprint is not None and fingerprint == self.fingerprint:
+            return
+        self.fingerprint = fingerprint
+        self.grid = raster_array(layer)
+        self.lines = {}
+        values = self.grid[0]
+        if np.isnan(values).all():
+            self.range = None
+        else:
+            self.range = (np.nanmin(values), np.nanmax(values))
+        return
+
+    def _level_lines(self, level: float) -> Tuple[np.ndarray, np.ndarray]:
+        key = level_key(level)
+        if key not in self.lines:
+            # Levels outside of the range of values produce no lines.
+            if self.range is None or not (self.range[0] <= level <= self.range[1]):
+                self.lines[key] = (np.empty((0, 2)), np.zeros(1, dtype=np.int64))
+            else:
+                self.lines[key] = contour_level(*self.grid, level)
+        return self.lines[key]
+
+    def statistics(self, layer: QgsRasterLayer) -> Optional[GridStatistics]:
+        """
+        Return the statistics of the grid; None if all values are no data.
+
+        The statistics are computed when the grid is first read, and stored
+        in a sidecar file next to the grid file.
+        """
+        fingerprint = raster_fingerprint(layer)
+        if fingerprint is not None:
+            statistics = read_statistics(fingerprint)
+            if statistics is not None:
+                return statistics
+        self._load(layer)
+        statistics = GridStatistics.from_values(self.grid[0])
+        if fingerprint is not None and statistics is not None:
+            write_statistics(fingerprint, statistics)
+        return statistics
+
+    def _features(
+        self,
+        levels: List[float],
+        major: List[bool],
+        tolerance: Optional[float],
+    ) -> Tuple[Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        lines = [self._level_lines(level) for level in levels]
+        columns, xy, offsets = combine_levels(levels, major, lines)
+        if tolerance is not None:
+            # Simplify all levels at once, so that they do not cross.
+            xy, offsets = simplify_lines(xy, offsets, tolerance)
+        return columns, xy, offsets
+
+    def write(
+        self,
+        writer: geopackage.GeoPackageWriter,
+        layer: QgsRasterLayer,
+        name: str,
+        start: float,
+        stop: float,
+        step: float,
+        tolerance: Optional[float] = None,
+    ) -> str:
+        """
+        Write the contours of the raster; return the name of the written layer.
+
+        Only the levels from start up to and including stop are contoured.
+        With a tolerance, the contours are simplified, and the contours at
+        full resolution are written to a separate "{name}-full" layer. The
+        simplification of a level depends on the neighbouring levels: the
+        simplified layer is always rewritten as a whole. The cache only
+        records the written layer once the writer has committed it.
+        """
+        self._load(layer)
+        levels, major = contour_levels(start, stop, step)
+        levels = levels.tolist()
+        major = major.tolist()
+        keys = [level_key(level) for level in levels]
+
+        # The layer at full resolution is updated incrementally.
+        full_name = name if tolerance is None else f"{name}-full"
+        state = (writer.path, full_name, self.fingerprint)
+        incremental = (
+            self.fingerprint is not None
+            and state == self.written
+            and writer.has_layer(full_name)
+        )
+
+        if not incremental:
+            columns, xy, offsets = self._features(levels, major, None)
+            writer.write_features(
+                full_name, "Linestring", layer.crs(), FIELDS, columns, xy, offsets
+            )
+            heads = dict(zip(keys, levels, strict=True))
+        else:
+            current = set(keys)
+            removed = [self.heads[key] for key in self.heads if key not in current]
+            added = [i for i, key in enumerate(keys) if key not in self.heads]
+            heads = {key: head for key, head in self.heads.items() if key in current}
+            heads.update((keys[i], levels[i]) for i in added)
+            if removed:
+                writer.delete_features(full_name, "head", removed)
+            if added:
+                writer.append_features(
+                    full_name,
+                    "Linestring",
+                    FIELDS,
+                    *self._features(
+                        [levels[i] for i in added], [major[i] for i in added], None
+                    ),
+                )
+            # The major levels depend on the start.
+            writer.update_features(
+                full_name,
+                "major",
+                [int(is_major) for is_major in major],
+                "head",
+                [heads[key] for key in keys],
+            )
+
+        if tolerance is None:
+            writer.drop(f"{name}-full")
+        else:
+            columns, xy, offsets = self._features(levels, major, tolerance)
+            writer.write_features(
+                name, "Linestring", layer.crs(), FIELDS, columns, xy, offsets
+            )
+
+        writer.on_commit(partial(self._record, state, heads))
+        return name
+
+    def _record(self, written: Tuple, heads: Dict[float, float]) -> None:
+        self.written = written
+        self.heads = heads
+        return
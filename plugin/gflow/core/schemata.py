@@ -1,11 +1,20 @@
 """
 Each schema enforces some constraint, e.g. it a field required or optional,
 should be positive, etc.
+
+Schemata can validate a single value with ``validate``, or an entire column at
+once with ``validate_column``. The column variant checks all values with NumPy
+masks, and returns the errors per row index.
+
+The (nested) schemata of a table can be compiled into a flat validation plan
+of ColumnChecks with ``compile_schemata``.
 """
 
 import abc
 import operator
-from typing import List, Sequence, Union
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
 
 OPERATORS = {
     "<": operator.lt,
@@ -19,6 +28,8 @@ OPERATORS = {
 
 MaybeError = Union[None, str]
 ErrorList = List[str]
+ColumnErrors = Dict[int, str]
+ColumnErrorList = Dict[int, ErrorList]
 
 
 def format(data) -> str:
@@ -41,6 +52,35 @@ class BaseSchema(abc.ABC):
 
         return errors
 
+    def invalid(self, values: np.ndarray) -> np.ndarray:
+        """Return a boolean mask marking the invalid values."""
+        return np.array([self.validate(value) is not None for value in values])
+
+    def validate_column(self, values: np.ndarray, null: np.ndarray) -> ColumnErrors:
+        """
+        Validate all non-null values of a column at once.
+
+        Parameters
+        ----------
+        values: np.ndarray
+            The values of the column.
+        null: np.ndarray of bools
+            Marks the null values; these are not validated.
+
+        Returns
+        -------
+        errors: Dict[int, str]
+            The error message per invalid row index.
+
+        """
+        invalid = ~null
+        invalid[invalid] = self.invalid(values[invalid])
+        indices = np.flatnonzero(invalid)
+        return {
+            i: self.validate(value)
+            for i, value in zip(indices.tolist(), values[indices].tolist(), strict=True)
+        }
+
 
 class IterableSchema(abc.ABC):
     """Base class for collection of values."""
@@ -72,6 +112,18 @@ class SchemaContainer(abc.ABC):
                 errors.append(_error)
         return errors
 
+    def _validate_schemata_column(
+        self, values: np.ndarray, null: np.ndarray
+    ) -> ColumnErrorList:
+        errors = {}
+        for schema in self.schemata:
+            for i, _error in schema.validate_column(values, null).items():
+                if isinstance(_error, list):
+                    errors.setdefault(i, []).extend(_error)
+                else:
+                    errors.setdefault(i, []).append(_error)
+        return errors
+
 
 class Optional(SchemaContainer):
     def validate(self, data) -> ErrorList:
@@ -79,6 +131,9 @@ class Optional(SchemaContainer):
             return []
         return self._validate_schemata(data)
 
+    def validate_column(self, values: np.ndarray, null: np.ndarray) -> ColumnErrorList:
+        return self._validate_schemata_column(values, null)
+
 
 class Required(SchemaContainer):
     def validate(self, data) -> ErrorList:
@@ -86,6 +141,11 @@ class Required(SchemaContainer):
             return ["a value is required."]
         return self._validate_schemata(data)
 
+    def validate_column(self, values: np.ndarray, null: np.ndarray) -> ColumnErrorList:
+        errors = {i: ["a value is required."] for i in np.flatnonzero(null).tolist()}
+        errors.update(self._validate_schemata_column(values, null))
+        return errors
+
 
 class Positive(BaseSchema):
     def validate(self, data, _=None) -> MaybeError:
@@ -93,6 +153,9 @@ class Positive(BaseSchema):
             return f"Number is not positive (>=0): {data}"
         return None
 
+    def invalid(self, values: np.ndarray) -> np.ndarray:
+        return values < 0
+
 
 class StrictlyPositive(BaseSchema):
     def validate(self, data, _=None) -> MaybeError:
@@ -100,6 +163,9 @@ class StrictlyPositive(BaseSchema):
             return f"Number is not strictly positive (>0): {data}"
         return None
 
+    def invalid(self, values: np.ndarray) -> np.ndarray:
+        return values <= 0
+
 
 class SingleRow(SchemaContainer):
     def validate(self, data, _=None) -> MaybeError:
@@ -119,3 +185,66 @@ class Membership(BaseSchema):
         if data not in self.members:
             return f"Value {data} not found in {self.members}: {format(self.members)}"
         return None
+
+    def invalid(self, values: np.ndarray) -> np.ndarray:
+        return ~np.isin(values, list(self.members))
+
+
+class ColumnCheck(NamedTuple):
+    """
+    Flattened validation of a single column.
+
+    Produces the same errors as ``validate_column`` of the schema it was
+    compiled from, but tests for null values only once, and runs every
+    distinct check once on the non-null values.
+    """
+
+    variable: str
+    required: bool
+    checks: Tuple[BaseSchema, ...]
+
+    def validate(self, values: np.ndarray, null: np.ndarray) -> ColumnErrorList:
+        errors = {}
+        if self.required:
+            errors = {
+                i: ["a value is required."] for i in np.flatnonzero(null).tolist()
+            }
+        if self.checks:
+            index = np.flatnonzero(~null)
+            subset = values[index]
+            for check in self.checks:
+                invalid = index[check.invalid(subset)]
+                for i, value in zip(
+                    invalid.tolist(), values[invalid].tolist(), strict=True
+                ):
+                    errors.setdefault(i, []).append(check.validate(value))
+        return errors
+
+
+def _flatten(schema) -> Iterator[BaseSchema]:
+    if isinstance(schema, SchemaContainer):
+        for inner in schema.schemata:
+            yield from _flatten(inner)
+    else:
+        yield schema
+
+
+def compile_schemata(schemata: Dict[str, SchemaContainer]) -> Tuple[ColumnCheck, ...]:
+    """
+    Compile the schemata of a table into a flat validation plan.
+
+    Nested containers are flattened: only the outermost container determines
+    whether a value is required, since inner containers never receive a null
+    value. Identical checks are only run once, and columns without any
+    checks (e.g. an Optional label) are dropped from the plan.
+    """
+    plan = []
+    for variable, schema in schemata.items():
+        checks = {}
+        for check in _flatten(schema):
+            identity = (type(check), repr(sorted(vars(check).items())))
+            checks.setdefault(identity, check)
+        required = isinstance(schema, Required)
+        if required or checks:
+            plan.append(ColumnCheck(variable, required, tuple(checks.values())))
+    return tuple(plan)
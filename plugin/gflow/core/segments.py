@@ -0,0 +1,65 @@
+"""
+Vectorized operations on the segments of many lines at once.
+
+The vertices of all lines are stored in a single array, and the lines are
+delimited by offsets: line i consists of the values offsets[i] up to
+offsets[i + 1].
+"""
+
+import numpy as np
+
+
+def segmented_cumsum(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """
+    Cumulative sum of every segment of values, restarting at every offset.
+
+    The segments are grouped by (power of two) size and summed along the rows
+    of a padded array, which adds in the same order as ``np.cumsum`` on every
+    segment separately.
+    """
+    accumulated = np.empty_like(values)
+    sizes = np.diff(offsets)
+    nonempty = sizes > 0
+    bucket = np.ceil(np.log2(sizes[nonempty])).astype(np.int64)
+    starts = offsets[:-1][nonempty]
+    sizes = sizes[nonempty]
+    for b in np.unique(bucket):
+        group = bucket == b
+        group_starts = starts[group]
+        group_sizes = sizes[group]
+        ncol = group_sizes.max()
+        index = group_starts[:, None] + np.arange(ncol)
+        valid = np.arange(ncol) < group_sizes[:, None]
+        padded = np.zeros(index.shape)
+        padded[valid] = values[index[valid]]
+        accumulated[index[valid]] = padded.cumsum(axis=1)[valid]
+    return accumulated
+
+
+def midpoint_fractions(
+    dx: np.ndarray, dy: np.ndarray, offsets: np.ndarray
+) -> np.ndarray:
+    """
+    Position of the midpoint of every segment along its line, as a fraction
+    of the length of the line.
+
+    Parameters
+    ----------
+    dx: np.ndarray of floats with shape (n_segment,)
+        The x extent of every segment.
+    dy: np.ndarray of floats with shape (n_segment,)
+        The y extent of every segment.
+    offsets: np.ndarray of integers with shape (n_line + 1,)
+        Start of every line in the segments.
+
+    Returns
+    -------
+    fraction: np.ndarray of floats with shape (n_segment,)
+
+    """
+    distance = np.sqrt(dx * dx + dy * dy)
+    accumulated = segmented_cumsum(distance, offsets)
+    # The total length of the line of every segment.
+    length = np.repeat(accumulated[offsets[1:] - 1], np.diff(offsets))
+    midpoint = accumulated - 0.5 * distance
+    return midpoint / length
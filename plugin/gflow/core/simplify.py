@@ -0,0 +1,348 @@
+"""
+Simplify lines with the Douglas-Peucker algorithm, preserving their topology.
+
+Pathlines and contours have far more vertices than can be shown at any
+reasonable map scale. The lines are stored as columnar arrays of vertices and
+offsets, and all lines are simplified at once: every iteration splits all
+intervals which are not yet within tolerance at their farthest vertex.
+
+The first and last vertex of every line are always kept, so that lines keep
+their end points, and closed lines stay closed. A closed line additionally
+keeps the vertices at a third and two thirds of the line, so that it never
+collapses to less than a triangle.
+
+Simplifying every line on its own may make lines cross which did not cross
+before, e.g. neighbouring contours. Like the topology preserving simplifier
+of GEOS, every simplified segment which crosses another segment of the
+simplified lines is split again at its farthest vertex, until no simplified
+segment crosses any other. Crossings of the original lines themselves, such
+as pathlines crossing in plan view, are kept. Candidate crossings are found
+by binning the segments in a uniform grid of cells.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+# The tolerance as a fraction of the grid spacing: details smaller than a
+# grid cell cannot be resolved by the head grid anyway.
+TOLERANCE_FACTOR = 0.25
+
+
+def simplify_tolerance(spacing: float) -> float:
+    """Return the simplification tolerance for a grid spacing."""
+    return TOLERANCE_FACTOR * spacing
+
+
+def _segment_distance(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Distance of the points p to the segments a-b, in the xy plane."""
+    ab = b - a
+    ap = p - a
+    length2 = (ab**2).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(length2 > 0.0, (ap * ab).sum(axis=1) / length2, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(*(ap - t[:, np.newaxis] * ab).T)
+
+
+def _initial_intervals(
+    xy: np.ndarray, offsets: np.ndarray, keep: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    counts = np.diff(offsets)
+    lines = counts > 2
+    start = offsets[:-1][lines]
+    end = offsets[1:][lines] - 1
+    keep[start] = True
+    keep[end] = True
+
+    closed = (xy[start] == xy[end]).all(axis=1) & (end - start >= 3)
+    third = start + (end - start) // 3
+    two_thirds = start + 2 * (end - start) // 3
+    keep[third[closed]] = True
+    keep[two_thirds[closed]] = True
+    starts = np.concatenate(
+        [start[~closed], start[closed], third[closed], two_thirds[closed]]
+    )
+    ends = np.concatenate(
+        [end[~closed], third[closed], two_thirds[closed], end[closed]]
+    )
+    # Lines of one or two vertices cannot be simplified.
+    short = (counts > 0) & ~lines
+    keep[offsets[:-1][short]] = True
+    keep[offsets[1:][short] - 1] = True
+    return starts, ends
+
+
+def _farthest(
+    xy: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the first interior vertex with the maximum distance to the segment
+    of every interval, and that distance. Every interval must have at least
+    one interior vertex.
+    """
+    interior = ends - starts - 1
+    # The interior vertices of all intervals, and their interval.
+    owner = np.repeat(np.arange(len(starts)), interior)
+    first = np.zeros(len(starts), dtype=np.int64)
+    np.cumsum(interior[:-1], out=first[1:])
+    index = np.arange(len(owner)) - first[owner] + starts[owner] + 1
+    distance = _segment_distance(xy[index], xy[starts[owner]], xy[ends[owner]])
+
+    maximum = np.maximum.reduceat(distance, first)
+    candidates = np.flatnonzero(distance == maximum[owner])
+    _, at = np.unique(owner[candidates], return_index=True)
+    return index[candidates[at]], maximum
+
+
+def _douglas_peucker(
+    xy: np.ndarray, offsets: np.ndarray, tolerance: float
+) -> np.ndarray:
+    keep = np.zeros(len(xy), dtype=bool)
+    starts, ends = _initial_intervals(xy, offsets, keep)
+
+    while True:
+        valid = ends - starts > 1
+        starts = starts[valid]
+        ends = ends[valid]
+        if len(starts) == 0:
+            break
+
+        farthest, maximum = _farthest(xy, starts, ends)
+        split = maximum > tolerance
+        farthest = farthest[split]
+        keep[farthest] = True
+        starts, ends = (
+            np.concatenate([starts[split], farthest]),
+            np.concatenate([farthest, ends[split]]),
+        )
+
+    return keep
+
+
+def _segments(offsets: np.ndarray, keep: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """The start and end vertex of every segment of the simplified lines."""
+    kept = np.flatnonzero(keep)
+    line = np.searchsorted(offsets, kept, side="right") - 1
+    same = line[1:] == line[:-1]
+    return kept[:-1][same], kept[1:][same]
+
+
+def _segment_cells(
+    p: np.ndarray, q: np.ndarray, size: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the grid cells crossed by every segment p-q, as pairs of segment
+    and cell number. The cells of a segment are found column by column, so
+    that a long diagonal segment does not cover its whole bounding box.
+    """
+    # Work in cell units, with every segment running in positive x.
+    origin = np.minimum(p, q).min(axis=0)
+    a = (p - origin) / size
+    b = (q - origin) / size
+    swap = a[:, 0] > b[:, 0]
+    a[swap], b[swap] = b[swap], a[swap].copy()
+    # Widen the ranges a little, so that rounding never misses a cell.
+    eps = 1.0e-9
+
+    first = np.floor(a[:, 0] - eps).astype(np.int64)
+    ncol = np.floor(b[:, 0] + eps).astype(np.int64) - first + 1
+    segment = np.repeat(np.arange(len(p)), ncol)
+    column = first[segment] + _local_index(ncol)
+
+    # The y range of the segment within every column.
+    ax, ay = a[segment].T
+    bx, by = b[segment].T
+    dx = bx - ax
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(dx > 0.0, (by - ay) / dx, 0.0)
+    y0 = np.where(dx > 0.0, ay + (np.maximum(ax, column) - ax) * slope, ay)
+    y1 = np.where(dx > 0.0, ay + (np.minimum(bx, column + 1) - ax) * slope, by)
+    first_row = np.floor(np.minimum(y0, y1) - eps).astype(np.int64)
+    nrow = np.floor(np.maximum(y0, y1) + eps).astype(np.int64) - first_row + 1
+
+    segment = np.repeat(segment, nrow)
+    column = np.repeat(column, nrow) + 1
+    row = np.repeat(first_row, nrow) + _local_index(nrow) + 1
+    return segment, row * (column.max() + 1) + column
+
+
+def _local_index(count: np.ndarray) -> np.ndarray:
+    """The position of every element within its group of ``count``."""
+    total = np.cumsum(count)
+    return np.arange(total[-1] if len(total) else 0) - np.repeat(total - count, count)
+
+
+def _candidate_pairs(
+    p: np.ndarray, q: np.ndarray, check: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the pairs of segments p-q which cross a common grid cell, and at
+    least one of which is checked. Every pair occurs once.
+
+    The cell size is the mean extent of the segments.
+    """
+    size = np.abs(q - p).max(axis=1).mean()
+    if not size > 0.0:
+        size = 1.0
+    segment, cell = _segment_cells(p, q, size)
+
+    # Pair every checked segment with all other segments in the same cell.
+    order = np.argsort(cell, kind="stable")
+    cell = cell[order]
+    segment = segment[order]
+    new_cell = np.concatenate([[True], cell[1:] != cell[:-1]])
+    group_start = np.flatnonzero(new_cell)
+    group_size = np.diff(np.append(group_start, len(cell)))
+    checked = np.flatnonzero(check[segment])
+    group = np.cumsum(new_cell)[checked] - 1
+    npair = group_size[group]
+    a = np.repeat(segment[checked], npair)
+    b = segment[np.repeat(group_start[group], npair) + _local_index(npair)]
+    other = a != b
+    n = len(p)
+    pairs = np.unique(
+        np.minimum(a[other], b[other]) * n + np.maximum(a[other], b[other])
+    )
+    return pairs // n, pairs % n
+
+
+def _orientation(p: np.ndarray, q: np.ndarray, r: np.ndarray) -> np.ndarray:
+    """The sign of the cross product of q - p and r - p."""
+    return np.sign(
+        (q[:, 0] - p[:, 0]) * (r[:, 1] - p[:, 1])
+        - (q[:, 1] - p[:, 1]) * (r[:, 0] - p[:, 0])
+    )
+
+
+def _intersect(
+    p1: np.ndarray, p2: np.ndarray, q1: np.ndarray, q2: np.ndarray
+) -> np.ndarray:
+    """
+    Whether the segments p1-p2 and q1-q2 intersect, other than in a shared
+    end point. Collinear segments, such as adjacent segments of a straight
+    line, intersect only if they overlap beyond a shared end point.
+    """
+    o1 = _orientation(p1, p2, q1)
+    o2 = _orientation(p1, p2, q2)
+    o3 = _orientation(q1, q2, p1)
+    o4 = _orientation(q1, q2, p2)
+    collinear = (o1 == 0) & (o2 == 0)
+    # Collinear segments intersect if their bounding boxes overlap.
+    overlap = (
+        (np.minimum(p1, p2) <= np.maximum(q1, q2))
+        & (np.minimum(q1, q2) <= np.maximum(p1, p2))
+    ).all(axis=1)
+    intersect = np.where(collinear, overlap, (o1 * o2 <= 0) & (o3 * o4 <= 0))
+    # Non-collinear segments sharing an end point meet only in that point.
+    # Collinear segments do too, if they lie on either side of the point.
+    shared = np.zeros(len(p1), dtype=bool)
+    touching = np.zeros(len(p1), dtype=bool)
+    for p, p_other in ((p1, p2), (p2, p1)):
+        for q, q_other in ((q1, q2), (q2, q1)):
+            at = (p == q).all(axis=1)
+            opposite = ((p_other - p) * (q_other - q)).sum(axis=1) <= 0.0
+            shared |= at
+            touching |= at & opposite
+    return intersect & np.where(collinear, ~touching, ~shared)
+
+
+def _crossing_shortcuts(
+    xy: np.ndarray, starts: np.ndarray, ends: np.ndarray, check: np.ndarray
+) -> np.ndarray:
+    """
+    Return whether every segment is a shortcut, replacing removed vertices,
+    which intersects another segment. Only the intersections with at least
+    one checked segment are considered.
+    """
+    shortcut = ends - starts > 1
+    crossing = np.zeros(len(starts), dtype=bool)
+    if not (shortcut.any() and check.any()):
+        return crossing
+    p = xy[starts]
+    q = xy[ends]
+    a, b = _candidate_pairs(p, q, check)
+    involved = shortcut[a] | shortcut[b]
+    a = a[involved]
+    b = b[involved]
+    bad = _intersect(p[a], q[a], p[b], q[b])
+    crossing[a[bad]] = True
+    crossing[b[bad]] = True
+    return crossing & shortcut
+
+
+def douglas_peucker(
+    xy: np.ndarray, offsets: np.ndarray, tolerance: float
+) -> np.ndarray:
+    """
+    Find the vertices to keep.
+
+    Every removed vertex lies within the tolerance of the simplified line.
+    The simplified lines do not cross where the original lines do not.
+
+    Parameters
+    ----------
+    xy: np.ndarray of floats with shape (n_vertex, ndim)
+        Only the first two columns, x and y, are used.
+    offsets: np.ndarray of integers with shape (n_line + 1,)
+        Start of every line in xy.
+    tolerance: float
+        The maximum distance of a removed vertex to the simplified line.
+
+    Returns
+    -------
+    keep: np.ndarray of bools with shape (n_vertex,)
+
+    """
+    xy = np.asarray(xy, dtype=np.float64)[:, :2]
+    offsets = np.asarray(offsets, dtype=np.int64)
+    keep = _douglas_peucker(xy, offsets, tolerance)
+
+    # Every iteration keeps at least one more vertex: this ends, at the
+    # latest, with all vertices kept. Only the segments created by the
+    # previous iteration need to be checked again.
+    added = keep.copy()
+    while True:
+        starts, ends = _segments(offsets, keep)
+        check = added[starts] | added[ends]
+        crossing = _crossing_shortcuts(xy, starts, ends, check)
+        if not crossing.any():
+            break
+        farthest, _ = _farthest(xy, starts[crossing], ends[crossing])
+        added[:] = False
+        added[farthest] = True
+        keep[farthest] = True
+
+    return keep
+
+
+def simplify_lines(
+    xy: np.ndarray, offsets: np.ndarray, tolerance: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simplify lines, keeping any z and m values of the remaining vertices.
+
+    Only the lines passed together are prevented from crossing: lines which
+    are simplified in separate calls, such as the pathlines of different
+    chunks of a trace file, may cross after simplification.
+
+    Parameters
+    ----------
+    xy: np.ndarray of floats with shape (n_vertex, ndim)
+        The vertices of all lines. Only the first two columns, x and y, are
+        used to simplify; the other columns are kept.
+    offsets: np.ndarray of integers with shape (n_line + 1,)
+        Start of every line in xy.
+    tolerance: float
+        The maximum distance of a removed vertex to the simplified line.
+
+    Returns
+    -------
+    xy: np.ndarray of floats with shape (n_kept, ndim)
+    offsets: np.ndarray of integers with shape (n_line + 1,)
+
+    """
+    keep = douglas_peucker(xy, offsets, tolerance)
+    kept = np.zeros(len(keep) + 1, dtype=np.int64)
+    np.cumsum(keep, out=kept[1:])
+    return xy[keep], kept[offsets]
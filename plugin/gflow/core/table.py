@@ -0,0 +1,76 @@
+"""
+Attribute tables stored column by column.
+
+The tables are read from QGIS layers or GeoPackages by ``gflow.core.extractor``,
+but do not depend on QGIS themselves.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from gflow.core.wkb import GeometryBlock
+
+
+class ColumnarTable:
+    """
+    Attribute table stored column by column.
+
+    Integer fields are stored as int64 arrays with 0 for NULL values, other
+    numeric fields as float64 arrays with NaN for NULL values, and all other
+    fields as object arrays with None for NULL values. The null mask of every
+    column records which values were NULL in the layer.
+
+    The geometries, if any, are stored as a single GeometryBlock.
+    """
+
+    def __init__(
+        self,
+        fid: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        null: Dict[str, np.ndarray],
+        geometry: Optional[GeometryBlock] = None,
+    ):
+        self.fid = fid
+        self.columns = columns
+        self.null = null
+        self.geometry = geometry
+        if geometry is not None:
+            self.null["geometry"] = geometry.null
+
+    def __len__(self) -> int:
+        return len(self.fid)
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.columns[key]
+
+    def __iter__(self):
+        return iter(self.records())
+
+    def records(self, geometry: bool = True) -> List[Dict[str, Any]]:
+        """
+        Convert to row-wise dictionaries, with None for NULL values.
+
+        The centroid is not included: use ``geometry.centroids`` instead.
+        The geometry is only included if ``geometry`` is True.
+        """
+        columns = {
+            name: [
+                None if isnull else value
+                for value, isnull in zip(
+                    column.tolist(), self.null[name].tolist(), strict=True
+                )
+            ]
+            for name, column in self.columns.items()
+        }
+        if columns:
+            records = [
+                dict(zip(columns, row, strict=True))
+                for row in zip(*columns.values(), strict=True)
+            ]
+        else:
+            records = [{} for _ in range(len(self))]
+        if geometry and self.geometry is not None:
+            for record, vertices in zip(records, self.geometry.to_lists(), strict=True):
+                record["geometry"] = vertices
+        return records
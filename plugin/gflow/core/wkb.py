@@ -0,0 +1,494 @@
+"""
+Decode well-known binary (WKB) geometries into flat coordinate arrays, and
+encode flat coordinate arrays into GeoPackage geometry blobs.
+
+Walking the vertices of a QgsGeometry one by one is slow for layers with many
+features or vertices. Instead, the WKB of every feature is read once, and the
+coordinates of every ring or linestring are decoded in a single
+``numpy.frombuffer`` call. The result for a whole layer is stored as a single
+block of coordinates, with offsets to find the rings, parts, and features.
+
+Only x and y are kept: GFLOW is a two dimensional model.
+"""
+
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+POINT = 1
+LINESTRING = 2
+POLYGON = 3
+MULTIPOINT = 4
+MULTILINESTRING = 5
+MULTIPOLYGON = 6
+GEOMETRYCOLLECTION = 7
+
+# Extended WKB (as written by e.g. PostGIS) uses flags instead of the ISO
+# offsets of 1000, 2000, 3000 for Z, M, ZM.
+EWKB_Z = 0x80000000
+EWKB_M = 0x40000000
+EWKB_SRID = 0x20000000
+
+
+def _read_header(buffer: bytes, offset: int) -> Tuple[str, int, int, int]:
+    """Return byte order, base geometry type, number of dimensions, offset."""
+    byteorder = "<" if buffer[offset] == 1 else ">"
+    (code,) = struct.unpack_from(f"{byteorder}I", buffer, offset + 1)
+    offset += 5
+    ndim = 2
+    if code & (EWKB_Z | EWKB_M | EWKB_SRID):
+        ndim += bool(code & EWKB_Z) + bool(code & EWKB_M)
+        if code & EWKB_SRID:
+            offset += 4
+        code &= 0x0FFFFFFF
+    else:
+        ndim += (1, 1, 2)[code // 1000 - 1] if code >= 1000 else 0
+        code %= 1000
+    return byteorder, code, ndim, offset
+
+
+class _Decoder:
+    """Accumulates the coordinates and offsets of many WKB geometries."""
+
+    def __init__(self):
+        self.coordinates = []
+        self.ring_lengths = []
+        self.part_lengths = []
+        self.feature_lengths = []
+
+    def _read_ring(self, buffer, offset, byteorder, ndim) -> int:
+        (n,) = struct.unpack_from(f"{byteorder}I", buffer, offset)
+        offset += 4
+        xy = np.frombuffer(
+            buffer, dtype=f"{byteorder}f8", count=n * ndim, offset=offset
+        ).reshape(n, ndim)[:, :2]
+        self.coordinates.append(xy)
+        self.ring_lengths.append(n)
+        return offset + 8 * n * ndim
+
+    def _read_geometry(self, buffer, offset) -> Tuple[int, int]:
+        """Read a single geometry; return the new offset and number of parts."""
+        byteorder, code, ndim, offset = _read_header(buffer, offset)
+        if code == POINT:
+            xy = np.frombuffer(
+                buffer, dtype=f"{byteorder}f8", count=ndim, offset=offset
+            )[:2].reshape(1, 2)
+            offset += 8 * ndim
+            # An empty point is stored as NaN coordinates.
+            if np.isnan(xy).all():
+                return offset, 0
+            self.coordinates.append(xy)
+            self.ring_lengths.append(1)
+            self.part_lengths.append(1)
+            return offset, 1
+        elif code == LINESTRING:
+            offset = self._read_ring(buffer, offset, byteorder, ndim)
+            self.part_lengths.append(1)
+            return offset, 1
+        elif code == POLYGON:
+            (nring,) = struct.unpack_from(f"{byteorder}I", buffer, offset)
+            offset += 4
+            for _ in range(nring):
+                offset = self._read_ring(buffer, offset, byteorder, ndim)
+            self.part_lengths.append(nring)
+            return offset, 1
+        elif code in (MULTIPOINT, MULTILINESTRING, MULTIPOLYGON, GEOMETRYCOLLECTION):
+            (ngeom,) = struct.unpack_from(f"{byteorder}I", buffer, offset)
+            offset += 4
+            nparts = 0
+            for _ in range(ngeom):
+                offset, n = self._read_geometry(buffer, offset)
+                nparts += n
+            return offset, nparts
+        else:
+            raise ValueError(f"Unsupported WKB geometry type: {code}")
+
+    def read(self, buffer: Optional[bytes]) -> None:
+        if buffer is None:
+            self.feature_lengths.append(0)
+            return
+        _, nparts = self._read_geometry(buffer, 0)
+        self.feature_lengths.append(nparts)
+        return
+
+
+def gpkg_to_wkb(blob: Optional[bytes]) -> Optional[bytes]:
+    """
+    Strip the header of a GeoPackage geometry blob, leaving the WKB.
+
+    Returns None for a NULL geometry.
+    """
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    if blob[:2] != b"GP":
+        raise ValueError("Not a GeoPackage geometry blob")
+    flags = blob[3]
+    envelope = (flags >> 1) & 0b111
+    envelope_size = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}[envelope]
+    return blob[8 + envelope_size :]
+
+
+def gpkg_envelope(
+    blob: Optional[bytes],
+) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Return the (minx, maxx, miny, maxy) of a GeoPackage geometry blob.
+
+    The envelope is read from the header if present, otherwise it is computed
+    from the WKB. Returns None for a NULL or empty geometry.
+    """
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    flags = blob[3]
+    if flags & GPKG_EMPTY:
+        return None
+    if (flags >> 1) & 0b111:
+        byteorder = "<" if flags & GPKG_LITTLE_ENDIAN else ">"
+        return struct.unpack_from(f"{byteorder}4d", blob, 8)
+    decoder = _Decoder()
+    decoder.read(gpkg_to_wkb(blob))
+    if not decoder.coordinates:
+        return None
+    xy = np.concatenate(decoder.coordinates)
+    return (xy[:, 0].min(), xy[:, 0].max(), xy[:, 1].min(), xy[:, 1].max())
+
+
+# GeoPackage geometry header flags: little endian, with or without an
+# (minx, maxx, miny, maxy) envelope, empty geometry.
+GPKG_LITTLE_ENDIAN = 0b0001
+GPKG_ENVELOPE_XY = 0b0010
+GPKG_EMPTY = 0b10000
+GPKG_POINT = np.dtype(
+    [
+        ("magic", "S2"),
+        ("version", "u1"),
+        ("flags", "u1"),
+        ("srs_id", "<i4"),
+        ("byteorder", "u1"),
+        ("code", "<u4"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+    ]
+)
+WKB_CODES = {"Point": POINT, "Linestring": LINESTRING, "Polygon": POLYGON}
+# ISO WKB geometry type offsets for XY, XYZ, XYZM.
+ISO_OFFSETS = {2: 0, 3: 1000, 4: 3000}
+
+
+def _envelopes(xy: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """The (minx, maxx, miny, maxy) of every feature, NaN if it is empty."""
+    envelopes = np.full((len(offsets) - 1, 4), np.nan)
+    nonempty = np.diff(offsets) > 0
+    if nonempty.any():
+        starts = offsets[:-1][nonempty]
+        envelopes[nonempty, 0] = np.minimum.reduceat(xy[:, 0], starts)
+        envelopes[nonempty, 1] = np.maximum.reduceat(xy[:, 0], starts)
+        envelopes[nonempty, 2] = np.minimum.reduceat(xy[:, 1], starts)
+        envelopes[nonempty, 3] = np.maximum.reduceat(xy[:, 1], starts)
+    return envelopes
+
+
+def _point_blobs(xy: np.ndarray, srs_id: int) -> List[bytes]:
+    # All blobs have the same size: encode them in a single array.
+    records = np.empty(len(xy), dtype=GPKG_POINT)
+    records["magic"] = b"GP"
+    records["version"] = 0
+    records["flags"] = GPKG_LITTLE_ENDIAN
+    records["srs_id"] = srs_id
+    records["byteorder"] = 1
+    records["code"] = POINT
+    records["x"] = xy[:, 0]
+    records["y"] = xy[:, 1]
+    buffer = records.tobytes()
+    size = GPKG_POINT.itemsize
+    return [buffer[i : i + size] for i in range(0, len(buffer), size)]
+
+
+def _linestring_blobs(
+    xy: np.ndarray, nvertex: int, envelopes: np.ndarray, srs_id: int
+) -> List[bytes]:
+    ndim = xy.shape[1]
+    # All linestrings have the same number of vertices, e.g. line segments:
+    # encode them in a single array, like the points.
+    dtype = np.dtype(
+        [
+            ("magic", "S2"),
+            ("version", "u1"),
+            ("flags", "u1"),
+            ("srs_id", "<i4"),
+            ("envelope", "<f8", (4,)),
+            ("byteorder", "u1"),
+            ("code", "<u4"),
+            ("nvertex", "<u4"),
+            ("xy", "<f8", (nvertex, ndim)),
+        ]
+    )
+    records = np.empty(len(envelopes), dtype=dtype)
+    records["magic"] = b"GP"
+    records["version"] = 0
+    records["flags"] = GPKG_LITTLE_ENDIAN | GPKG_ENVELOPE_XY
+    records["srs_id"] = srs_id
+    records["envelope"] = envelopes
+    records["byteorder"] = 1
+    records["code"] = LINESTRING + ISO_OFFSETS[ndim]
+    records["nvertex"] = nvertex
+    records["xy"] = xy.reshape(-1, nvertex, ndim)
+    buffer = records.tobytes()
+    size = dtype.itemsize
+    return [buffer[i : i + size] for i in range(0, len(buffer), size)]
+
+
+def wkb_to_gpkg(
+    wkb: bytes, srs_id: int, envelope: Tuple[float, float, float, float]
+) -> bytes:
+    """Prefix WKB with a GeoPackage header, with a (minx, maxx, miny, maxy) envelope."""
+    flags = GPKG_LITTLE_ENDIAN | GPKG_ENVELOPE_XY
+    return struct.pack("<2sBBi4d", b"GP", 0, flags, srs_id, *envelope) + bytes(wkb)
+
+
+def to_gpkg_blobs(
+    geometry_type: str, xy: np.ndarray, offsets: np.ndarray, srs_id: int
+) -> Tuple[List[Optional[bytes]], np.ndarray]:
+    """
+    Encode the geometries of all features as GeoPackage geometry blobs.
+
+    Parameters
+    ----------
+    geometry_type: str
+        One of "Point", "Linestring", "Polygon". Polygons have a single ring,
+        which is closed if necessary.
+    xy: np.ndarray of floats with shape (n_vertex, ndim)
+        The x, y, and optionally z and m, of every vertex. Three columns are
+        x, y, z; four columns are x, y, z, m.
+    offsets: np.ndarray of integers with shape (n_feature + 1,)
+        Start of every feature in xy. Features without vertices are NULL.
+    srs_id: int
+        The srs_id of the geometries, as in gpkg_spatial_ref_sys.
+
+    Returns
+    -------
+    blobs: List of bytes or None
+    envelopes: np.ndarray of floats with shape (n_feature, 4)
+        The (minx, maxx, miny, maxy) of every feature, NaN for NULL.
+
+    """
+    xy = np.ascontiguousarray(xy, dtype="<f8")
+    ndim = xy.shape[1] if xy.ndim == 2 else 2
+    xy = xy.reshape(-1, ndim)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    envelopes = _envelopes(xy, offsets)
+    if geometry_type == "Point" and ndim == 2 and (np.diff(offsets) == 1).all():
+        return _point_blobs(xy[offsets[:-1]], srs_id), envelopes
+    counts = np.diff(offsets)
+    if (
+        geometry_type == "Linestring"
+        and len(counts) > 0
+        and counts[0] > 0
+        and (counts == counts[0]).all()
+    ):
+        return _linestring_blobs(xy, counts[0], envelopes, srs_id), envelopes
+
+    base = WKB_CODES[geometry_type]
+    code = base + ISO_OFFSETS[ndim]
+    header = struct.Struct("<2sBBi4dBI")
+    flags = GPKG_LITTLE_ENDIAN | GPKG_ENVELOPE_XY
+    blobs = []
+    for start, end, envelope in zip(
+        offsets[:-1], offsets[1:], envelopes.tolist(), strict=True
+    ):
+        if end == start:
+            blobs.append(None)
+            continue
+        vertices = xy[start:end]
+        pieces = [header.pack(b"GP", 0, flags, srs_id, *envelope, 1, code)]
+        if base == POINT:
+            vertices = vertices[:1]
+        elif base == POLYGON:
+            if (vertices[0] != vertices[-1]).any():
+                vertices = np.concatenate([vertices, vertices[:1]])
+            pieces.append(struct.pack("<II", 1, len(vertices)))
+        else:
+            pieces.append(struct.pack("<I", len(vertices)))
+        pieces.append(vertices.tobytes())
+        blobs.append(b"".join(pieces))
+    return blobs, envelopes
+
+
+def _offsets(lengths: Sequence[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+class GeometryBlock:
+    """
+    The geometries of all features of a layer, stored as flat arrays.
+
+    Attributes
+    ----------
+    xy: np.ndarray of floats with shape (n_vertex, 2)
+        The coordinates of all vertices, in the order of the features.
+    ring_offsets: np.ndarray of integers with shape (n_ring + 1,)
+        Start of every ring in ``xy``. A ring is a point, a linestring, or the
+        exterior or interior ring of a polygon.
+    part_offsets: np.ndarray of integers with shape (n_part + 1,)
+        Start of every part in the rings. A polygon part consists of its
+        exterior ring followed by its interior rings.
+    feature_part_offsets: np.ndarray of integers with shape (n_feature + 1,)
+        Start of every feature in the parts.
+    null: np.ndarray of bools with shape (n_feature,)
+        Whether the geometry of a feature is NULL.
+
+    """
+
+    def __init__(
+        self,
+        xy: np.ndarray,
+        ring_offsets: np.ndarray,
+        part_offsets: np.ndarray,
+        feature_part_offsets: np.ndarray,
+        null: np.ndarray,
+    ):
+        self.xy = xy
+        self.ring_offsets = ring_offsets
+        self.part_offsets = part_offsets
+        self.feature_part_offsets = feature_part_offsets
+        self.null = null
+
+    @classmethod
+    def from_wkb(cls, buffers: Sequence[Optional[bytes]]) -> "GeometryBlock":
+        """
+        Decode the WKB of every feature.
+
+        Parameters
+        ----------
+        buffers: Sequence of bytes or None
+            The WKB of every feature, None for NULL geometries.
+
+        Returns
+        -------
+        block: GeometryBlock
+
+        """
+        decoder = _Decoder()
+        for buffer in buffers:
+            decoder.read(buffer)
+        if decoder.coordinates:
+            xy = np.concatenate(decoder.coordinates).astype(np.float64, copy=False)
+        else:
+            xy = np.empty((0, 2), dtype=np.float64)
+        null = np.array([buffer is None for buffer in buffers], dtype=bool)
+        return cls(
+            xy=xy,
+            ring_offsets=_offsets(decoder.ring_lengths),
+            part_offsets=_offsets(decoder.part_lengths),
+            feature_part_offsets=_offsets(decoder.feature_lengths),
+            null=null,
+        )
+
+    def __len__(self) -> int:
+        return len(self.feature_part_offsets) - 1
+
+    @property
+    def feature_ring_offsets(self) -> np.ndarray:
+        """Start of every feature in the rings."""
+        return self.part_offsets[self.feature_part_offsets]
+
+    @property
+    def feature_offsets(self) -> np.ndarray:
+        """Start of every feature in ``xy``."""
+        return self.ring_offsets[self.feature_ring_offsets]
+
+    def coordinates(self, i: int) -> np.ndarray:
+        """All vertices of feature i, in the order of QgsGeometry.vertices()."""
+        offsets = self.feature_offsets
+        return self.xy[offsets[i] : offsets[i + 1]]
+
+    def to_lists(self) -> List[Optional[List[Tuple[float, float]]]]:
+        """The vertices of every feature as a list of (x, y) tuples."""
+        offsets = self.feature_offsets.tolist()
+        vertices = list(map(tuple, self.xy.tolist()))
+        return [
+            None if isnull else vertices[start:end]
+            for start, end, isnull in zip(
+                offsets[:-1], offsets[1:], self.null, strict=True
+            )
+        ]
+
+    def _ring_centroids(self, area_weighted: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Centroid and weight of every ring."""
+        rings = self.ring_offsets
+        nring = len(rings) - 1
+        centroids = np.zeros((nring, 2))
+        weights = np.zeros(nring)
+        for i in range(nring):
+            xy = self.xy[rings[i] : rings[i + 1]]
+            if len(xy) < 2:
+                centroids[i] = xy[0] if len(xy) else np.nan
+                continue
+            x0, y0 = xy[:-1].T
+            x1, y1 = xy[1:].T
+            if area_weighted:
+                cross = x0 * y1 - x1 * y0
+                area = 0.5 * cross.sum()
+                if area == 0.0:
+                    continue
+                centroids[i, 0] = ((x0 + x1) * cross).sum() / (6.0 * area)
+                centroids[i, 1] = ((y0 + y1) * cross).sum() / (6.0 * area)
+                weights[i] = abs(area)
+            else:
+                length = np.hypot(x1 - x0, y1 - y0)
+                total = length.sum()
+                if total == 0.0:
+                    continue
+                centroids[i, 0] = (0.5 * (x0 + x1) * length).sum() / total
+                centroids[i, 1] = (0.5 * (y0 + y1) * length).sum() / total
+                weights[i] = total
+        return centroids, weights
+
+    def centroids(self, geometry_type: str) -> np.ndarray:
+        """
+        Compute the centroid of every feature on demand.
+
+        Points are averaged, linestrings are weighted by length, and polygons
+        by area, with the interior rings subtracted.
+
+        Parameters
+        ----------
+        geometry_type: str
+            One of "Point", "Linestring", "Polygon".
+
+        Returns
+        -------
+        centroids: np.ndarray of floats with shape (n_feature, 2)
+            NaN for NULL or empty geometries.
+
+        """
+        polygon = geometry_type == "Polygon"
+        ring_centroids, weights = self._ring_centroids(area_weighted=polygon)
+        if geometry_type == "Point":
+            weights[:] = 1.0
+        elif polygon:
+            # Every first ring of a part is the exterior, the others are holes.
+            exterior = np.zeros(len(weights), dtype=bool)
+            exterior[self.part_offsets[:-1][np.diff(self.part_offsets) > 0]] = True
+            weights[~exterior] *= -1.0
+
+        feature_rings = self.feature_ring_offsets
+        centroids = np.full((len(self), 2), np.nan)
+        for i in range(len(self)):
+            start, end = feature_rings[i], feature_rings[i + 1]
+            w = weights[start:end]
+            total = w.sum()
+            if total != 0.0:
+                centroids[i] = (ring_centroids[start:end] * w[:, None]).sum(
+                    axis=0
+                ) / total
+            else:
+                xy = self.coordinates(i)
+                if len(xy):
+                    centroids[i] = xy.mean(axis=0)
+        return centroids
@@ -1,7 +1,7 @@
 import datetime
 import subprocess
 from pathlib import Path
-from typing import NamedTuple, Tuple, Union
+from typing import List, NamedTuple, Optional, Tuple, Union
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import (
@@ -13,6 +13,7 @@ from PyQt5.QtWidgets import (
     QLabel,
     QLineEdit,
     QPushButton,
+    QSpinBox,
     QVBoxLayout,
     QWidget,
 )
@@ -27,10 +28,16 @@ from qgis.core import (
 from qgis.gui import QgsMapLayerComboBox
 
 from gflow.core import layer_styling
-from gflow.core.processing import (
-    raster_contours,
+from gflow.core.extract import extraction_to_layers, requested_headers
+from gflow.core.geopackage import GeoPackageWriter
+from gflow.core.pathlines import (
+    particle_directions,
+    pathline_features,
+    pathline_segments,
+    read_pathlines,
 )
-from gflow.core.extract import extraction_to_layers
+from gflow.core.processing import ContourCache, grid_to_geotiff, is_up_to_date
+from gflow.core.simplify import simplify_lines, simplify_tolerance
 
 
 class OutputOptions(NamedTuple):
@@ -38,12 +45,13 @@ class OutputOptions(NamedTuple):
     mesh: bool
     contours: bool
     piezometer: bool
-    gage: bool
-    lake_stage: bool
     discharge: bool
     flux_inspector: bool
     pathlines: bool
     spacing: float
+    pathline_segments: bool = False
+    simplify: bool = False
+    decimals: Optional[int] = None
 
 
 class ComputeTask(QgsTask):
@@ -119,11 +127,28 @@ class ComputeTask(QgsTask):
             output = self.data["output_options"]
             name = f"{Path(path).stem}"
             self.parent.parent.create_output_group(name=f"{name} output")
-            if output.raster:
-                self.parent.load_raster_result(path, output.contours)
-            if output.pathlines:
-                self.parent.load_pathlines_result(path)
-            self.parent.load_extract_result(path)
+            # Write all vector output in a single transaction; the layers
+            # can only be added once it has been committed.
+            gpkg_path = str(Path(path).with_suffix(".output.gpkg"))
+            contours = None
+            pathlines = None
+            with GeoPackageWriter(gpkg_path) as writer:
+                if output.raster:
+                    contours = self.parent.load_raster_result(path, output, writer)
+                if output.pathlines:
+                    pathlines = self.parent.load_pathlines_result(path, output, writer)
+                extracted = self.parent.load_extract_result(path, output, writer)
+
+            if contours is not None:
+                self.parent.add_contour_layer(writer.layer(contours))
+            if pathlines is not None:
+                self.parent.output_group.add_layer(
+                    writer.layer(pathlines), "vector", on_top=True
+                )
+            for layername in extracted:
+                self.parent.output_group.add_layer(
+                    writer.layer(layername), "vector", on_top=False
+                )
 
         else:
             self.push_failure_message()
@@ -135,12 +160,93 @@ class ComputeTask(QgsTask):
         return
 
 
+class ConvertTask(QgsTask):
+    """
+    Extract, validate, and render the elements, and write the GFLOW input.
+    Starts the computation on success.
+    """
+
+    def __init__(self, parent, job, data, message_bar):
+        super().__init__(self.task_description, QgsTask.CanCancel)
+        self.parent = parent
+        self.job = job
+        self.data = data
+        self.message_bar = message_bar
+        self.exception = None
+        self.errors = None
+
+    @property
+    def task_description(self):
+        return "GFLOW model conversion"
+
+    def run(self):
+        # Avoid a circular import: formatting imports OutputOptions.
+        from gflow.core.formatting import write_gflow_file
+
+        try:
+            # The last tenth of the progress is writing the file.
+            completed = self.job.run(
+                progress=lambda percentage: self.setProgress(0.9 * percentage),
+                canceled=self.isCanceled,
+            )
+            if not completed:
+                return False
+            self.errors, gflow_data = self.job.merge()
+            if self.errors:
+                return True
+            write_gflow_file(
+                self.data["path"],
+                gflow_data,
+                name=self.data["name"],
+                output_options=self.data["output_options"],
+            )
+            self.setProgress(100.0)
+            return True
+
+        except Exception as exception:
+            self.exception = exception
+            return False
+
+    def finished(self, result):
+        self.job.finish()
+        if not result:
+            self.parent.set_interpreter_interaction(True)
+            if self.exception is not None:
+                self.message_bar.pushMessage(
+                    title="Error",
+                    text=f"Failed {self.task_description}. Exception: {self.exception}",
+                    level=Qgis.Critical,
+                )
+            return
+
+        if self.errors:
+            self.parent.set_interpreter_interaction(True)
+            self.parent.parent.dataset_widget.show_validation_errors(self.errors)
+            return
+
+        self.message_bar.pushMessage(
+            title="Info",
+            text=f"Converted geopackage to GFLOW .dat file: {self.data['path']}",
+            level=Qgis.Info,
+        )
+        self.parent.start_compute_task(self.data)
+        return
+
+    def cancel(self) -> None:
+        self.parent.set_interpreter_interaction(True)
+        super().cancel()
+        return
+
+
 class ComputeWidget(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.convert_task = None
         self.compute_task = None
         self.start_task = None
         self.parent = parent
+        # Contours by level, for redrawing them interactively.
+        self.contour_cache = ContourCache()
 
         self.domain_button = QPushButton("Set to current extent")
         self.compute_button = QPushButton("Compute")
@@ -150,22 +256,38 @@ class ComputeWidget(QWidget):
         self.raster_checkbox = QCheckBox("Raster")
         self.contours_checkbox = QCheckBox("Contours")
         self.piezometer_checkbox = QCheckBox("Piezometer")
-        self.gage_checkbox = QCheckBox("Gage")
-        self.lake_stage_checkbox = QCheckBox("Lake Stage")
         self.discharge_checkbox = QCheckBox("Discharge")
         self.flux_inspector_checkbox = QCheckBox("Flux Inspector")
         self.pathlines_checkbox = QCheckBox("Pathlines")
+        # A feature per segment, rather than per pathline.
+        self.pathline_segments_checkbox = QCheckBox("Pathline segments")
+        # Simplify pathlines and contours; keep the full resolution separately.
+        self.simplify_checkbox = QCheckBox("Simplify lines")
 
         self.spacing_spin_box = QDoubleSpinBox()
         self.spacing_spin_box.setMinimum(0.0)
         self.spacing_spin_box.setMaximum(10_000.0)
         self.spacing_spin_box.setSingleStep(1.0)
+        # Number of decimals of the coordinates in the GFLOW input.
+        self.decimals_spin_box = QSpinBox()
+        self.decimals_spin_box.setMinimum(-1)
+        self.decimals_spin_box.setMaximum(15)
+        self.decimals_spin_box.setSpecialValueText("Shortest")
         self.domain_button.clicked.connect(self.domain)
         # By default: all output
         self.mesh_checkbox.toggled.connect(self.contours_checkbox.setEnabled)
         self.mesh_checkbox.toggled.connect(
             lambda checked: not checked and self.contours_checkbox.setChecked(False)
         )
+        self.pathline_segments_checkbox.setEnabled(False)
+        self.pathlines_checkbox.toggled.connect(
+            self.pathline_segments_checkbox.setEnabled
+        )
+        self.pathlines_checkbox.toggled.connect(
+            lambda checked: (
+                not checked and self.pathline_segments_checkbox.setChecked(False)
+            )
+        )
 
         # self.mesh_checkbox = QCheckBox("Trimesh")
         self.output_line_edit = QLineEdit()
@@ -205,8 +327,12 @@ class ComputeWidget(QWidget):
         domain_row = QHBoxLayout()
         domain_row.addWidget(QLabel("Grid spacing"))
         domain_row.addWidget(self.spacing_spin_box)
+        decimals_row = QHBoxLayout()
+        decimals_row.addWidget(QLabel("Coordinate decimals"))
+        decimals_row.addWidget(self.decimals_spin_box)
         domain_layout.addWidget(self.domain_button)
         domain_layout.addLayout(domain_row)
+        domain_layout.addLayout(decimals_row)
 
         output_row = QHBoxLayout()
         output_row.addWidget(self.output_line_edit)
@@ -220,11 +346,11 @@ class ComputeWidget(QWidget):
         result_layout.addWidget(self.raster_checkbox)
         result_layout.addWidget(self.contours_checkbox)
         result_layout.addWidget(self.piezometer_checkbox)
-        result_layout.addWidget(self.gage_checkbox)
-        result_layout.addWidget(self.lake_stage_checkbox)
         result_layout.addWidget(self.discharge_checkbox)
         result_layout.addWidget(self.flux_inspector_checkbox)
         result_layout.addWidget(self.pathlines_checkbox)
+        result_layout.addWidget(self.pathline_segments_checkbox)
+        result_layout.addWidget(self.simplify_checkbox)
 
         result_layout.addLayout(button_row)
 
@@ -252,16 +378,17 @@ class ComputeWidget(QWidget):
 
     def reset(self):
         self.spacing_spin_box.setValue(25.0)
+        self.decimals_spin_box.setValue(-1)
         self.output_line_edit.setText("")
         self.mesh_checkbox.setChecked(False)
         self.raster_checkbox.setChecked(True)
         self.contours_checkbox.setChecked(True)
         self.piezometer_checkbox.setChecked(False)
-        self.gage_checkbox.setChecked(False)
-        self.lake_stage_checkbox.setChecked(False)
         self.discharge_checkbox.setChecked(False)
         self.flux_inspector_checkbox.setChecked(False)
         self.pathlines_checkbox.setChecked(False)
+        self.pathline_segments_checkbox.setChecked(False)
+        self.simplify_checkbox.setChecked(False)
         self.contour_min_box.setValue(-5.0)
         self.contour_max_box.setValue(5.0)
         self.contour_step_box.setValue(0.5)
@@ -303,14 +430,21 @@ class ComputeWidget(QWidget):
             mesh=self.mesh_checkbox.isChecked(),
             contours=self.contours_checkbox.isChecked(),
             piezometer=self.piezometer_checkbox.isChecked(),
-            gage=self.gage_checkbox.isChecked(),
-            lake_stage=self.lake_stage_checkbox.isChecked(),
             discharge=self.discharge_checkbox.isChecked(),
             flux_inspector=self.flux_inspector_checkbox.isChecked(),
             pathlines=self.pathlines_checkbox.isChecked(),
             spacing=self.spacing_spin_box.value(),
+            pathline_segments=self.pathline_segments_checkbox.isChecked(),
+            simplify=self.simplify_checkbox.isChecked(),
+            decimals=self.decimals,
         )
 
+    @property
+    def decimals(self) -> Optional[int]:
+        # The special value of -1 means shortest round-trip.
+        decimals = self.decimals_spin_box.value()
+        return None if decimals < 0 else decimals
+
     def clear_outdated_output(self, path: str) -> None:
         path = Path(path)
         gpkg_path = path.with_suffix(".output.gpkg")
@@ -336,15 +470,22 @@ class ComputeWidget(QWidget):
 
         gpkg_path = str(path.with_suffix(".output.gpkg"))
         contours_name = "head-contours"
-
-        layer = raster_contours(
-            gpkg_path=gpkg_path,
-            layer=layer,
-            name=contours_name,
-            start=start,
-            stop=stop,
-            step=step,
-        )
+        tolerance = None
+        if self.simplify_checkbox.isChecked():
+            # The cell size of the raster is the spacing it was computed with.
+            tolerance = simplify_tolerance(layer.rasterUnitsPerPixelX())
+
+        with GeoPackageWriter(gpkg_path) as writer:
+            self.contour_cache.write(
+                writer=writer,
+                layer=layer,
+                name=contours_name,
+                start=start,
+                stop=stop,
+                step=step,
+                tolerance=tolerance,
+            )
+        layer = writer.layer(contours_name)
 
         # Re-use layer if it already exists. Otherwise add a new layer.
         project_layers = {
@@ -389,14 +530,12 @@ class ComputeWidget(QWidget):
         directory = Path(self.output_path)
         directory.mkdir(parents=True, exist_ok=True)
         path = (directory / directory.stem).absolute().with_suffix(".dat")
-        invalid_input = self.parent.dataset_widget.convert_to_gflow(path)
-        # Early return in case some problems are found.
-        if invalid_input:
-            return
+        dataset_widget = self.parent.dataset_widget
 
         task_data = {
             "gflow_path": self.parent.get_gflow_path(),
             "path": path,
+            "name": str(Path(dataset_widget.path).stem),
             "output_options": self.output_options,
         }
         # https://gis.stackexchange.com/questions/296175/issues-with-qgstask-and-task-manager
@@ -407,6 +546,17 @@ class ComputeWidget(QWidget):
         # result = task.run()
         # task.finished(result)
 
+        # Elements with uncommitted edits are extracted here; the others are
+        # read from the GeoPackage in the background.
+        job = dataset_widget.extraction_job()
+        self.convert_task = ConvertTask(self, job, task_data, self.parent.message_bar)
+        self.set_interpreter_interaction(False)
+        QgsApplication.taskManager().addTask(self.convert_task)
+        return
+
+    def start_compute_task(self, task_data) -> None:
+        """Run GFLOW on the converted model, after ConvertTask has finished."""
+        path = task_data["path"]
         # Remove the output layers from QGIS, otherwise they cannot be overwritten.
         gpkg_path = str(path)
         for layer in QgsProject.instance().mapLayers().values():
@@ -440,116 +590,170 @@ class ComputeWidget(QWidget):
         self.spacing_spin_box.setValue(dy)
         return
 
-    def load_raster_result(self, path: Union[Path, str], contours: bool) -> None:
+    def load_raster_result(
+        self,
+        path: Union[Path, str],
+        output_options: OutputOptions,
+        writer: GeoPackageWriter,
+    ) -> Optional[str]:
+        """Add the head raster; return the name of the written contours."""
         # String for QGIS functions
         path = Path(path)
-        raster_path = str(path.with_suffix(".grd")).upper()
+        grid_path = str(path.with_suffix(".grd")).upper()
+        raster_path = str(path.with_suffix(".head.tif"))
+        # Converting again would change the modification time of the GeoTIFF,
+        # which identifies its content for the statistics and contour caches.
+        if not is_up_to_date(grid_path, raster_path):
+            grid_to_geotiff(grid_path, raster_path, self.parent.crs)
         layer = QgsRasterLayer(raster_path, "head", "gdal")
+        # Read from a sidecar file if the grid has been loaded before.
+        statistics = self.contour_cache.statistics(layer)
+        minimum = maximum = None
+        if statistics is not None:
+            minimum = statistics.minimum
+            maximum = statistics.maximum
         renderer, minimum, maximum = layer_styling.pseudocolor_renderer(
-            layer, band=1, colormap="Plasma", nclass=10
+            layer,
+            band=1,
+            colormap="Plasma",
+            nclass=10,
+            minimum=minimum,
+            maximum=maximum,
         )
         layer.setRenderer(renderer)
         layer.setCrs(self.parent.crs)
         self.parent.output_group.add_layer(layer, "raster")
 
-        if contours:
+        if output_options.contours:
             # Should generally result in 20 contours.
             step = (maximum - minimum) / 21
             # If no head differences are present, no contours can be drawn.
             if step == 0.0:
-                return
+                return None
 
-            contour_layer = raster_contours(
-                gpkg_path=str(path.with_suffix(".output.gpkg")),
+            return self.contour_cache.write(
+                writer=writer,
                 layer=layer,
                 name="head-contours",
                 start=minimum,
                 stop=maximum,
                 step=step,
+                tolerance=self.tolerance(output_options),
             )
-            self.add_contour_layer(contour_layer)
-
-        return
-
-    def load_pathlines_result(self, path: Union[Path, str]) -> None:
-        from PyQt5.QtCore import Qt, QVariant
-        from qgis.core import (
-            QgsVectorLayer,
-            QgsPointXY,
-            QgsFeature,
-            QgsGeometry,
-            QgsField,
-        )
-        from qgis.core.additions.edit import edit
-        from gflow.core import geopackage
 
+        return None
+
+    @staticmethod
+    def tolerance(output_options: OutputOptions) -> Optional[float]:
+        """Return the simplification tolerance, None if not simplifying."""
+        if output_options.simplify:
+            return simplify_tolerance(output_options.spacing)
+        return None
+
+    def load_pathlines_result(
+        self,
+        path: Union[Path, str],
+        output_options: OutputOptions,
+        writer: GeoPackageWriter,
+    ) -> str:
+        """
+        Write the pathlines; return the name of the written layer.
+
+        By default, every pathline is a single LineStringZM feature, with the
+        elevation as z and the step number as m, as its m_measure states. With
+        segments, every segment is a separate feature with its start and end
+        elevation. When simplifying, the pathlines at full resolution are written to a
+        separate layer. The pathlines are simplified chunk by chunk: the
+        simplified pathlines of a chunk do not cross where the original ones
+        do not, but crossings with the pathlines of other chunks are not
+        checked. The description of the simplified layer states this.
+        """
         path = Path(path)
         pathlines_path = str(path.with_suffix(".pth")).upper()
-
-        with open(pathlines_path) as f:
-            lines = f.readlines()
-
-        # Split the lines per polyline
-        linestrings = []
-        vertices = []
-        for line in lines:
-            # Start and end lines are duplicated.
-            if line.startswith("START"):
-                # Clear the vertices
-                vertices = []
-            elif line.startswith("END"):
-                # Store the list of vertices
-                linestrings.append(vertices)
-            else:
-                # So far, we're only interested in x, y, z
-                x, y, z = [float(v) for v in line[4:47].split()]
-                vertices.append((QgsPointXY(x, y), z))
-
-        layer = QgsVectorLayer("LineString", "Pathlines", "memory")
-        provider = layer.dataProvider()
-        provider.addAttributes(
-            (
-                QgsField("start_elevation", QVariant.Double),
-                QgsField("end_elevation", QVariant.Double),
+        directions = particle_directions(path.with_suffix(".dat"))
+        # The directions are matched to the pathlines by their order.
+        nparticle = None if output_options.pathline_segments else len(directions)
+        tolerance = self.tolerance(output_options)
+
+        def simplify(xy, offsets, tolerance):
+            if tolerance is None:
+                return xy, offsets
+            return simplify_lines(xy, offsets, tolerance)
+
+        # The file is read and written chunk by chunk.
+        def chunks(tolerance):
+            for xyz, offsets, numbers in read_pathlines(
+                pathlines_path, nparticle=nparticle
+            ):
+                if output_options.pathline_segments:
+                    columns, xy, feature_offsets = pathline_segments(
+                        *simplify(xyz, offsets, tolerance)
+                    )
+                else:
+                    # Simplify afterwards, so that m keeps the original step.
+                    columns, xy, feature_offsets = pathline_features(
+                        xyz, offsets, numbers, directions
+                    )
+                    xy, feature_offsets = simplify(xy, feature_offsets, tolerance)
+                yield columns, xy, feature_offsets
+
+        if output_options.pathline_segments:
+            fields = [("start_elevation", "REAL"), ("end_elevation", "REAL")]
+            zm = False
+        else:
+            fields = [
+                ("particle_id", "INTEGER"),
+                ("direction", "REAL"),
+                ("m_measure", "TEXT"),
+            ]
+            zm = True
+
+        if tolerance is None:
+            writer.drop("Pathlines-full")
+        else:
+            writer.write_feature_chunks(
+                "Pathlines-full",
+                "Linestring",
+                self.parent.crs,
+                fields,
+                chunks(None),
+                z=zm,
+                m=zm,
             )
+        writer.write_feature_chunks(
+            "Pathlines",
+            "Linestring",
+            self.parent.crs,
+            fields,
+            chunks(tolerance),
+            z=zm,
+            m=zm,
         )
-        layer.updateFields()
-        layer.setCrs(self.parent.crs)
-        fields = layer.fields()
-
-        features = []
-        for linestring in linestrings:
-            for (vertex0, z0), (vertex1, z1) in zip(linestring[:-1], linestring[1:]):
-                geometry = QgsGeometry.fromPolylineXY((vertex0, vertex1))
-                feature = QgsFeature(fields)
-                feature.setGeometry(geometry)
-                feature.setAttribute("start_elevation", z0)
-                feature.setAttribute("end_elevation", z1)
-                features.append(feature)
-
-        with edit(layer):
-            layer.addFeatures(features)
-
-        gpkg_path = str(path.with_suffix(".output.gpkg"))
-        newfile = not Path(gpkg_path).exists()
-        written_layer = geopackage.write_layer(
-            path=gpkg_path,
-            layer=layer,
-            layername="Pathlines",
-            newfile=newfile,
-        )
-
-        self.parent.output_group.add_layer(written_layer, "vector", on_top=True)
-        return
-
-    def load_extract_result(self, path: Union[Path, str]) -> None:
+        if tolerance is not None:
+            writer.set_description(
+                "Pathlines",
+                "Simplified chunk by chunk: pathlines of different chunks of the "
+                "trace file may cross where the full resolution pathlines do not.",
+            )
+        return "Pathlines"
+
+    def load_extract_result(
+        self,
+        path: Union[Path, str],
+        output_options: OutputOptions,
+        writer: GeoPackageWriter,
+    ) -> List[str]:
+        """Write the requested extract results; return the written layers."""
+        # Skip the sections which have not been requested; if none have, the
+        # extract file is not even opened.
+        headers = requested_headers(output_options)
+        if not headers:
+            return []
         path = Path(path)
         extract_path = Path(str(path.with_suffix(".xtr")).upper())
-        vector_layers = extraction_to_layers(
+        return extraction_to_layers(
             extract_path,
             crs=self.parent.crs,
-            gpkg_path=str(path.with_suffix(".output.gpkg")),
+            writer=writer,
+            headers=headers,
         )
-        for layer in vector_layers:
-            self.parent.output_group.add_layer(layer, "vector", on_top=False)
-        return
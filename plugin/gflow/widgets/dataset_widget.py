@@ -7,9 +7,10 @@ computation.
 
 import json
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from shutil import copy
-from typing import Any, Dict, List, NamedTuple, Set, Tuple
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import (
@@ -31,15 +32,148 @@ from PyQt5.QtWidgets import (
 from qgis.core import Qgis, QgsProject, QgsUnitTypes
 
 from gflow.core.elements import Aquifer, Domain, load_elements_from_geopackage
-from gflow.core.formatting import data_to_gflow
+from gflow.core.elements.element import ElementExtraction
+from gflow.core.formatting import write_gflow_file
+from gflow.core.number_format import DEFAULT_FORMAT, NumberFormat
 from gflow.widgets.error_window import ValidationDialog
 
+LAYER_DELETED = "wrapped C/C++ object of type QgsVectorLayer has been deleted"
+# Validating and rendering holds the GIL: more threads than this only contend
+# for it. Two suffice to read one GeoPackage table while processing another.
+EXTRACTION_WORKERS = 2
+
 
 class Extraction(NamedTuple):
     gflow: Dict[str, Any] = None
     success: bool = True
 
 
+class PendingExtraction(NamedTuple):
+    """
+    An element to extract from the GeoPackage in the background.
+
+    Everything the worker needs from the QGIS objects is gathered beforehand
+    on the GUI thread.
+    """
+
+    layername: str
+    revision: int
+    fields: List[str]
+    cached: Dict[int, Any]
+
+
+class ExtractionJob:
+    """
+    Extraction of the data of a number of elements.
+
+    ``prepare`` runs on the GUI thread: it takes the extractions from the
+    render cache, and extracts the elements with uncommitted edits. ``run``
+    extracts the other elements from the GeoPackage in a small pool of worker
+    threads, and may itself run in a background task. The workers do not
+    touch any QGIS objects. Only the features which have been edited since
+    they were cached are processed again. Finally, ``finish`` stores the
+    results in the caches of the elements on the GUI thread. The results are
+    merged in the order of the elements.
+
+    The extraction does not use more than one core: the worker threads share
+    the GIL. Reading the GeoPackage with sqlite releases it, but validating
+    and rendering the rows in Python does not. The pool keeps the GUI
+    responsive, and overlaps the reading of one table with the processing of
+    another; more workers would only contend for the GIL.
+    """
+
+    def __init__(self, elements: Dict[str, Any], number_format: NumberFormat):
+        self.elements = elements
+        self.number_format = number_format
+        self.extractions = {}
+        # The elements to extract in the background.
+        self.pending: Dict[str, PendingExtraction] = {}
+        self.results = {}
+
+    def prepare(self) -> None:
+        for name, element in self.elements.items():
+            try:
+                if element.can_extract_in_background():
+                    extraction = element.cached_extraction(self.number_format)
+                    if extraction is None:
+                        missing = element.check_table_columns()
+                        if missing:
+                            extraction = ElementExtraction(errors=missing)
+                        else:
+                            self.pending[name] = PendingExtraction(
+                                layername=element.layer.name(),
+                                revision=element.revision,
+                                fields=element.fieldnames,
+                                cached=element.reusable_features(),
+                            )
+                            continue
+                else:
+                    extraction = element.extract_data(self.number_format)
+                self.extractions[name] = extraction
+            except RuntimeError as e:
+                if e.args[0] == LAYER_DELETED:
+                    # Delay of Qt garbage collection to blame?
+                    pass
+                else:
+                    raise e
+        return
+
+    def run(
+        self,
+        progress: Optional[Callable[[float], None]] = None,
+        canceled: Optional[Callable[[], bool]] = None,
+    ) -> bool:
+        """
+        Extract the pending elements. Reports the progress as a percentage of
+        the pending elements, and returns False if canceled.
+        """
+        if not self.pending:
+            return True
+        with ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS) as pool:
+            futures = {
+                pool.submit(
+                    self.elements[name].extract_from_geopackage,
+                    pending.layername,
+                    pending.fields,
+                    pending.cached,
+                ): name
+                for name, pending in self.pending.items()
+            }
+            for i, future in enumerate(as_completed(futures)):
+                if canceled is not None and canceled():
+                    for other in futures:
+                        other.cancel()
+                    return False
+                self.results[futures[future]] = future.result()
+                if progress is not None:
+                    progress(100.0 * (i + 1) / len(futures))
+        return True
+
+    def finish(self) -> None:
+        for name, (extraction, features) in self.results.items():
+            revision = self.pending[name].revision
+            self.elements[name].store_extraction(revision, extraction, features)
+        return
+
+    def merge(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Return the validation errors and the data, per element type."""
+        data = defaultdict(dict)
+        errors = {}
+        extractions = self.extractions.copy()
+        for name, (extraction, _) in self.results.items():
+            extractions[name] = extraction
+
+        for name, element in self.elements.items():
+            extraction = extractions.get(name)
+            if extraction is None:
+                continue
+            if extraction.errors:
+                errors[name] = extraction.errors
+            elif extraction.data:  # skip empty tables
+                data[element.element_type][name] = extraction
+        return errors, data
+
+
 class DatasetTreeWidget(QTreeWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -145,39 +279,30 @@ class DatasetTreeWidget(QTreeWidget):
 
         return
 
-    def extract_data(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-        """
-        Extract the data of the Geopackage.
-
-        Validates all data while converting, and returns a list of validation
-        errors if something is amiss.
-        """
-        data = defaultdict(dict)
-        errors = {}
+    def extraction_job(self, number_format: NumberFormat) -> "ExtractionJob":
+        """Prepare the extraction of the checked elements."""
         elements = {
             item.text(1): item.element
             for item in self.items()
             if item.gflow_checkbox.isChecked()
         }
+        job = ExtractionJob(elements, number_format)
+        job.prepare()
+        return job
 
-        for name, element in elements.items():
-            try:
-                extraction = element.extract_data()
-                if extraction.errors:
-                    errors[name] = extraction.errors
-                elif extraction.data:  # skip empty tables
-                    data[element.element_type][name] = extraction
-            except RuntimeError as e:
-                if (
-                    e.args[0]
-                    == "wrapped C/C++ object of type QgsVectorLayer has been deleted"
-                ):
-                    # Delay of Qt garbage collection to blame?
-                    pass
-                else:
-                    raise e
+    def extract_data(
+        self, number_format: NumberFormat = DEFAULT_FORMAT
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Extract the data of the Geopackage.
 
-        return errors, data
+        Validates all data while converting, and returns a list of validation
+        errors if something is amiss.
+        """
+        job = self.extraction_job(number_format)
+        job.run()
+        job.finish()
+        return job.merge()
 
 
 class DatasetWidget(QWidget):
@@ -454,12 +579,31 @@ class DatasetWidget(QWidget):
         self.parent.set_interpreter_interaction(value)
         return
 
-    def _extract_data(self) -> Extraction:
+    @property
+    def number_format(self) -> NumberFormat:
+        output_options = self.parent.compute_widget.output_options
+        return NumberFormat(decimals=output_options.decimals)
+
+    def close_validation_dialog(self) -> None:
         if self.validation_dialog:
             self.validation_dialog.close()
             self.validation_dialog = None
 
-        errors, gflow_data = self.dataset_tree.extract_data()
+    def show_validation_errors(self, errors: Dict[str, Any]) -> None:
+        self.close_validation_dialog()
+        self.validation_dialog = ValidationDialog(errors)
+
+    def extraction_job(self) -> ExtractionJob:
+        """
+        Prepare the extraction of the checked elements, to be completed by
+        e.g. a background task.
+        """
+        self.close_validation_dialog()
+        return self.dataset_tree.extraction_job(self.number_format)
+
+    def _extract_data(self) -> Extraction:
+        self.close_validation_dialog()
+        errors, gflow_data = self.dataset_tree.extract_data(self.number_format)
         if errors:
             self.validation_dialog = ValidationDialog(errors)
             return Extraction(success=False)
@@ -469,17 +613,15 @@ class DatasetWidget(QWidget):
     def convert_to_gflow(self, path: str) -> bool:
         extraction = self._extract_data()
         if not extraction.success:
-            return
+            return True
 
-        dat_content = data_to_gflow(
+        write_gflow_file(
+            path,
             extraction.gflow,
             name=str(Path(self.path).stem),
             output_options=self.parent.compute_widget.output_options,
         )
 
-        with open(path, "w") as f:
-            f.write(dat_content)
-
         self.parent.message_bar.pushMessage(
             title="Info",
             text=f"Converted geopackage to GFLOW .dat file: {path}",
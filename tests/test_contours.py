@@ -0,0 +1,139 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+from gflow.core.contours import (
+    combine_levels,
+    contour_level,
+    contour_levels,
+    contour_lines,
+)
+
+
+def reference_segments(values, level):
+    """Contour one cell at a time."""
+    nrow, ncol = values.shape
+    segments = []
+    for i in range(nrow - 1):
+        for j in range(ncol - 1):
+            corners = [(i, j), (i, j + 1), (i + 1, j + 1), (i + 1, j)]
+            z = [values[corner] for corner in corners]
+            if np.isnan(z).any():
+                continue
+            above = [value >= level for value in z]
+            crossings = {}
+            for k in range(4):
+                if above[k] != above[(k + 1) % 4]:
+                    low, high = sorted((corners[k], corners[(k + 1) % 4]))
+                    t = (level - values[low]) / (values[high] - values[low])
+                    crossings[k] = (
+                        low[0] + t * (high[0] != low[0]),
+                        low[1] + t * (high[1] != low[1]),
+                    )
+            if len(crossings) == 2:
+                segments.append(tuple(crossings.values()))
+            elif len(crossings) == 4:
+                # Saddle: cut off the corners on the other side of the mean.
+                center = np.mean(z) >= level
+                for k in range(4):
+                    if above[k] != center:
+                        segments.append((crossings[(k - 1) % 4], crossings[k]))
+    return segments
+
+
+def key(point):
+    return (round(point[0], 9), round(point[1], 9))
+
+
+def edge(p, q):
+    p = key(p)
+    q = key(q)
+    return frozenset((p, q)) if p != q else (p,)
+
+
+def field(rng, nrow, ncol):
+    y, x = np.mgrid[0:nrow, 0:ncol]
+    return np.sin(x / 5.0) * np.cos(y / 7.0) + 0.3 * rng.normal(size=(nrow, ncol))
+
+
+@pytest.mark.parametrize("trial", range(12))
+def test_contour_lines_equal_reference(trial):
+    rng = np.random.default_rng(trial)
+    nrow, ncol = rng.integers(2, 30, 2)
+    values = field(rng, nrow, ncol)
+    if trial % 3 == 0:
+        values[rng.random(values.shape) < 0.05] = np.nan
+    if trial % 4 == 0:
+        # Levels which coincide with grid values.
+        values = np.round(values, 1)
+
+    for level in (-0.5, 0.0, 0.2, 0.7):
+        rowcol, offsets = contour_lines(values, level)
+        assert offsets[0] == 0
+        assert offsets[-1] == len(rowcol)
+        actual = Counter()
+        ends = Counter()
+        for start, end in zip(offsets[:-1], offsets[1:], strict=True):
+            assert end - start >= 2
+            line = rowcol[start:end]
+            for p, q in zip(line[:-1], line[1:], strict=True):
+                actual[edge(p, q)] += 1
+            if key(line[0]) != key(line[-1]):
+                ends[key(line[0])] += 1
+                ends[key(line[-1])] += 1
+        expected = Counter(edge(p, q) for p, q in reference_segments(values, level))
+        assert actual == expected
+        # Lines are joined as far as possible: open lines share no end points,
+        # unless they pass through the same grid node.
+        if trial % 4 != 0:
+            assert all(count == 1 for count in ends.values())
+
+
+def test_closed_line():
+    values = np.zeros((4, 4))
+    values[1:3, 1:3] = 1.0
+    rowcol, offsets = contour_lines(values, 0.5)
+    assert offsets.tolist() == [0, 9]
+    assert (rowcol[0] == rowcol[-1]).all()
+    # All vertices lie halfway the edges between the inner and outer nodes.
+    assert np.isin(rowcol, [0.5, 1.0, 2.0, 2.5]).all()
+
+
+def test_no_contours():
+    values = np.ones((3, 3))
+    rowcol, offsets = contour_lines(values, 5.0)
+    assert rowcol.shape == (0, 2)
+    assert offsets.tolist() == [0]
+    rowcol, offsets = contour_lines(np.ones((1, 3)), 0.5)
+    assert rowcol.shape == (0, 2)
+
+
+def test_contour_level_coordinates():
+    values = np.array([[0.0, 1.0], [0.0, 1.0]])
+    x = np.array([10.0, 20.0])
+    y = np.array([5.0, 3.0])
+    xy, offsets = contour_level(values, x, y, 0.25)
+    assert offsets.tolist() == [0, 2]
+    assert sorted(xy.tolist()) == [[12.5, 3.0], [12.5, 5.0]]
+
+
+def test_contour_levels():
+    levels, major = contour_levels(0.0, 1.0, 0.1)
+    assert len(levels) == 11
+    assert levels[-1] == pytest.approx(1.0)
+    assert np.flatnonzero(major).tolist() == [0, 5, 10]
+    levels, major = contour_levels(1.0, 0.0, 0.1)
+    assert len(levels) == 0
+
+
+def test_combine_levels():
+    lines = [
+        (np.zeros((3, 2)), np.array([0, 3])),
+        (np.empty((0, 2)), np.array([0])),
+        (np.ones((5, 2)), np.array([0, 2, 5])),
+    ]
+    columns, xy, offsets = combine_levels([1.0, 2.0, 3.0], [True, False, False], lines)
+    assert columns["head"].tolist() == [1.0, 3.0, 3.0]
+    assert columns["major"].tolist() == [1, 0, 0]
+    assert offsets.tolist() == [0, 3, 5, 8]
+    assert xy.shape == (8, 2)
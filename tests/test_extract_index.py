@@ -0,0 +1,75 @@
+from gflow.core.extract.index import ExtractIndex, Section, index_sections
+
+HEADERS = ("! head specified wells", "! slurry walls")
+
+CONTENT = b"""! version 1
+! head specified wells
+1.0 2.0 3.0
+4.0 5.0 6.0
+! other
+7.0
+! slurry walls
+* wall 1
+1.0 1.0
+2.0 2.0
+* wall 2
+3.0 3.0
+! head specified wells
+8.0 9.0 10.0"""
+
+
+def sections_lines(buffer, sections):
+    return [ExtractIndex.lines(buffer, section) for section in sections]
+
+
+def test_index_sections():
+    sections = index_sections(CONTENT, HEADERS)
+    assert [section.header for section in sections] == [
+        "! head specified wells",
+        "! slurry walls",
+        "! head specified wells",
+    ]
+    assert [section.nrow for section in sections] == [2, 3, 1]
+    assert sections_lines(CONTENT, sections) == [
+        ["1.0 2.0 3.0", "4.0 5.0 6.0"],
+        ["* wall 1", "1.0 1.0", "2.0 2.0", "* wall 2", "3.0 3.0"],
+        ["8.0 9.0 10.0"],
+    ]
+
+
+def test_index_sections_first_line_and_trailing_newline():
+    content = b"! slurry walls\n1.0 1.0\n"
+    sections = index_sections(content, HEADERS)
+    assert sections == [Section("! slurry walls", 15, len(content), 1)]
+    assert sections_lines(content, sections) == [["1.0 1.0"]]
+
+
+def test_index_sections_empty():
+    assert index_sections(b"", HEADERS) == []
+    content = b"! slurry walls"
+    sections = index_sections(content, HEADERS)
+    assert [section.nrow for section in sections] == [0]
+    assert sections_lines(content, sections) == [[]]
+
+
+def test_extract_index_sidecar(tmp_path):
+    path = tmp_path / "model.xtr"
+    path.write_bytes(CONTENT)
+    index = ExtractIndex.open(path, HEADERS)
+    assert ExtractIndex.sidecar_path(path).exists()
+    assert ExtractIndex.open(path, HEADERS).sections == index.sections
+    assert len(index.select(["! slurry walls"])) == 1
+    assert len(index.select()) == 3
+
+    # A different set of headers invalidates the sidecar.
+    other = ExtractIndex.open(path, ["! other"])
+    assert [section.header for section in other.sections] == ["! other"]
+
+
+def test_iter_lines_chunks():
+    sections = index_sections(CONTENT, HEADERS)
+    for chunk_size in (1, 3, 7, len(CONTENT)):
+        assert [
+            list(ExtractIndex.iter_lines(CONTENT, section, chunk_size))
+            for section in sections
+        ] == sections_lines(CONTENT, sections)
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from gflow.core.number_format import DEFAULT_FORMAT, NumberFormat, format_rows
+
+
+def row_by_row(template, columns):
+    """Format one row at a time."""
+    rows = zip(*(column.tolist() for column in columns), strict=True)
+    return [template.format(*row) for row in rows]
+
+
+def random_floats(rng, n):
+    values = rng.normal(scale=1.0e4, size=n)
+    values[::5] = np.round(values[::5])
+    values[1::7] = rng.normal(scale=1.0e-12, size=len(values[1::7]))
+    values[2::11] = 0.0
+    return values
+
+
+@pytest.mark.parametrize("template", ["{} {}", "{:.3f} {:.3f}", "x {} {{y}} {:.1f}"])
+def test_format_rows_floats(template):
+    rng = np.random.default_rng(0)
+    columns = (random_floats(rng, 100), random_floats(rng, 100))
+    lines = format_rows(template, columns)
+    assert lines == row_by_row(template, columns)
+    # The .dat file is written as the joined lines.
+    joined = "\n".join(lines).encode("ascii")
+    assert joined == "\n".join(row_by_row(template, columns)).encode("ascii")
+
+
+def test_format_rows_mixed():
+    columns = (
+        np.array(["well 1", "well 2"], dtype=object),
+        np.array([1, 2]),
+        np.array([0.1, 1.0e-20]),
+    )
+    template = "{} {} {}"
+    assert format_rows(template, columns) == ["well 1 1 0.1", "well 2 2 1e-20"]
+    assert format_rows(template, columns) == row_by_row(template, columns)
+
+
+def test_format_rows_empty():
+    assert format_rows("{}", ()) == []
+    assert format_rows("{}", (np.empty(0),)) == []
+
+
+def test_shortest_round_trip():
+    rng = np.random.default_rng(1)
+    values = random_floats(rng, 1000)
+    lines = format_rows(DEFAULT_FORMAT.value, (values,))
+    assert np.array_equal(np.array(lines, dtype=float), values)
+    assert lines == [repr(value) for value in values.tolist()]
+
+
+def test_row_template():
+    positional, fields = NumberFormat(3).row_template("{x} {y} {discharge}")
+    assert positional == "{:.3f} {:.3f} {}"
+    assert fields == ["x", "y", "discharge"]
+    positional, fields = DEFAULT_FORMAT.row_template("{{ {x} }}")
+    assert positional == "{{ {} }}"
+    assert fields == ["x"]
+    with pytest.raises(ValueError, match="Unsupported replacement field"):
+        DEFAULT_FORMAT.row_template("{x:.2f}")
+
+
+def test_format_xy():
+    xy = np.array([[1.0, 2.5], [1.0e5, -0.0004]])
+    assert DEFAULT_FORMAT.format_xy(xy) == ["1.0 2.5", "100000.0 -0.0004"]
+    assert NumberFormat(3).format_xy(xy) == ["1.000 2.500", "100000.000 -0.000"]
+
+
+def test_round_coordinate():
+    assert DEFAULT_FORMAT.round_coordinate(1.23456) == 1.23456
+    assert NumberFormat(2).round_coordinate(1.23456) == 1.23
+
+
+def test_format_rows_multiline():
+    columns = (np.array([1.0, 2.5]), np.array([3, 4]))
+    template = "head\nresistance {}\nwidth {} 0"
+    rows = format_rows(template, columns)
+    assert rows == [
+        "head\nresistance 1.0\nwidth 3 0",
+        "head\nresistance 2.5\nwidth 4 0",
+    ]
+    assert rows == row_by_row(template, columns)
@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+from gflow.core.pathlines import (
+    particle_directions,
+    pathline_features,
+    pathline_segments,
+    read_pathlines,
+)
+
+
+def vertex_line(x, y, z):
+    return f"  1 {x:14.4f} {y:14.4f} {z:12.4f} {0.0:10.2f}\n"
+
+
+def write_trace(path, pathlines):
+    """Write a trace file; None is a line outside of a pathline."""
+    lines = []
+    for vertices in pathlines:
+        if vertices is None:
+            lines.append(vertex_line(9.0, 9.0, 9.0))
+            continue
+        lines.append("START\n")
+        lines.extend(vertex_line(*xyz) for xyz in vertices)
+        lines.append("END\n")
+    path.write_text("".join(lines))
+    return len(lines)
+
+
+def reference(path):
+    """Parse the trace file line by line: number, vertices per pathline."""
+    pathlines = []
+    number = 0
+    vertices = None
+    for line in path.read_text().splitlines():
+        if line.startswith("START"):
+            number += 1
+            vertices = []
+        elif line.startswith("END"):
+            if vertices is not None:
+                pathlines.append((number, vertices))
+            vertices = None
+        elif vertices is not None:
+            vertices.append(tuple(float(v) for v in line[4:47].split()))
+    return pathlines
+
+
+def read_all(path, chunksize):
+    pathlines = []
+    for xyz, offsets, numbers in read_pathlines(str(path), chunksize):
+        for number, start, end in zip(numbers, offsets[:-1], offsets[1:], strict=True):
+            pathlines.append((int(number), [tuple(v) for v in xyz[start:end]]))
+    return pathlines
+
+
+@pytest.fixture
+def trace(tmp_path):
+    rng = np.random.default_rng(0)
+    pathlines = []
+    for i in range(40):
+        if i % 7 == 3:
+            pathlines.append([])  # A pathline without vertices.
+        elif i % 11 == 5:
+            pathlines.append(None)
+        else:
+            n = int(rng.integers(1, 6))
+            pathlines.append(np.round(rng.random((n, 3)) * 100.0, 4).tolist())
+    path = tmp_path / "model.PTH"
+    nline = write_trace(path, pathlines)
+    return path, nline
+
+
+def test_read_pathlines(trace):
+    path, nline = trace
+    expected = reference(path)
+    assert any(len(vertices) == 0 for _, vertices in expected)
+    # Every chunk size puts the chunk boundaries elsewhere: before and after
+    # START and END lines, and inside empty pathlines.
+    for chunksize in [1, 2, 3, 5, 8, 13, nline]:
+        assert read_all(path, chunksize) == expected
+
+
+def test_read_pathlines_particle_count(trace):
+    path, _ = trace
+    npathline = len(path.read_text().split("START")) - 1
+    for chunksize in [3, 1000]:
+        pathlines = read_pathlines(str(path), chunksize, nparticle=npathline)
+        assert sum(len(numbers) for _, _, numbers in pathlines) > 0
+        for nparticle in [npathline - 1, npathline + 1]:
+            with pytest.raises(ValueError, match="particles of the input file"):
+                list(read_pathlines(str(path), chunksize, nparticle=nparticle))
+
+
+def test_unterminated_pathline(tmp_path):
+    path = tmp_path / "model.PTH"
+    path.write_text(
+        "START\nEND\n"
+        + "START\n"
+        + vertex_line(1.0, 2.0, 3.0)
+        + "END\nEND\n"
+        + "START\n"
+        + vertex_line(4.0, 5.0, 6.0)
+    )
+    for chunksize in [1, 2, 3, 100]:
+        assert read_all(path, chunksize) == [(1, []), (2, [(1.0, 2.0, 3.0)])]
+
+
+def test_pathline_features():
+    xyz = np.array([[0.0, 0.0, 1.0], [1.0, 0.0, 2.0], [2.0, 0.0, 3.0], [5.0, 5.0, 5.0]])
+    # Pathline 2 has no vertices, pathline 4 a single vertex.
+    offsets = np.array([0, 3, 3, 4])
+    numbers = np.array([1, 2, 4])
+    directions = np.array([1.0, -1.0, 1.0, -1.0])
+    columns, xyzm, feature_offsets = pathline_features(
+        xyz, offsets, numbers, directions
+    )
+    assert columns["particle_id"].tolist() == [1, 2, 4]
+    assert columns["direction"].tolist() == [1.0, -1.0, -1.0]
+    assert columns["m_measure"].tolist() == ["step"] * 3
+    assert feature_offsets.tolist() == [0, 3, 3, 3]
+    assert np.array_equal(xyzm[:, :3], xyz[:3])
+    assert xyzm[:, 3].tolist() == [0.0, 1.0, 2.0]
+
+    # Pathline 4 has no particle.
+    with pytest.raises(ValueError, match="without a particle"):
+        pathline_features(xyz, offsets, numbers, directions[:3])
+
+
+def test_pathline_segments():
+    xyz = np.array([[0.0, 0.0, 1.0], [1.0, 0.0, 2.0], [2.0, 0.0, 3.0], [5.0, 5.0, 5.0]])
+    columns, xy, offsets = pathline_segments(xyz, np.array([0, 3, 3, 4]))
+    assert xy.tolist() == [[0.0, 0.0], [1.0, 0.0], [1.0, 0.0], [2.0, 0.0]]
+    assert columns["start_elevation"].tolist() == [1.0, 2.0]
+    assert columns["end_elevation"].tolist() == [2.0, 3.0]
+    assert offsets.tolist() == [0, 2, 4]
+
+
+def test_particle_directions(tmp_path):
+    path = tmp_path / "model.dat"
+    path.write_text(
+        "aquifer\nquit\ntrace\npoints\n0.0 0.0 10.0 1\n5.0 5.0 10.0 -1\nquit\n"
+    )
+    assert particle_directions(path).tolist() == [1.0, -1.0]
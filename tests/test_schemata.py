@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from gflow.core.elements.schemata import RowWiseSchema, SingleRowSchema
+from gflow.core.schemata import (
+    Membership,
+    Optional,
+    Positive,
+    Required,
+    StrictlyPositive,
+    compile_schemata,
+)
+from gflow.core.table import ColumnarTable
+
+SCHEMATA = {
+    "conductivity": Required(StrictlyPositive()),
+    "resistance": Optional(Positive()),
+    "order": Required(),
+    "label": Optional(),
+    "kind": Optional(Membership(["a", "b"])),
+}
+
+
+def random_columns(rng, nrow):
+    columns = {
+        "conductivity": rng.normal(size=nrow),
+        "resistance": rng.normal(size=nrow),
+        "order": rng.normal(size=nrow),
+        "label": np.array(["x"] * nrow, dtype=object),
+        "kind": rng.choice(np.array(["a", "b", "c"], dtype=object), size=nrow),
+    }
+    columns["conductivity"][::7] = 0.0
+    null = {name: rng.random(nrow) < 0.2 for name in columns}
+    return columns, null
+
+
+def row_wise(schema, values, null):
+    """Validate one value at a time."""
+    errors = {}
+    for i, (value, isnull) in enumerate(
+        zip(values.tolist(), null.tolist(), strict=True)
+    ):
+        _errors = schema.validate(None if isnull else value)
+        if _errors:
+            errors[i] = _errors
+    return errors
+
+
+def test_compile_schemata():
+    plan = compile_schemata(SCHEMATA)
+    # The label has no checks, and is dropped.
+    assert [check.variable for check in plan] == [
+        "conductivity",
+        "resistance",
+        "order",
+        "kind",
+    ]
+    assert [check.required for check in plan] == [True, False, True, False]
+    assert [len(check.checks) for check in plan] == [1, 1, 0, 1]
+
+
+def test_compile_schemata_flattens_and_deduplicates():
+    schema = Required(Positive(), Optional(Positive(), StrictlyPositive()))
+    (check,) = compile_schemata({"x": schema})
+    assert check.required
+    assert [type(inner) for inner in check.checks] == [Positive, StrictlyPositive]
+    values = np.array([1.0, 0.0, -1.0, np.nan])
+    null = np.isnan(values)
+    errors = check.validate(values, null)
+    assert errors == {
+        1: ["Number is not strictly positive (>0): 0.0"],
+        2: [
+            "Number is not positive (>=0): -1.0",
+            "Number is not strictly positive (>0): -1.0",
+        ],
+        3: ["a value is required."],
+    }
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_plan_equals_row_wise(seed):
+    rng = np.random.default_rng(seed)
+    columns, null = random_columns(rng, 50)
+    plan = compile_schemata(SCHEMATA)
+    for check in plan:
+        schema = SCHEMATA[check.variable]
+        values = columns[check.variable]
+        expected = row_wise(schema, values, null[check.variable])
+        assert check.validate(values, null[check.variable]) == expected
+        assert schema.validate_column(values, null[check.variable]) == expected
+
+
+def test_validate_table():
+    class Schema(RowWiseSchema):
+        schemata = SCHEMATA
+
+    class SingleSchema(SingleRowSchema):
+        schemata = SCHEMATA
+
+    rng = np.random.default_rng(0)
+    columns, null = random_columns(rng, 50)
+    for name, column in columns.items():
+        if column.dtype.kind == "f":
+            column[null[name]] = np.nan
+        else:
+            column[null[name]] = None
+    table = ColumnarTable(np.arange(50), columns, null)
+    assert Schema.validate("wells", table) == Schema.validate("wells", table.records())
+    assert Schema.validate_table("wells", 50) == {}
+    assert SingleSchema.validate_table("domain", 1) == {}
+    assert SingleSchema.validate_table("domain", 2) == {
+        "domain": ["Table must contain a single row. Table contains 2 rows."]
+    }
@@ -0,0 +1,43 @@
+import numpy as np
+from gflow.core.segments import midpoint_fractions, segmented_cumsum
+
+
+def old_fractions(xy):
+    """The midpoint fractions of a single line as computed before."""
+    distance = np.linalg.norm(np.diff(xy, axis=1), axis=1)
+    accumulated = distance.cumsum()
+    midpoint = accumulated - 0.5 * distance
+    return (midpoint / accumulated[-1])[:-1]
+
+
+def test_segmented_cumsum():
+    rng = np.random.default_rng(0)
+    sizes = rng.integers(0, 40, 50)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    values = rng.random(offsets[-1])
+    accumulated = segmented_cumsum(values, offsets)
+    for start, end in zip(offsets[:-1], offsets[1:], strict=True):
+        assert np.array_equal(accumulated[start:end], np.cumsum(values[start:end]))
+
+
+def test_midpoint_fractions():
+    # An L-shaped line: a segment of length 3, then a segment of length 1.
+    xy = np.array([[0.0, 0.0], [3.0, 0.0], [3.0, 1.0]])
+    dx, dy = np.diff(xy, axis=0).T
+    fraction = midpoint_fractions(dx, dy, np.array([0, 2]))
+    assert fraction.tolist() == [0.375, 0.875]
+    # The differences were taken between the x and y of every vertex.
+    assert old_fractions(xy).tolist() == [0.0, 0.3]
+
+
+def test_midpoint_fractions_lines():
+    rng = np.random.default_rng(1)
+    sizes = rng.integers(0, 10, 20)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    dx = rng.normal(size=offsets[-1])
+    dy = rng.normal(size=offsets[-1])
+    fraction = midpoint_fractions(dx, dy, offsets)
+    for start, end in zip(offsets[:-1], offsets[1:], strict=True):
+        distance = np.hypot(dx[start:end], dy[start:end])
+        expected = (np.cumsum(distance) - 0.5 * distance) / distance.sum()
+        assert np.allclose(fraction[start:end], expected)
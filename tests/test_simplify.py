@@ -0,0 +1,148 @@
+import numpy as np
+from gflow.core.contours import combine_levels, contour_level
+from gflow.core.simplify import douglas_peucker, simplify_lines
+
+
+def point_segment_distance(p, a, b):
+    ab = b - a
+    length2 = ab @ ab
+    t = 0.0 if length2 == 0.0 else np.clip((p - a) @ ab / length2, 0.0, 1.0)
+    return np.hypot(*(p - a - t * ab))
+
+
+def reference(xy, tolerance, keep, i, j):
+    """Recursive Douglas-Peucker of a single interval."""
+    keep[i] = keep[j] = True
+    if j - i < 2:
+        return
+    distance = [point_segment_distance(xy[k], xy[i], xy[j]) for k in range(i + 1, j)]
+    k = i + 1 + int(np.argmax(distance))
+    if distance[k - i - 1] > tolerance:
+        reference(xy, tolerance, keep, i, k)
+        reference(xy, tolerance, keep, k, j)
+
+
+def offsets(*counts):
+    return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def segments(xy, offsets):
+    return [
+        (xy[i], xy[i + 1])
+        for start, end in zip(offsets[:-1], offsets[1:], strict=True)
+        for i in range(start, end - 1)
+    ]
+
+
+def cross(p1, p2, q1, q2):
+    """Whether two segments intersect, other than in a shared end point."""
+
+    def orientation(a, b, c):
+        return np.sign((b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0]))
+
+    if any((p == q).all() for p in (p1, p2) for q in (q1, q2)):
+        return False
+    o1 = orientation(p1, p2, q1)
+    o2 = orientation(p1, p2, q2)
+    o3 = orientation(q1, q2, p1)
+    o4 = orientation(q1, q2, p2)
+    return o1 * o2 <= 0 and o3 * o4 <= 0 and not (o1 == o2 == 0)
+
+
+def line_crossings(xy, offsets):
+    """Count the crossings between different lines."""
+    count = 0
+    for i in range(len(offsets) - 1):
+        for j in range(i + 1, len(offsets) - 1):
+            a = segments(xy, offsets[[i, i + 1]])
+            b = segments(xy, offsets[[j, j + 1]])
+            count += sum(cross(*s, *t) for s in a for t in b)
+    return count
+
+
+def test_douglas_peucker_single_line():
+    rng = np.random.default_rng(0)
+    xy = np.cumsum(rng.normal(size=(200, 2)), axis=0)
+    keep = douglas_peucker(xy, offsets(200), 3.0)
+    # A random walk crosses itself: compare where the reference does not.
+    expected = np.zeros(200, dtype=bool)
+    reference(xy, 3.0, expected, 0, 199)
+    assert keep[expected].all()
+    removed = np.flatnonzero(~keep)
+    kept = np.flatnonzero(keep)
+    for k in removed:
+        i = kept[kept < k].max()
+        j = kept[kept > k].min()
+        assert point_segment_distance(xy[k], xy[i], xy[j]) <= 3.0
+
+
+def test_douglas_peucker_equals_reference():
+    # Smooth lines far apart do not interact.
+    t = np.linspace(0.0, 2.0 * np.pi, 100)
+    lines = [np.column_stack([t * 10.0, np.sin(t) * 5.0 + 100.0 * k]) for k in range(3)]
+    xy = np.concatenate(lines)
+    keep = douglas_peucker(xy, offsets(100, 100, 100), 0.1)
+    expected = np.zeros(len(xy), dtype=bool)
+    for k in range(3):
+        reference(xy, 0.1, expected, 100 * k, 100 * k + 99)
+    assert np.array_equal(keep, expected)
+
+
+def test_short_and_closed_lines():
+    t = np.linspace(0.0, 2.0 * np.pi, 41)
+    circle = np.column_stack([np.cos(t), np.sin(t)])
+    circle[-1] = circle[0]
+    xy = np.concatenate([[[0.0, 0.0]], [[5.0, 5.0], [6.0, 6.0]], circle])
+    result, result_offsets = simplify_lines(xy, offsets(1, 2, 41), 10.0)
+    counts = np.diff(result_offsets)
+    assert counts.tolist() == [1, 2, 4]
+    closed = result[result_offsets[2] : result_offsets[3]]
+    assert (closed[0] == closed[-1]).all()
+
+
+def test_keeps_z_and_m():
+    xyzm = np.array([[0.0, 0.0, 1.0, 0.0], [1.0, 0.01, 2.0, 1.0], [2.0, 0.0, 3.0, 2.0]])
+    result, result_offsets = simplify_lines(xyzm, offsets(3), 0.1)
+    assert result.tolist() == [[0.0, 0.0, 1.0, 0.0], [2.0, 0.0, 3.0, 2.0]]
+    assert result_offsets.tolist() == [0, 2]
+
+
+def test_preserves_topology():
+    # Simplifying the first line on its own replaces the peak by a chord,
+    # which would cross the second line.
+    first = np.array([[0.0, 0.0], [1.0, 0.0], [2.0, 3.0], [3.0, 0.0], [4.0, 0.0]])
+    second = np.array([[2.0, 1.0], [2.0, -1.0]])
+    xy = np.concatenate([first, second])
+    alone, alone_offsets = simplify_lines(first, offsets(5), 5.0)
+    assert len(alone) == 2
+    assert line_crossings(np.concatenate([alone, second]), offsets(2, 2)) == 1
+
+    result, result_offsets = simplify_lines(xy, offsets(5, 2), 5.0)
+    assert [2.0, 3.0] in result.tolist()
+    assert line_crossings(result, result_offsets) == 0
+
+
+def test_keeps_existing_crossings():
+    first = np.column_stack([np.linspace(0.0, 10.0, 11), np.zeros(11)])
+    second = np.column_stack([np.full(11, 5.5), np.linspace(-5.25, 4.75, 11)])
+    xy = np.concatenate([first, second])
+    result, result_offsets = simplify_lines(xy, offsets(11, 11), 1.0)
+    assert line_crossings(result, result_offsets) == 1
+    # Once the crossing segment is kept, the shortcut after it only touches
+    # it in a shared end point: the rest of the line is simplified.
+    assert result_offsets[1] < 11
+
+
+def test_contours_do_not_cross():
+    rng = np.random.default_rng(1)
+    nrow, ncol = 30, 40
+    values = rng.normal(size=(nrow, ncol)).cumsum(axis=0).cumsum(axis=1)
+    x = np.arange(ncol, dtype=float)
+    y = np.arange(nrow, dtype=float)[::-1]
+    levels = np.linspace(values.min(), values.max(), 12)[1:-1]
+    lines = [contour_level(values, x, y, level) for level in levels]
+    _, xy, xy_offsets = combine_levels(levels, [False] * len(levels), lines)
+    assert line_crossings(xy, xy_offsets) == 0
+    result, result_offsets = simplify_lines(xy, xy_offsets, 2.0)
+    assert len(result) < len(xy)
+    assert line_crossings(result, result_offsets) == 0
@@ -0,0 +1,128 @@
+import struct
+
+import numpy as np
+import pytest
+from gflow.core.wkb import (
+    GeometryBlock,
+    gpkg_envelope,
+    gpkg_to_wkb,
+    to_gpkg_blobs,
+    wkb_to_gpkg,
+)
+
+
+def decode(blobs):
+    return GeometryBlock.from_wkb([gpkg_to_wkb(blob) for blob in blobs])
+
+
+def wkb_code(blob):
+    wkb = gpkg_to_wkb(blob)
+    (code,) = struct.unpack_from("<I", wkb, 1)
+    return code
+
+
+def offsets(*counts):
+    return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def test_points():
+    xy = np.array([[0.0, 1.0], [2.0, 3.0], [-4.5, 5.5]])
+    blobs, envelopes = to_gpkg_blobs("Point", xy, offsets(1, 1, 1), srs_id=28992)
+    assert [wkb_code(blob) for blob in blobs] == [1, 1, 1]
+    block = decode(blobs)
+    assert np.array_equal(block.xy, xy)
+    assert np.array_equal(block.feature_offsets, [0, 1, 2, 3])
+    assert np.array_equal(envelopes[:, [0, 2]], xy)
+
+
+@pytest.mark.parametrize("counts", [(3, 3, 3), (2, 4, 3)])
+def test_linestrings(counts):
+    # Equal counts take the single array path, others the generic path.
+    rng = np.random.default_rng(0)
+    xy = rng.random((sum(counts), 2))
+    blobs, _ = to_gpkg_blobs("Linestring", xy, offsets(*counts), srs_id=0)
+    assert [wkb_code(blob) for blob in blobs] == [2] * len(counts)
+    block = decode(blobs)
+    assert np.array_equal(block.xy, xy)
+    assert np.array_equal(block.feature_offsets, offsets(*counts))
+
+
+def test_polygon_is_closed():
+    xy = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0]])
+    blobs, _ = to_gpkg_blobs("Polygon", xy, offsets(3), srs_id=0)
+    assert wkb_code(blobs[0]) == 3
+    block = decode(blobs)
+    assert np.array_equal(block.xy, np.vstack([xy, xy[:1]]))
+
+
+def test_null_features():
+    xy = np.array([[0.0, 0.0], [1.0, 1.0]])
+    blobs, envelopes = to_gpkg_blobs("Linestring", xy, offsets(0, 2, 0), srs_id=0)
+    assert blobs[0] is None
+    assert blobs[2] is None
+    assert np.isnan(envelopes[[0, 2]]).all()
+    block = decode(blobs)
+    assert block.null.tolist() == [True, False, True]
+    assert np.array_equal(block.coordinates(1), xy)
+
+
+@pytest.mark.parametrize(
+    ("geometry_type", "ndim", "code"),
+    [
+        ("Point", 3, 1001),
+        ("Point", 4, 3001),
+        ("Linestring", 3, 1002),
+        ("Linestring", 4, 3002),
+        ("Polygon", 3, 1003),
+        ("Polygon", 4, 3003),
+    ],
+)
+def test_z_and_m(geometry_type, ndim, code):
+    xyzm = np.array(
+        [[0.0, 0.0, 1.0, 10.0], [2.0, 0.0, 2.0, 11.0], [2.0, 2.0, 3.0, 12.0]]
+    )[:, :ndim]
+    blobs, _ = to_gpkg_blobs(geometry_type, xyzm, offsets(3), srs_id=0)
+    assert wkb_code(blobs[0]) == code
+
+    block = decode(blobs)
+    if geometry_type == "Point":
+        expected = xyzm[:1]
+    elif geometry_type == "Polygon":
+        expected = np.vstack([xyzm, xyzm[:1]])
+    else:
+        expected = xyzm
+    assert np.array_equal(block.xy, expected[:, :2])
+    # The z and m values follow the header of the geometry.
+    wkb = gpkg_to_wkb(blobs[0])
+    if geometry_type == "Point":
+        values = np.frombuffer(wkb, "<f8", offset=5)
+    elif geometry_type == "Polygon":
+        values = np.frombuffer(wkb, "<f8", offset=13)
+    else:
+        values = np.frombuffer(wkb, "<f8", offset=9)
+    assert np.array_equal(values.reshape(-1, ndim), expected)
+
+
+def test_decode_multipart_and_ewkb():
+    line = struct.pack("<BII4d", 1, 2, 2, 0.0, 0.0, 1.0, 1.0)
+    multi = struct.pack("<BII", 1, 5, 2) + line + line
+    # Extended WKB: a point with the Z flag.
+    ewkb_point = struct.pack("<BI3d", 1, 0x80000001, 3.0, 4.0, 5.0)
+    block = GeometryBlock.from_wkb([multi, ewkb_point, None])
+    assert np.array_equal(block.feature_offsets, [0, 4, 5, 5])
+    assert np.array_equal(block.coordinates(1), [[3.0, 4.0]])
+    assert block.null.tolist() == [False, False, True]
+
+
+def test_envelope():
+    xy = np.array([[0.0, 5.0], [3.0, -1.0], [1.0, 2.0]])
+    blobs, envelopes = to_gpkg_blobs("Linestring", xy, offsets(3), srs_id=0)
+    expected = (0.0, 3.0, -1.0, 5.0)
+    assert tuple(envelopes[0]) == expected
+    assert gpkg_envelope(blobs[0]) == expected
+    # Without an envelope in the header, it is computed from the WKB.
+    wkb = gpkg_to_wkb(blobs[0])
+    bare = struct.pack("<2sBBi", b"GP", 0, 1, 0) + wkb
+    assert gpkg_envelope(bare) == expected
+    assert gpkg_to_wkb(wkb_to_gpkg(wkb, 0, expected)) == wkb
+    assert gpkg_envelope(None) is None